@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""Compare the memory a Config holds with and without compact mode.
+
+Usage:
+    python -m benchmarks.compact_bench [--services N] [--format json]
+
+A file of services repeating the same keys and many of the same strings is
+loaded with Config, then with Config(compact=True). Memory still allocated
+once the Config is loaded is measured with tracemalloc; it covers the
+values and everything Config keeps about them, such as the snapshot and
+the key path index. Key path lookups per second are shown too.
+"""
+import argparse
+import gc
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import yaml
+
+from figgypy.config import Config
+
+
+def make_config(services):
+    return {
+        'services': {
+            'service-{}'.format(i): {
+                'host': 'host-{}.internal'.format(i % 50),
+                'port': 8000 + i % 10,
+                'protocol': 'https',
+                'enabled': i % 3 != 0,
+                'region': ['us-east-1', 'eu-west-1', 'ap-south-1'][i % 3],
+                'tags': ['web', 'tier-{}'.format(i % 4)],
+                'limits': {'cpu': '500m', 'memory': '512Mi'},
+            }
+            for i in range(services)
+        },
+    }
+
+
+def retained(path, **kwargs):
+    # Timed without tracemalloc, which slows allocation down.
+    start = time.perf_counter()
+    Config(path, **kwargs)
+    seconds = time.perf_counter() - start
+    gc.collect()
+    tracemalloc.start()
+    cfg = Config(path, **kwargs)
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return cfg, seconds, size
+
+
+def lookup_rate(cfg, services):
+    keys = ['services.service-{}.limits.cpu'.format(i) for i in range(0, services, 7)]
+    lookups, start = 0, time.perf_counter()
+    while time.perf_counter() - start < 0.5:
+        for key in keys:
+            cfg.get_value(key)
+        lookups += len(keys)
+    return lookups / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--services', type=int, default=50000)
+    parser.add_argument('--format', default='json', choices=['json', 'yaml'])
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, 'config.' + args.format)
+        with open(path, 'w') as _fo:
+            if args.format == 'json':
+                json.dump(make_config(args.services), _fo)
+            else:
+                yaml.safe_dump(make_config(args.services), _fo)
+        print('{:<10} {:>10} {:>12} {:>12}'.format('mode', 'load s', 'retained MB', 'lookups/s'))
+        for name, kwargs in (('dicts', {}), ('compact', {'compact': True})):
+            cfg, seconds, size = retained(path, **kwargs)
+            print('{:<10} {:>10.2f} {:>12.1f} {:>12.0f}'.format(
+                name, seconds, size / 1024.0 / 1024.0, lookup_rate(cfg, args.services)))
+            del cfg
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    main()
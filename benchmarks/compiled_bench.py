@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""Compare loading a precompiled artifact with parsing the source file.
+
+Usage:
+    python -m benchmarks.compiled_bench [--entries N] [--repeat R]
+
+For a yaml and a json file, reports:
+    load:  Config(path) in this process, parsing the file
+    figc:  Config(path, compiled=True) in this process, from the artifact
+    cold:  a new interpreter importing figgypy and loading the file,
+           without and with the artifact
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+import yaml
+
+from benchmarks.loader_bench import make_config
+from figgypy.compiled import artifact_path, compile_file
+from figgypy.config import Config
+
+COLD = ('import sys; from figgypy.config import Config; '
+        'Config(sys.argv[1], compiled=bool(sys.argv[2:]))')
+
+
+def cold_start(f, repeat, compiled=False):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.check_call([sys.executable, '-c', COLD, f] + (['compiled'] if compiled else []))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        cfg = make_config(args.entries)
+        for fmt in ('json', 'yaml'):
+            f = os.path.join(tmp, 'config.' + fmt)
+            with open(f, 'w') as _fo:
+                if fmt == 'json':
+                    json.dump(cfg, _fo)
+                else:
+                    yaml.safe_dump(cfg, _fo)
+            load = min(timeit.repeat(lambda: Config(f), number=1, repeat=args.repeat))
+            cold_load = cold_start(f, args.repeat)
+            compile_file(f)
+            assert Config(f, compiled=True).values == cfg
+            figc = min(timeit.repeat(lambda: Config(f, compiled=True), number=1,
+                                     repeat=args.repeat))
+            cold_figc = cold_start(f, args.repeat, compiled=True)
+            os.remove(artifact_path(f))
+            print('{:<5} load {:7.3f}s  figc {:7.3f}s  {:6.1f}x   '
+                  'cold {:7.3f}s -> {:7.3f}s'.format(
+                      fmt, load, figc, load / figc, cold_load, cold_figc))
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    main()
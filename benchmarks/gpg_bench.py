@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""Compare gpg decryption with and without cached handles and workers.
+
+Usage:
+    python -m benchmarks.gpg_bench [--blocks N] [--loads L] [--workers W]
+
+Uses a temporary copy of the test keyring in tests/resources/test-keys.
+Each load decrypts a fresh copy of a configuration with N distinct PGP
+blocks, the way Config does when a setter triggers a reload.
+"""
+import argparse
+import copy
+import os
+import shutil
+import tempfile
+import time
+
+from pretty_bad_protocol import gnupg
+
+from figgypy.decrypt import clear_gpg_handles, gpg_decrypt
+
+KEYS = os.path.join(os.path.dirname(__file__), os.pardir, 'tests', 'resources', 'test-keys')
+
+
+def make_config(gpg, blocks):
+    fingerprint = gpg.list_keys()[0]['fingerprint']
+    return {
+        'secret-{}'.format(i): str(gpg.encrypt('secret {}'.format(i), fingerprint,
+                                               always_trust=True))
+        for i in range(blocks)
+    }
+
+
+def run(cfg, gpg_config, loads, workers=None, cached=True):
+    start = time.time()
+    for _ in range(loads):
+        if not cached:
+            clear_gpg_handles()
+        res = gpg_decrypt(copy.deepcopy(cfg), gpg_config, max_workers=workers)
+    elapsed = time.time() - start
+    assert res == {k: 'secret {}'.format(k.split('-')[1]) for k in cfg}
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--blocks', type=int, default=40)
+    parser.add_argument('--loads', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        homedir = os.path.join(tmp, 'keys')
+        shutil.copytree(KEYS, homedir, ignore=shutil.ignore_patterns('S.*'))
+        gpg_config = {'homedir': homedir}
+        cfg = make_config(gnupg.GPG(**gpg_config), args.blocks)
+
+        baseline = run(cfg, gpg_config, args.loads, cached=False)
+        results = [
+            ('new handle per load, serial', baseline),
+            ('cached handle, serial', run(cfg, gpg_config, args.loads)),
+            ('cached handle, {} workers'.format(args.workers),
+             run(cfg, gpg_config, args.loads, workers=args.workers)),
+        ]
+        print('{} blocks x {} loads'.format(args.blocks, args.loads))
+        for name, elapsed in results:
+            print('{:<32} {:8.3f}s  {:6.1f}x'.format(name, elapsed, baseline / elapsed))
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    main()
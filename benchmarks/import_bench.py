@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""Measure what `import figgypy` costs.
+
+Usage:
+    python -m benchmarks.import_bench [--repeat R] [--budget-ms MS]
+
+Each run imports figgypy in a fresh interpreter with -X importtime and
+reports the cumulative time and the slowest modules. The secret backends
+are imported only when a secret needs them; the run fails if any of
+HEAVY_MODULES is imported by `import figgypy`, or if the median exceeds
+--budget-ms.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ('boto3', 'botocore', 'pretty_bad_protocol', 'xmltodict')
+
+
+def import_times(statement='import figgypy'):
+    """Import in a fresh interpreter.
+
+    Returns:
+        dict: module name to cumulative import time in microseconds
+    """
+    res = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    times = {}
+    for line in res.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def heavy_imports(times):
+    return sorted(m for m in times if m.split('.')[0] in HEAVY_MODULES)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=None)
+    args = parser.parse_args()
+
+    runs = [import_times() for _ in range(args.repeat)]
+    totals = [run['figgypy'] / 1000.0 for run in runs]
+    median = statistics.median(totals)
+    print('import figgypy: median {:.1f} ms, min {:.1f} ms, max {:.1f} ms'.format(
+        median, min(totals), max(totals)))
+    slowest = sorted(runs[-1].items(), key=lambda e: e[1], reverse=True)[1:11]
+    for name, us in slowest:
+        print('  {:>8.1f} ms  {}'.format(us / 1000.0, name))
+
+    failed = False
+    heavy = heavy_imports(runs[-1])
+    if heavy:
+        print('FAIL: import figgypy imported {}'.format(', '.join(heavy)))
+        failed = True
+    if args.budget_ms is not None and median > args.budget_ms:
+        print('FAIL: median {:.1f} ms is over the {:.1f} ms budget'.format(median, args.budget_ms))
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""Compare figgypy.loader with the old parse, dump, parse round trip.
+
+Usage:
+    python -m benchmarks.loader_bench [--entries N] [--repeat R]
+
+The old path in Config._load_file parsed the file with seria, dumped the
+result back to yaml text, and parsed that text again with yaml.full_load.
+Seria used the pure python SafeLoader, so that is what the round trip
+below reproduces.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import timeit
+
+import yaml
+
+from figgypy.loader import load
+
+
+def make_config(entries):
+    return {
+        'service-{}'.format(i): {
+            'host': 'host-{}.example.com'.format(i),
+            'port': 1000 + i,
+            'enabled': i % 2 == 0,
+            'tags': ['a', 'b', 'c'],
+            'limits': {'cpu': 0.5, 'memory': 512},
+        }
+        for i in range(entries)
+    }
+
+
+def round_trip(f):
+    with open(f, 'r') as _fo:
+        parsed = yaml.load(_fo, Loader=yaml.SafeLoader)
+    _y = yaml.dump(parsed, Dumper=yaml.SafeDumper, default_flow_style=False)
+    return yaml.full_load(_y)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        cfg = make_config(args.entries)
+        files = {}
+        for fmt in ('json', 'yaml'):
+            files[fmt] = os.path.join(tmp, 'config.' + fmt)
+            with open(files[fmt], 'w') as _fo:
+                if fmt == 'json':
+                    json.dump(cfg, _fo)
+                else:
+                    yaml.safe_dump(cfg, _fo)
+
+        for fmt, f in sorted(files.items()):
+            assert load(f) == round_trip(f)
+            size = os.path.getsize(f) / 1024.0 / 1024.0
+            old = min(timeit.repeat(lambda: round_trip(f), number=1, repeat=args.repeat))
+            new = min(timeit.repeat(lambda: load(f), number=1, repeat=args.repeat))
+            print('{:<5} {:6.2f} MB  round trip {:8.3f}s  loader {:8.3f}s  {:6.1f}x'.format(
+                fmt, size, old, new, old / new))
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""Compare Config.get_value key paths with chained indexing.
+
+Usage:
+    python -m benchmarks.path_bench [--services N] [--number N]
+
+Each lookup reads 'services.svc-<i>.replicas[1].host' for a rotating i,
+the way request handling code reads settings, with:
+    chained: cfg.values[...][...][...][...] inside try/except
+    split:   parsing the path string and descending on every call
+    path:    cfg.get_value(path), compiled once and remembered after the first read
+"""
+import argparse
+import timeit
+
+from figgypy.config import Config
+
+
+def make_config(services):
+    return {
+        'services': {
+            'svc-{}'.format(i): {
+                'replicas': [{'host': 'r{}-{}.example.com'.format(i, r), 'port': 5432}
+                             for r in range(3)],
+                'timeout': 30,
+            }
+            for i in range(services)
+        }
+    }
+
+
+def chained(values, name, default=None):
+    try:
+        return values['services'][name]['replicas'][1]['host']
+    except (KeyError, IndexError, TypeError):
+        return default
+
+
+
+def split(values, path, default=None):
+    value = values
+    try:
+        for part in path.replace('[', '.[').split('.'):
+            if part.startswith('['):
+                value = value[int(part[1:-1])]
+            elif part:
+                value = value[part]
+    except (KeyError, IndexError, TypeError, ValueError):
+        return default
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--services', type=int, default=200)
+    parser.add_argument('--number', type=int, default=200000)
+    args = parser.parse_args()
+
+    cfg = Config()
+    for k, v in make_config(args.services).items():
+        cfg.set_value(k, v)
+    cfg._publish()
+    names = ['svc-{}'.format(i) for i in range(args.services)]
+    paths = ['services.{}.replicas[1].host'.format(n) for n in names]
+    values = cfg.values
+    for name, path in zip(names, paths):
+        assert chained(values, name) == split(values, path) == cfg.get_value(path)
+
+    count = len(names)
+    cases = [
+        ('chained', lambda i: chained(values, names[i % count])),
+        ('split', lambda i: split(values, paths[i % count])),
+        ('path', lambda i: cfg.get_value(paths[i % count])),
+    ]
+    for label, fn in cases:
+        counter = iter(range(10 ** 12))
+        best = min(timeit.repeat(lambda: fn(next(counter)), number=args.number, repeat=3))
+        print('{:<8} {:8.1f} ns/lookup'.format(label, best / args.number * 1e9))
+
+
+if __name__ == '__main__':
+    main()
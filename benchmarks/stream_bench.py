@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Compare peak memory of figgypy.stream with figgypy.loader.
+
+Usage:
+    python -m benchmarks.stream_bench [--entries N] [--formats json,yaml]
+
+A routing table like file is generated in each format, and loaded with
+loader.load, which holds the text and the tree, and with stream.load,
+whole and with one section. Peak memory is measured with tracemalloc, so
+it includes python objects and the file text, but not libyaml's own
+buffers. The size of the final tree is printed for reference.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import yaml
+
+from figgypy import loader, stream
+
+
+def make_config(entries):
+    return {
+        'routes': {
+            '/service-{}/path'.format(i): {
+                'upstream': 'http://host-{}.example.com:{}'.format(i, 1000 + i),
+                'timeout': 30,
+                'retries': [1, 2, 4],
+                'headers': {'x-route': 'route-{}'.format(i)},
+            }
+            for i in range(entries)
+        },
+        'defaults': {'timeout': 10, 'token': {'_kms': 'cGF5bG9hZA=='}},
+    }
+
+
+def measure(func, *args, **kwargs):
+    start = time.perf_counter()
+    tracemalloc.start()
+    result = func(*args, **kwargs)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return time.perf_counter() - start, current, peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', type=int, default=50000)
+    parser.add_argument('--formats', default='json,yaml')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        cfg = make_config(args.entries)
+        print('{:<6} {:>8} {:<22} {:>9} {:>9} {:>9}'.format(
+            'format', 'file MB', 'loader', 'seconds', 'tree MB', 'peak MB'))
+        for fmt in args.formats.split(','):
+            path = os.path.join(tmp, 'routes.' + fmt)
+            with open(path, 'w') as _fo:
+                if fmt == 'json':
+                    json.dump(cfg, _fo)
+                else:
+                    yaml.safe_dump(cfg, _fo)
+            size = os.path.getsize(path) / 1024.0 / 1024.0
+            for name, func, kwargs in (
+                    ('loader.load', loader.load, {}),
+                    ('stream.load', stream.load, {}),
+                    ('stream.load defaults', stream.load, {'sections': ['defaults']})):
+                seconds, tree, peak, _ = measure(func, path, **kwargs)
+                print('{:<6} {:>8.1f} {:<22} {:>9.2f} {:>9.1f} {:>9.1f}'.format(
+                    fmt, size, name, seconds, tree / 1024.0 / 1024.0, peak / 1024.0 / 1024.0))
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""Benchmark the whole Config pipeline on synthetic configurations.
+
+Usage:
+    python -m benchmarks.suite [--sizes 100,1000,5000] [--densities 0,0.1]
+        [--formats json,yaml,xml] [--backends kms,ssm[,gpg]] [--latency-ms 2]
+        [--repeat 5] [--save results.json] [--compare baseline.json]
+
+For every combination of format, size (services in the file), and secret
+density (fraction of services whose password is a secret), a file is
+generated and loaded with Config repeatedly. Secrets are spread over the
+chosen backends: kms and ssm are in-process fakes that sleep latency-ms
+per request, see tests.stubs; gpg uses a temporary copy of the test
+keyring in tests/resources/test-keys.
+
+Reported per case:
+    p50/p90/p99  Config(path) latency in milliseconds
+    values/s     leaf values loaded per second, at the median latency
+    peak MB      peak memory allocated during one load, from tracemalloc
+    lookups/s    get_value key path lookups per second
+
+--save writes the results as json. --compare reads results saved by a
+run with the same arguments, and exits with status 1 if any case's p50 or
+peak memory grew by more than --tolerance, so the suite can gate an
+upgrade.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import yaml
+
+from figgypy.config import Config
+from tests.stubs import StubKMS, StubSSM, stub_session
+
+KEYS = os.path.join(os.path.dirname(__file__), os.pardir, 'tests', 'resources', 'test-keys')
+# Leaf values in each generated service, besides its tags.
+LEAVES_PER_SERVICE = 6
+
+
+class Secrets(object):
+    """Make secret references for each backend, remembering SSM parameters."""
+    def __init__(self, backends, gpg=None):
+        self.backends = backends
+        self.gpg = gpg
+        self.parameters = {}
+        self._fingerprint = gpg.list_keys()[0]['fingerprint'] if gpg is not None else None
+
+    def make(self, i):
+        backend = self.backends[i % len(self.backends)]
+        plaintext = 'secret {}'.format(i)
+        if backend == 'kms':
+            return {'_kms': StubKMS.encrypt(plaintext)}
+        if backend == 'ssm':
+            name = '/bench/secret-{}'.format(i)
+            self.parameters[name] = plaintext
+            return {'_ssm': name}
+        return {'_gpg': str(self.gpg.encrypt(plaintext, self._fingerprint, always_trust=True))}
+
+
+def make_config(services, density, secrets):
+    step = int(round(1 / density)) if density else 0
+    cfg = {}
+    for i in range(services):
+        cfg['service-{}'.format(i)] = {
+            'host': 'host-{}.example.com'.format(i),
+            'port': str(1000 + i),
+            'enabled': 'true' if i % 2 else 'false',
+            'timeout': '30',
+            'user': 'user-{}'.format(i),
+            'password': secrets.make(i) if step and i % step == 0 else 'plain-{}'.format(i),
+            'tags': ['a', 'b', 'c'],
+        }
+    return cfg
+
+
+def write_config(cfg, directory, fmt):
+    path = os.path.join(directory, 'config.' + fmt)
+    with open(path, 'w') as _fo:
+        if fmt == 'json':
+            json.dump(cfg, _fo)
+        elif fmt == 'yaml':
+            yaml.safe_dump(cfg, _fo)
+        else:
+            import xmltodict
+            _fo.write(xmltodict.unparse({'config': cfg}, pretty=True))
+    return path
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def measure(path, repeat, services, options):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cfg = Config(path, **options)
+        latencies.append(time.perf_counter() - start)
+    tracemalloc.start()
+    Config(path, **options)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    prefix = 'config.' if path.endswith('.xml') else ''
+    keys = ['{}service-{}.port'.format(prefix, i) for i in range(services)]
+    assert str(cfg.get_value(keys[-1])) == str(999 + services)
+    lookups, start = 0, time.perf_counter()
+    while time.perf_counter() - start < 0.2:
+        for key in keys:
+            cfg.get_value(key)
+        lookups += len(keys)
+    lookup_rate = lookups / (time.perf_counter() - start)
+
+    p50 = percentile(latencies, 50)
+    return {
+        'p50_ms': p50 * 1000,
+        'p90_ms': percentile(latencies, 90) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'values_per_s': services * (LEAVES_PER_SERVICE + 3) / p50,
+        'peak_mb': peak / 1024.0 / 1024.0,
+        'lookups_per_s': lookup_rate,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Messages for the cases that regressed against baseline."""
+    previous = {r['case']: r for r in baseline}
+    failures = []
+    for result in results:
+        old = previous.get(result['case'])
+        if old is None:
+            continue
+        for key in ('p50_ms', 'peak_mb'):
+            if result[key] > old[key] * (1 + tolerance):
+                failures.append('{} {}: {:.2f} -> {:.2f}'.format(
+                    result['case'], key, old[key], result[key]))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='100,1000,5000')
+    parser.add_argument('--densities', default='0,0.1')
+    parser.add_argument('--formats', default='json,yaml,xml')
+    parser.add_argument('--backends', default='kms,ssm')
+    parser.add_argument('--latency-ms', type=float, default=2.0)
+    parser.add_argument('--kms-workers', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--save')
+    parser.add_argument('--compare')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    backends = args.backends.split(',')
+    tmp = tempfile.mkdtemp()
+    try:
+        gpg, options = None, {'kms_max_workers': args.kms_workers}
+        if 'gpg' in backends:
+            from pretty_bad_protocol import gnupg
+            homedir = os.path.join(tmp, 'keys')
+            shutil.copytree(KEYS, homedir, ignore=shutil.ignore_patterns('S.*'))
+            options['gpg_config'] = {'homedir': homedir}
+            gpg = gnupg.GPG(homedir=homedir)
+
+        print('{:<26} {:>9} {:>9} {:>9} {:>11} {:>8} {:>11}'.format(
+            'case', 'p50 ms', 'p90 ms', 'p99 ms', 'values/s', 'peak MB', 'lookups/s'))
+        results = []
+        latency = args.latency_ms / 1000.0
+        for size in [int(s) for s in args.sizes.split(',')]:
+            for density in [float(d) for d in args.densities.split(',')]:
+                secrets = Secrets(backends, gpg)
+                cfg = make_config(size, density, secrets)
+                for fmt in args.formats.split(','):
+                    path = write_config(cfg, tmp, fmt)
+                    with stub_session({'kms': StubKMS(latency),
+                                       'ssm': StubSSM(secrets.parameters, latency=latency)}):
+                        result = measure(path, args.repeat, size, options)
+                    result['case'] = '{} n={} d={}'.format(fmt, size, density)
+                    results.append(result)
+                    print('{case:<26} {p50_ms:9.1f} {p90_ms:9.1f} {p99_ms:9.1f} '
+                          '{values_per_s:11.0f} {peak_mb:8.1f} {lookups_per_s:11.0f}'.format(**result))
+    finally:
+        shutil.rmtree(tmp)
+
+    if args.save:
+        with open(args.save, 'w') as _fo:
+            json.dump(results, _fo, indent=2)
+    if args.compare:
+        with open(args.compare) as _fo:
+            failures = compare(results, json.load(_fo), args.tolerance)
+        for failure in failures:
+            print('regression: ' + failure)
+        if failures:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -9,8 +9,8 @@ from figgypy.config import Config
 _config = None
 
 
-def get_config():
-    """Get the global configuration.
+def get_config(name=None):
+    """Get the global configuration, or the one registered as name.
 
     For this to work you must first call figgypy.set_config. See set_config for help.
 
@@ -18,8 +18,14 @@ def get_config():
     user that they must run figgypy.set_config first. If we had them use just use
     figgypy._config, the initial value of None would give no indication of how to
     initialize the Config object.
+
+    With a name, the Config registered with register_config or set_config
+    under that name is returned, loaded on first use; see figgypy.registry.
     """
     global _config
+    if name is not None:
+        from figgypy.registry import REGISTRY
+        return REGISTRY.get(name)
     if _config is None:
         raise ValueError('configuration not set; run figgypy.set_config first')
     return _config
@@ -28,7 +34,8 @@ def get_config():
 def get_value(*args, **kwargs):
     """Get from config object by exposing Config.get_value method.
 
-    dict.get() method on Config.values
+    dict.get() method on Config.values, extended to key paths:
+        figgypy.get_value('db.replicas[0].host', 'localhost')
     """
     global _config
     if _config is None:
@@ -36,8 +43,8 @@ def get_value(*args, **kwargs):
     return _config.get_value(*args, **kwargs)
 
 
-def set_config(config):
-    """Set a global config.
+def set_config(config, name=None):
+    """Set a global config, or register config as name.
 
     This should work properly whether or not you import the full package namespace.
         # a.py
@@ -66,8 +73,15 @@ def set_config(config):
         import c
         import d
         # same cfg from c
+
+    With a name, config is added to figgypy.registry as it is, for
+    get_config(name), and the global config is left alone.
     """
     global _config
+    if name is not None:
+        from figgypy.registry import REGISTRY
+        REGISTRY.set(name, config)
+        return
     _config = config
 
 
@@ -79,4 +93,37 @@ def set_value(*args, **kwargs):
     return _config.set_value(*args, **kwargs)
 
 
-__all__ = ['Config', 'get_config', 'get_value', 'set_config', 'set_value']
+def aset_config(*args, **kwargs):
+    """Load a Config without blocking the event loop, and set it globally.
+
+    Arguments are the same as for Config. Returns a coroutine:
+        cfg = await figgypy.aset_config('config.yaml', aws_config=aws_config)
+    """
+    from figgypy.aio import aset_config as _aset_config
+    return _aset_config(*args, **kwargs)
+
+
+def register_config(name, *args, **kwargs):
+    """Register how to load the Config returned by get_config(name).
+
+    Arguments after name are the same as for Config:
+        figgypy.register_config('billing', 'billing.yaml', aws_config=aws_config)
+
+    Loading waits for the first get_config(name) or preload_configs. See
+    figgypy.registry.
+    """
+    from figgypy.registry import REGISTRY
+    REGISTRY.register(name, *args, **kwargs)
+
+
+def preload_configs(names=None, max_workers=None):
+    """Load registered configurations in parallel, such as at startup.
+
+    Returns a dict of name to Config; see figgypy.registry.Registry.preload.
+    """
+    from figgypy.registry import REGISTRY
+    return REGISTRY.preload(names, max_workers=max_workers)
+
+
+__all__ = ['Config', 'aset_config', 'get_config', 'get_value', 'preload_configs',
+           'register_config', 'set_config', 'set_value']
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""Load a Config without blocking the event loop.
+
+File access and the KMS and SSM clients run in the loop's executor. Gpg
+runs through asyncio subprocesses. Every backend resolves at the same
+time, and the resulting values are the same as with Config(...).
+"""
+import asyncio
+from contextlib import nullcontext
+from functools import partial
+import logging
+import os
+import time
+
+from figgypy import decrypt, instrument
+from figgypy.config import Config
+from figgypy.decrypt import (
+    RESOLVERS,
+    _apply,
+    _cache_lookup,
+    _cache_store,
+    _group,
+    find_secrets,
+    resolve_payloads,
+    secret_paths,
+)
+from figgypy.snapshot import copy_paths
+
+LOG = logging.getLogger(__name__)
+
+
+def _gpg_command(gpg_config):
+    command = [gpg_config.get('binary') or 'gpg', '--batch', '--quiet', '--yes']
+    if gpg_config.get('homedir'):
+        command += ['--homedir', os.path.expanduser(gpg_config['homedir'])]
+    if gpg_config.get('keyring'):
+        command += ['--keyring', gpg_config['keyring']]
+    if gpg_config.get('secring'):
+        command += ['--secret-keyring', gpg_config['secring']]
+    return command + ['--decrypt']
+
+
+async def _gpg_decrypt_one(command, payload, semaphore):
+    async with semaphore:
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *command,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE)
+            out, err = await proc.communicate(payload.encode('utf-8'))
+        except OSError as err:
+            LOG.error("error unpacking secrets %s", err)
+            return None
+    if proc.returncode != 0:
+        LOG.error("gpg error unpacking secrets %s", err.decode('utf-8', 'replace'))
+        return None
+    return out.decode('utf-8')
+
+
+async def _agpg_resolve(payloads, gpg_config=None, gpg_max_workers=None, **options):
+    if not decrypt._import_gnupg():
+        return {}
+    command = _gpg_command(gpg_config if gpg_config is not None else {})
+    semaphore = asyncio.Semaphore(gpg_max_workers or os.cpu_count() or 1)
+    plaintexts = await asyncio.gather(
+        *[_gpg_decrypt_one(command, p, semaphore) for p in payloads])
+    return {p: v for p, v in zip(payloads, plaintexts) if v is not None}
+
+
+# Coroutines replacing built in resolvers; the rest run in the executor.
+ASYNC_RESOLVERS = {
+    '_gpg': (decrypt._gpg_resolve, _agpg_resolve),
+}
+
+
+def _recording(report):
+    """Record into report in this thread, for a block with no await."""
+    return instrument.recording(report) if report is not None else nullcontext()
+
+
+async def aresolve_payloads(marker, payloads, secret_cache=None, report=None, **options):
+    """Async version of figgypy.decrypt.resolve_payloads.
+
+    report (optional[LoadReport]) records the spans and counts, as a
+    recording block does for resolve_payloads.
+    """
+    builtin, aresolve = ASYNC_RESOLVERS.get(marker, (None, None))
+    # Only use the coroutine while the built in resolver is registered.
+    if aresolve is None or RESOLVERS[marker][0] is not builtin:
+        loop = asyncio.get_running_loop()
+        resolve = partial(resolve_payloads, marker, payloads, secret_cache=secret_cache, **options)
+        return await loop.run_in_executor(None, instrument.bind(resolve, report))
+    start, clock = time.time(), time.perf_counter()
+    with _recording(report):
+        cache, context, values, missing = _cache_lookup(marker, payloads, secret_cache, options)
+    if missing:
+        fetched = await aresolve(missing, **options)
+        _cache_store(cache, marker, context, fetched)
+        values.update(fetched)
+    with _recording(report):
+        instrument.count('payloads', len(missing), backend=marker)
+        instrument.emit_span('resolve', start, time.perf_counter() - clock, {'backend': marker})
+    return values
+
+
+async def aresolve_secrets(cfg, markers=None, paths=None, **options):
+    """Async version of figgypy.decrypt.resolve_secrets.
+
+    Every marker is resolved concurrently.
+    """
+    found = find_secrets(cfg, markers, paths)
+    by_marker = _group(found)
+    results = await asyncio.gather(
+        *[aresolve_payloads(marker, payloads, **options)
+          for marker, payloads in by_marker.items()])
+    return _apply(cfg, found, dict(zip(by_marker, results)))
+
+
+async def aload(config_file=None, **kwargs):
+    """Create a Config without blocking the event loop.
+
+    Args:
+        config_file (optional[str]): filename, see Config.config_file
+        kwargs: any other Config argument
+
+    Returns:
+        Config: loaded and decrypted configuration object
+
+    The file is found, read, and parsed in the executor, as Config does.
+    Watching and SSM refresh, if asked for, start once the values are
+    published.
+    """
+    watch = kwargs.pop('watch', False)
+    ssm_refresh = kwargs.pop('ssm_refresh', None)
+    cfg = Config(**kwargs)
+    if config_file is not None:
+        loop = asyncio.get_running_loop()
+        # The executor threads record into the report of this load, so it
+        # has the same stages as Config's.
+        report = cfg._report = instrument.LoadReport()
+        f = await loop.run_in_executor(None, instrument.bind(cfg._find, report), config_file)
+        await loop.run_in_executor(None, instrument.bind(cfg._load_file, report), f)
+        cfg._config_file = config_file
+        cfg._config_path = f
+        await _aresolve(cfg, report)
+        report.duration = time.time() - report.start
+    if watch:
+        cfg.start_watching()
+    if ssm_refresh:
+        cfg.start_ssm_refresh(ssm_refresh)
+    return cfg
+
+
+async def _aresolve(cfg, report):
+    """Resolve the secrets cfg loaded, and publish its values."""
+    if cfg._lazy or not cfg._secret_paths:
+        # Nothing to resolve now; placeholders are cheap to set up.
+        with instrument.recording(report):
+            cfg._post_load_process()
+        return
+    cfg.post_load_count += 1
+    markers, options = cfg._resolver_settings()
+    values = copy_paths(cfg.values, cfg._secret_paths)
+    start, clock = time.time(), time.perf_counter()
+    await aresolve_secrets(values, markers, cfg._secret_paths, report=report, **options)
+    with instrument.recording(report):
+        instrument.emit_span('decrypt', start, time.perf_counter() - clock, {})
+        cfg._secret_paths = secret_paths(values, paths=cfg._secret_paths)
+        cfg.values = values
+        cfg._publish()
+
+
+async def aset_config(*args, **kwargs):
+    """Load a Config with aload and set it as the global configuration."""
+    import figgypy
+    cfg = await aload(*args, **kwargs)
+    figgypy.set_config(cfg)
+    return cfg
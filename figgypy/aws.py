@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""Share boto3 sessions and clients across calls.
+
+Creating a session resolves the credential chain, and creating a client
+loads the endpoint and service model and sets up a connection pool. Both
+are done once per aws_config and region, and then reused. Clients are
+thread-safe, so one client serves every thread; sessions are not, so they
+are only used while holding the pool lock.
+
+Clients are not shared with child processes: their connections would be
+shared with the parent, so the pool is emptied in the child after a fork.
+"""
+import logging
+import os
+import threading
+
+from figgypy.cache import freeze
+
+LOG = logging.getLogger(__name__)
+
+# Default size of each client's HTTP connection pool; botocore uses 10.
+MAX_POOL_CONNECTIONS = 10
+
+# frozen aws_config -> session
+_SESSIONS = {}
+# (service, frozen aws_config, region, max_pool_connections) -> client
+_CLIENTS = {}
+_LOCK = threading.Lock()
+
+
+def _normalize(aws_config):
+    """Drop unset arguments, so {} and {'profile_name': None} share a session."""
+    return {k: v for k, v in (aws_config or {}).items() if v is not None}
+
+
+def client(service, aws_config=None, region_name=None, max_pool_connections=None):
+    """Get a pooled client for service.
+
+    Args:
+        service (str): service name, like 'kms'
+        aws_config (optional[dict]): arguments passed into boto3 session
+        region_name (optional[str]): region for the client
+            defaults to the session's region
+        max_pool_connections (optional[int]): connections kept open to
+            the service; defaults to MAX_POOL_CONNECTIONS
+
+    Returns:
+        botocore client; NoRegionError is raised if no region is configured
+    """
+    import boto3
+    from botocore.config import Config as BotoConfig
+
+    max_pool_connections = max_pool_connections or MAX_POOL_CONNECTIONS
+    aws_config = _normalize(aws_config)
+    config_key = freeze(aws_config)
+    with _LOCK:
+        session = _SESSIONS.get(config_key)
+        if session is None:
+            session = boto3.session.Session(**aws_config)
+            _SESSIONS[config_key] = session
+        region = region_name or session.region_name
+        key = (service, config_key, region, max_pool_connections)
+        pooled = _CLIENTS.get(key)
+        if pooled is None:
+            pooled = session.client(
+                service, region_name=region,
+                config=BotoConfig(max_pool_connections=max_pool_connections))
+            _CLIENTS[key] = pooled
+        return pooled
+
+
+def configure(max_pool_connections=MAX_POOL_CONNECTIONS):
+    """Set the default connection pool size for clients created later."""
+    global MAX_POOL_CONNECTIONS
+    MAX_POOL_CONNECTIONS = max_pool_connections
+
+
+def clear_clients():
+    """Forget pooled sessions and clients, for example after rotating credentials."""
+    with _LOCK:
+        _SESSIONS.clear()
+        _CLIENTS.clear()
+
+
+def _after_fork():
+    """Start the child of a fork with an empty pool and a new lock.
+
+    The lock may have been held by another thread of the parent when it
+    forked, and would then never be released in the child.
+    """
+    global _LOCK
+    _LOCK = threading.Lock()
+    _SESSIONS.clear()
+    _CLIENTS.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
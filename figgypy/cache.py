@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""Cache resolved secrets across Config instances.
+
+Entries are keyed by the resolver marker, the payload (ciphertext or
+parameter name), and the options that decide where the payload resolves,
+such as aws_config. They expire after a TTL, and the least recently used
+entry is evicted once the cache is full.
+"""
+from collections import OrderedDict
+import logging
+import os
+import threading
+import time
+import weakref
+
+LOG = logging.getLogger(__name__)
+
+# Returned by SecretCache.get on a miss, since None is a valid value.
+MISSING = object()
+
+# Every SecretCache, so that a forked child can give each a new lock.
+_CACHES = weakref.WeakSet()
+
+
+def freeze(value):
+    """Make a hashable key from a dict of options."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    try:
+        hash(value)
+    except TypeError:
+        return repr(value)
+    return value
+
+
+_LIBC = None
+
+
+def _mlock(buf, lock=True):
+    """Lock or unlock a bytearray in memory so it is never swapped out."""
+    global _LIBC
+    if not buf:
+        return
+    import ctypes
+    import ctypes.util
+    try:
+        if _LIBC is None:
+            _LIBC = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        addr = ctypes.addressof((ctypes.c_char * len(buf)).from_buffer(buf))
+        fn = _LIBC.mlock if lock else _LIBC.munlock
+        if fn(ctypes.c_void_p(addr), ctypes.c_size_t(len(buf))) != 0:
+            LOG.debug('mlock failed with errno %s', ctypes.get_errno())
+    except (OSError, AttributeError, TypeError) as err:
+        LOG.debug('mlock unavailable: %s', err)
+
+
+class _Protected(object):
+    """A str or bytes value kept xor'd with a random pad of the same length.
+
+    This is obfuscation, not encryption: the pad is kept right beside the
+    data, so anything that can read both can rebuild the value. It keeps
+    the plaintext out of plain sight in memory dumps and swap. The
+    plaintext is only rebuilt when read. Both buffers are zeroed when the
+    entry is dropped, and can be locked in memory.
+    """
+    __slots__ = ('pad', 'data', 'is_text', 'locked')
+
+    def __init__(self, value, lock=False):
+        self.is_text = not isinstance(value, bytes)
+        raw = value.encode('utf-8') if self.is_text else value
+        self.pad = bytearray(os.urandom(len(raw)))
+        self.data = bytearray(a ^ b for a, b in zip(bytearray(raw), self.pad))
+        self.locked = lock
+        if lock:
+            _mlock(self.pad)
+            _mlock(self.data)
+
+    def reveal(self):
+        raw = bytes(bytearray(a ^ b for a, b in zip(self.data, self.pad)))
+        return raw.decode('utf-8') if self.is_text else raw
+
+    def wipe(self):
+        for buf in (self.pad, self.data):
+            for i in range(len(buf)):
+                buf[i] = 0
+            if self.locked:
+                _mlock(buf, lock=False)
+
+
+class SecretCache(object):
+    """Thread-safe TTL and LRU cache for resolved secrets.
+
+    Args:
+        ttl (optional[float]): seconds an entry stays valid
+            defaults to 300; None keeps entries until evicted
+        maxsize (optional[int]): maximum number of entries
+            defaults to 1024
+        protect (optional[str]): how to hold str and bytes values
+            None keeps them as they are
+            'obfuscate' keeps them xor'd with a random pad, stored beside
+            them, and zeroes both on eviction; this hides values from a
+            casual look at memory, but is not encryption
+            'lock' does the same, and also mlocks the buffers where the
+            platform allows it
+
+    Other value types are always kept as they are.
+    """
+    def __init__(self, ttl=300, maxsize=1024, protect=None):
+        if protect not in (None, 'obfuscate', 'lock'):
+            raise ValueError("protect must be None, 'obfuscate', or 'lock'")
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.protect = protect
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        _CACHES.add(self)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(marker, payload, context=None):
+        return (marker, freeze(payload), freeze(context))
+
+    def _now(self):
+        return time.monotonic()
+
+    def _drop(self, key):
+        _, value = self._entries.pop(key)
+        if isinstance(value, _Protected):
+            value.wipe()
+
+    def get(self, key):
+        """Get a cached value, or MISSING."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            expires, value = entry
+            if expires is not None and expires < self._now():
+                self._drop(key)
+                self.misses += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return value.reveal() if isinstance(value, _Protected) else value
+
+    def set(self, key, value):
+        self._store(key, value, self._now() + self.ttl if self.ttl is not None else None)
+
+    def _store(self, key, value, expires):
+        if self.protect and isinstance(value, (str, bytes)):
+            value = _Protected(value, lock=self.protect == 'lock')
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (expires, value)
+            while len(self._entries) > self.maxsize:
+                self._drop(next(iter(self._entries)))
+
+    def set_many(self, items):
+        """Set several (key, value) pairs."""
+        for key, value in items:
+            self.set(key, value)
+
+    def invalidate(self, marker=None, payload=None):
+        """Drop entries for a marker, a payload, or both.
+
+        With no arguments every entry is dropped.
+        """
+        with self._lock:
+            for key in list(self._entries):
+                if marker is not None and key[0] != marker:
+                    continue
+                if payload is not None and key[1] != freeze(payload):
+                    continue
+                self._drop(key)
+
+    def clear(self):
+        self.invalidate()
+
+
+_DEFAULT = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def default_cache():
+    """Get the process wide cache, creating it with default settings."""
+    global _DEFAULT
+    with _DEFAULT_LOCK:
+        if _DEFAULT is None:
+            _DEFAULT = SecretCache()
+        return _DEFAULT
+
+
+def configure(ttl=300, maxsize=1024, protect=None):
+    """Replace the process wide cache with one using these settings."""
+    global _DEFAULT
+    with _DEFAULT_LOCK:
+        if _DEFAULT is not None:
+            _DEFAULT.clear()
+        _DEFAULT = SecretCache(ttl=ttl, maxsize=maxsize, protect=protect)
+        return _DEFAULT
+
+
+def invalidate(marker=None, payload=None):
+    """Drop entries from the process wide cache, see SecretCache.invalidate."""
+    if _DEFAULT is not None:
+        _DEFAULT.invalidate(marker, payload)
+
+
+def _after_fork():
+    """Give the caches in a forked child new locks.
+
+    A lock may have been held by another thread of the parent when it
+    forked, and would then never be released in the child.
+    """
+    global _DEFAULT_LOCK
+    _DEFAULT_LOCK = threading.Lock()
+    for cache in list(_CACHES):
+        cache._lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+"""Keep large, read-mostly configuration trees in little memory.
+
+Plain dicts and lists cost far more than the values they hold: every
+container has its own hash table or array, and every string read from a
+file is a separate object, even when thousands of services repeat the
+same keys and values. In compact mode Config stores its values in a
+NodeTable instead:
+
+- each distinct key and each distinct leaf value is stored once, so
+  repeated strings are shared
+- the containers are rows of flat arrays: a container's children are a
+  contiguous run of slots, holding key ids sorted for binary search, the
+  child of each key, and the original order of the keys
+- CompactDict and CompactList are small views over the table, made as
+  values are read, with the read-only Mapping and Sequence APIs
+
+    cfg = Config('routes.yaml', compact=True)
+    cfg.routes['/api']['upstream']   # CompactDict views
+    thaw(cfg.values)                 # plain dicts and lists again
+
+Views compare equal to the dicts and lists they were built from, but are
+not dict or list instances; use thaw, here or in figgypy.snapshot, where
+a real dict is needed, as by json.dumps. Secrets are resolved before the
+tree is compacted, so compact mode cannot be lazy. A change, like
+set_value or a reload, builds a new table.
+"""
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping, Sequence
+
+# Kinds of container nodes.
+DICT = 0
+LIST = 1
+# Leaf types, checked first since most values are one of them.
+_SCALARS = frozenset((str, int, float, bool, type(None)))
+
+
+class NodeTable(object):
+    """Containers of one tree as rows of flat arrays.
+
+    Args:
+        tree (dict): configuration tree to store; node 0 is its root
+
+    Children are referred to by a ref: a container's node number, or for a
+    leaf, -1 - its index in leaves.
+    """
+    __slots__ = ('kinds', 'firsts', 'sizes', 'slot_keys', 'slot_refs', 'slot_order',
+                 'keys', 'key_ids', 'leaves')
+
+    def __init__(self, tree):
+        # Per container node.
+        self.kinds = array('b')
+        self.firsts = array('i')
+        self.sizes = array('i')
+        # Per child slot; key ids and order are 0 for list items.
+        self.slot_keys = array('i')
+        self.slot_refs = array('i')
+        self.slot_order = array('i')
+        self.keys = []
+        # str key -> key id; other keys are found by scanning.
+        self.key_ids = {}
+        self.leaves = []
+        self._build(tree, {}, {})
+
+    def _key_id(self, key, other_ids):
+        if type(key) is str:
+            kid = self.key_ids.get(key)
+            if kid is None:
+                kid = self.key_ids[key] = len(self.keys)
+                self.keys.append(key)
+            return kid
+        typed = (type(key), key)
+        kid = other_ids.get(typed)
+        if kid is None:
+            kid = other_ids[typed] = len(self.keys)
+            self.keys.append(key)
+        return kid
+
+    def _ref(self, value, other_ids, leaf_ids):
+        if type(value) not in _SCALARS and isinstance(value, _CONTAINERS):
+            return self._build(value, other_ids, leaf_ids)
+        # Equal values of different types, like 1 and True, stay apart.
+        try:
+            typed = (type(value), value)
+            index = leaf_ids.get(typed)
+        except TypeError:
+            typed = index = None
+        if index is None:
+            index = len(self.leaves)
+            self.leaves.append(value)
+            if typed is not None:
+                leaf_ids[typed] = index
+        return -1 - index
+
+    def _build(self, obj, other_ids, leaf_ids):
+        node = len(self.kinds)
+        if isinstance(obj, dict):
+            is_dict, items = True, list(dict.items(obj))
+        elif isinstance(obj, list):
+            is_dict, items = False, list(list.__iter__(obj))
+        else:
+            is_dict = isinstance(obj, CompactDict)
+            items = list(obj.items() if is_dict else obj)
+        first = len(self.slot_refs)
+        end = first + len(items)
+        self.kinds.append(DICT if is_dict else LIST)
+        self.firsts.append(first)
+        self.sizes.append(len(items))
+        # Reserve this container's slots before building its children.
+        zeros = bytes(4 * len(items))
+        self.slot_keys.frombytes(zeros)
+        self.slot_refs.frombytes(zeros)
+        self.slot_order.frombytes(zeros)
+        if is_dict:
+            kids = [self._key_id(k, other_ids) for k, _ in items]
+            ranked = sorted(range(len(items)), key=kids.__getitem__)
+            order = [0] * len(items)
+            for position, i in enumerate(ranked):
+                order[i] = position
+            self.slot_keys[first:end] = array('i', [kids[i] for i in ranked])
+            self.slot_order[first:end] = array('i', order)
+            items = [items[i][1] for i in ranked]
+        self.slot_refs[first:end] = array('i', [self._ref(value, other_ids, leaf_ids)
+                                                for value in items])
+        return node
+
+    def value(self, ref):
+        """The leaf, or a view of the container, that ref refers to."""
+        if ref < 0:
+            return self.leaves[-1 - ref]
+        if self.kinds[ref] == DICT:
+            return CompactDict(self, ref)
+        return CompactList(self, ref)
+
+    def find(self, node, key):
+        """The slot of key in dict node, or -1."""
+        first = self.firsts[node]
+        end = first + self.sizes[node]
+        if type(key) is str:
+            kid = self.key_ids.get(key)
+            if kid is not None:
+                slot = bisect_left(self.slot_keys, kid, first, end)
+                if slot < end and self.slot_keys[slot] == kid:
+                    return slot
+            return -1
+        try:
+            hash(key)
+        except TypeError:
+            return -1
+        keys, slot_keys = self.keys, self.slot_keys
+        for slot in range(first, end):
+            if keys[slot_keys[slot]] == key:
+                return slot
+        return -1
+
+    def iter_keys(self, node):
+        first = self.firsts[node]
+        keys, slot_keys, slot_order = self.keys, self.slot_keys, self.slot_order
+        for slot in range(first, first + self.sizes[node]):
+            yield keys[slot_keys[first + slot_order[slot]]]
+
+    def iter_values(self, node):
+        first = self.firsts[node]
+        refs = self.slot_refs
+        if self.kinds[node] == DICT:
+            order = self.slot_order
+            for slot in range(first, first + self.sizes[node]):
+                yield self.value(refs[first + order[slot]])
+        else:
+            for slot in range(first, first + self.sizes[node]):
+                yield self.value(refs[slot])
+
+
+class CompactDict(Mapping):
+    """Read-only mapping view of a dict node of a NodeTable."""
+    __slots__ = ('_table', '_node')
+
+    def __init__(self, table, node=0):
+        self._table = table
+        self._node = node
+
+    def __getitem__(self, key):
+        slot = self._table.find(self._node, key)
+        if slot < 0:
+            raise KeyError(key)
+        return self._table.value(self._table.slot_refs[slot])
+
+    def __contains__(self, key):
+        return self._table.find(self._node, key) >= 0
+
+    def descend(self, keys, default=None):
+        """Get the value at a tuple of keys, like figgypy.paths.descend.
+
+        Containers along the way are not made into views.
+        """
+        table, ref = self._table, self._node
+        for i, key in enumerate(keys):
+            if ref < 0:
+                # Indexing into a leaf, such as a string.
+                value = table.leaves[-1 - ref]
+                try:
+                    for key in keys[i:]:
+                        value = value[key]
+                except (KeyError, IndexError, TypeError):
+                    return default
+                return value
+            if table.kinds[ref] == DICT:
+                slot = table.find(ref, key)
+                if slot < 0:
+                    return default
+            else:
+                if not isinstance(key, int):
+                    return default
+                size = table.sizes[ref]
+                if key < 0:
+                    key += size
+                if not 0 <= key < size:
+                    return default
+                slot = table.firsts[ref] + key
+            ref = table.slot_refs[slot]
+        return table.value(ref)
+
+    def __iter__(self):
+        return self._table.iter_keys(self._node)
+
+    def __len__(self):
+        return self._table.sizes[self._node]
+
+    def __eq__(self, other):
+        if isinstance(other, CompactDict) and other._table is self._table:
+            if other._node == self._node:
+                return True
+        if not isinstance(other, Mapping) or len(other) != len(self):
+            return False
+        return all(key in other and other[key] == value for key, value in self.items())
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(thaw(self))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (dict, (thaw(self),))
+
+
+class CompactList(Sequence):
+    """Read-only sequence view of a list node of a NodeTable."""
+    __slots__ = ('_table', '_node')
+
+    def __init__(self, table, node):
+        self._table = table
+        self._node = node
+
+    def __getitem__(self, index):
+        size = self._table.sizes[self._node]
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(size))]
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError('list index out of range')
+        return self._table.value(self._table.slot_refs[self._table.firsts[self._node] + index])
+
+    def __iter__(self):
+        return self._table.iter_values(self._node)
+
+    def __len__(self):
+        return self._table.sizes[self._node]
+
+    def __eq__(self, other):
+        if not isinstance(other, (list, tuple, CompactList)) or len(other) != len(self):
+            return False
+        return all(a == b for a, b in zip(self, other))
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(thaw(self))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (list, (thaw(self),))
+
+
+_CONTAINERS = (dict, list, CompactDict, CompactList)
+
+
+def compact(tree):
+    """Store a configuration tree in a NodeTable.
+
+    Returns:
+        CompactDict: view of the root; tree itself if it is one already
+    """
+    if isinstance(tree, CompactDict):
+        return tree
+    return CompactDict(NodeTable(tree))
+
+
+def thaw(obj):
+    """Build plain dicts and lists from compact views, recursively."""
+    if isinstance(obj, CompactDict):
+        return {k: thaw(v) for k, v in obj.items()}
+    if isinstance(obj, CompactList):
+        return [thaw(v) for v in obj]
+    return obj
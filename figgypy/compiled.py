@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""Precompile configuration files for fast startup.
+
+Usage:
+    python -m figgypy.compiled config.yaml [more.yaml ...] [-o OUTPUT]
+
+compile_file parses a configuration file once and writes its values, with
+the key paths of its secret references, to an artifact next to it named
+<file>.figc. A Config created with compiled=True that loads a file with
+an artifact maps the artifact into memory and unmarshals it instead of
+parsing, and resolves the recorded references without searching the tree
+for them. Artifacts are never read otherwise.
+
+The artifact starts with the version of its format, the Python version
+that wrote it, since marshal data is only readable by the same one, and a
+hash of the source file it was compiled from. An artifact that does not
+match all three is ignored and the source is parsed as usual. Secrets are
+stored as the references in the file, never resolved.
+"""
+import argparse
+import hashlib
+import logging
+import marshal
+import mmap
+import os
+import struct
+import sys
+
+from figgypy.decrypt import find_secrets
+from figgypy.exceptions import FiggypyError
+from figgypy.loader import loads
+
+LOG = logging.getLogger(__name__)
+
+ARTIFACT_SUFFIX = '.figc'
+MAGIC = b'FIGGYPC'
+# Changed when the layout of the artifact changes.
+FORMAT_VERSION = 2
+# Magic, format version, and the major and minor Python version.
+_VERSION = MAGIC + struct.pack('BBB', FORMAT_VERSION, *sys.version_info[:2])
+_DIGEST_SIZE = hashlib.sha256().digest_size
+_HEADER_SIZE = len(_VERSION) + _DIGEST_SIZE
+
+
+def artifact_path(config_file):
+    """Where the artifact for config_file goes by default."""
+    return config_file + ARTIFACT_SUFFIX
+
+
+def _digest(text):
+    return hashlib.sha256(text.encode('utf-8')).digest()
+
+
+def compile_file(config_file, output=None):
+    """Compile a configuration file into an artifact.
+
+    Args:
+        config_file (str): path of the file to compile
+        output (optional[str]): where to write the artifact; see artifact_path
+
+    Returns:
+        str: path of the artifact written
+    """
+    with open(config_file, 'r') as _fo:
+        text = _fo.read()
+    values = loads(text, filename=config_file)
+    refs = [(ref[0], ref[3], ref[4]) for ref in find_secrets(values)]
+    try:
+        data = marshal.dumps((values, refs))
+    except ValueError as err:
+        raise FiggypyError('cannot compile {}: {}'.format(config_file, err))
+    output = output or artifact_path(config_file)
+    # Write beside the destination and rename, so readers never see half a file.
+    tmp = '{}.{}.tmp'.format(output, os.getpid())
+    with open(tmp, 'wb') as _fo:
+        _fo.write(_VERSION + _digest(text) + data)
+    os.replace(tmp, output)
+    return output
+
+
+def load_artifact(path, text):
+    """Load an artifact if it was compiled from text.
+
+    Args:
+        path (str): artifact path
+        text (str): current contents of the source file
+
+    Returns:
+        tuple: (values, refs), where refs maps each key path holding a
+            secret reference to its (marker, payload); None if there is no
+            usable artifact
+    """
+    try:
+        with open(path, 'rb') as _fo:
+            mapped = mmap.mmap(_fo.fileno(), 0, access=mmap.ACCESS_READ)
+    except (IOError, ValueError):
+        return None
+    try:
+        if mapped[:len(MAGIC)] != MAGIC:
+            LOG.debug('Ignoring %s: not a figgypy artifact', path)
+            return None
+        if mapped[:len(_VERSION)] != _VERSION:
+            LOG.debug('Ignoring %s: written by another figgypy or Python version', path)
+            return None
+        if mapped[len(_VERSION):_HEADER_SIZE] != _digest(text):
+            LOG.debug('Ignoring %s: compiled from a different source', path)
+            return None
+        with memoryview(mapped) as view:
+            values, refs = marshal.loads(view[_HEADER_SIZE:])
+    except (EOFError, ValueError, TypeError) as err:
+        LOG.debug('Ignoring %s: %s', path, err)
+        return None
+    finally:
+        mapped.close()
+    return values, {path: (marker, payload) for path, marker, payload in refs}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Precompile figgypy configuration files.')
+    parser.add_argument('config_files', nargs='+')
+    parser.add_argument('-o', '--output', help='artifact path, with a single config file')
+    args = parser.parse_args(argv)
+    if args.output and len(args.config_files) > 1:
+        parser.error('--output takes a single config file')
+    for config_file in args.config_files:
+        print(compile_file(config_file, args.output))
+
+
+if __name__ == '__main__':
+    main()
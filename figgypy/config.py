@@ -1,16 +1,36 @@
 # -*- coding: utf-8 -*-
+from contextlib import contextmanager
+from functools import partial
 import logging
 import os
-import yaml
-
-import seria
+import threading
 
+from figgypy.cache import MISSING
+from figgypy.compact import compact
+from figgypy.compiled import artifact_path, load_artifact
 from figgypy.decrypt import (
-    gpg_decrypt,
-    kms_decrypt,
-    ssm_decrypt,
+    RESOLVERS,
+    find_secrets,
+    might_contain_secrets,
+    resolve_secrets,
+    secret_paths,
 )
+from figgypy import instrument
 from figgypy.exceptions import FiggypyError
+from figgypy.layers import DictLayer, FileLayer, Layer, MergedView, _leaf_paths, as_layer
+from figgypy.lazy import LazySecret, _node, _set_child, defer_secrets, pending_paths
+from figgypy.loader import loads
+from figgypy.paths import PathIndex, compile_path, descend, is_path
+from figgypy.refresh import REFRESH_INTERVAL, REFRESH_JITTER, REFRESH_RATE, SSMRefresher
+from figgypy.search import FINDER, search_dirs
+from figgypy.stream import load as stream_load
+from figgypy.snapshot import copy_paths, frozen, replace, thaw
+from figgypy.watch import DEBOUNCE, POLL_INTERVAL, FileWatcher, diff
+
+LOG = logging.getLogger(__name__)
+
+# The search path before figgypy.search; see Config._dirs.
+_LEGACY_DIRS = (os.curdir, os.path.join(os.path.expanduser('~'), '.config'), '/etc/')
 
 
 class Config(object):
@@ -44,6 +64,39 @@ class Config(object):
             from ssm parameter store.
             see decrypt_ssm property for more details
             defaults to True
+        kms_max_workers (optional[int]): decrypt up to this many kms
+            secrets concurrently; defaults to one at a time
+        gpg_max_workers (optional[int]): decrypt up to this many gpg
+            secrets concurrently; defaults to one at a time
+        lazy (optional[bool]): leave secrets encrypted until first read
+            see figgypy.lazy for details
+            defaults to False
+        secret_cache (optional[SecretCache or bool]): reuse resolved secrets
+            from this figgypy.cache.SecretCache, or from the process wide
+            cache if True; defaults to resolving every time
+        watch (optional[bool]): reload config_file when it changes
+            see start_watching for details
+            defaults to False
+        ssm_refresh (optional[float]): poll ssm parameters this often, in
+            seconds, and pick up rotated values; see start_ssm_refresh
+            defaults to not polling
+        sources (optional[list]): merge values from these, lowest
+            precedence first; each is a file name, a dict, or a
+            figgypy.layers.Layer such as EnvLayer. see add_source
+        search_path (optional[list]): directories to find relative file
+            names in, instead of the default search path; see
+            figgypy.search
+        streaming (optional[bool]): read config_file in a single pass
+            without holding its text, for very large files; see
+            figgypy.stream. defaults to False
+        sections (optional[list]): only load these top level keys of
+            config_file; implies streaming
+        compact (optional[bool]): keep values in a compact, read-only
+            table rather than dicts and lists; see figgypy.compact
+            defaults to False
+        compiled (optional[bool]): load config_file from its precompiled
+            artifact when there is a current one; see figgypy.compiled
+            defaults to False
 
     Returns:
         object: configuration object with 'values' dictionary
@@ -53,68 +106,520 @@ class Config(object):
     If only name or relative path is provided, look in this order:
 
     1. current directory
-    2. `~/.config/<file_name>`
-    3. `/etc/<file_name>`
+    2. `$XDG_CONFIG_HOME/<file_name>`, if set
+    3. `~/.config/<file_name>`
+    4. each of `$XDG_CONFIG_DIRS`
+    5. `/etc/<file_name>`
 
     It is a good idea to include you __package__ in the file name.
     For example, `cfg = Config(os.path.join(__package__, 'config.yaml'))`.
     This way it will look for your_package/config.yaml,
     ~/.config/your_package/config.yaml, and /etc/your_package/config.yaml.
     """
-    _dirs = [
-        os.curdir,
-        os.path.join(os.path.expanduser("~"), '.config'),
-        "/etc/"
-    ]
+    # Replace or change this list to set the search path of every Config;
+    # left as it is, the default search path of figgypy.search is used.
+    _dirs = list(_LEGACY_DIRS)
 
     def __init__(self, config_file=None, aws_config=None, gpg_config=None,
-                 decrypt_gpg=True, decrypt_kms=True, decrypt_ssm=True):
+                 decrypt_gpg=True, decrypt_kms=True, decrypt_ssm=True,
+                 kms_max_workers=None, gpg_max_workers=None, lazy=False,
+                 secret_cache=None, watch=False, ssm_refresh=None, sources=None,
+                 search_path=None, streaming=False, sections=None, compact=False,
+                 compiled=False):
         # Must initialize values first, since other setters may load self.values
         self.values = {}
+        # (values, read-only copy of them), built when first asked for after
+        # values are replaced; see snapshot.
+        self._snapshot = (None, None)
+        # Snapshots pinned by each thread, innermost last; see pin.
+        self._pins = threading.local()
+        # Number of pin blocks open in any thread, so that reads can skip
+        # the thread local lookup when there are none.
+        self._pinned = 0
+        self._pin_lock = threading.Lock()
+        # Key path lookups into values; see figgypy.paths.
+        self._index = PathIndex(self.values)
+        # Key paths of the secret references in values, see _index_secrets.
+        self._secret_paths = []
+        # Key path -> (marker, payload) for each reference in values, from
+        # files, sources, and set_value; a hot reload uses them to tell which
+        # references changed, and SSMRefresher to find its parameters.
+        self._secret_refs = {}
+        # Top level keys set as attributes by _publish.
+        self._published = set()
+        # Top level keys resolved on first attribute access in lazy mode.
+        self._deferred_attrs = set()
         self._aws_config = aws_config
         self._gpg_config = gpg_config
         self._decrypt_gpg = decrypt_gpg
         self._decrypt_kms = decrypt_kms
         self._decrypt_ssm = decrypt_ssm
+        self._kms_max_workers = kms_max_workers
+        self._gpg_max_workers = gpg_max_workers
+        if compact and lazy:
+            raise FiggypyError('compact values are resolved when loaded; they cannot be lazy')
+        self._lazy = lazy
+        self._compact = compact
+        # Whether precompiled artifacts may be loaded; see _load_source.
+        self._compiled = compiled
+        self._secret_cache = secret_cache
+        self._search_path = search_path
+        self._streaming = streaming or sections is not None
+        self._sections = sections
         self._config_file = None
-        # Load the file last so it can rely on the other properties.
+        # Where config_file was found, see _find.
+        self._config_path = None
+        self._watcher = None
+        self._refresher = None
+        self._watch_lock = threading.Lock()
+        self._callbacks = []
+        self._batch_depth = 0
+        self._reload_pending = False
+        # Sources merged into values, lowest precedence first; see add_source.
+        self._layers = []
+        # Lookups through the resolved layers, for provenance.
+        self._view = None
+        # Top level keys from set_value, kept over the layers when they merge.
+        self._overrides = {}
+        self._layer_watchers = []
+        # Set by prefork; see _check_writable.
+        self._readonly = False
+        # LoadReport of the last load or reload; see load_report.
+        self._report = None
+        # Number of times the decryption pipeline has run on this object.
+        self.post_load_count = 0
+        # Load the files last so they can rely on the other properties.
+        if sources:
+            with instrument.recording() as self._report:
+                self._layers = [self._own_layer(as_layer(source)) for source in sources]
+                # Find all the files at once.
+                with instrument.span('find'):
+                    self.find_files([layer.path for layer in self._layers
+                                     if isinstance(layer, FileLayer)])
+                for layer in self._layers:
+                    layer.load()
+                self._reload()
         if config_file is not None:
             self.config_file = config_file
+        if watch:
+            self.start_watching()
+        if ssm_refresh:
+            self.start_ssm_refresh(ssm_refresh)
+
+    @classmethod
+    def aload(cls, config_file=None, **kwargs):
+        """Load a Config without blocking the event loop.
+
+        Arguments are the same as for Config. Returns a coroutine:
+            cfg = await Config.aload('config.yaml', aws_config=aws_config)
+
+        See figgypy.aio for details.
+        """
+        from figgypy.aio import aload
+        return aload(config_file, **kwargs)
+
+    def load_report(self):
+        """Break down where the time of the last load or reload went.
+
+        Returns:
+            dict: seconds for the whole load; stages, mapping stage names
+                like 'find', 'read', 'parse', 'decrypt', and 'publish' to
+                seconds; backends, mapping each secret marker to its
+                seconds, requests, payloads, bytes, and secret cache hits;
+                see figgypy.instrument.LoadReport.as_dict. None before the
+                first load.
+
+        Secrets resolved later, in lazy mode, are not included.
+        """
+        if self._report is None:
+            return None
+        return self._report.as_dict()
+
+    def prefork(self, freeze_gc=False):
+        """Resolve everything now and make this object read-only for forking.
+
+        See figgypy.prefork for details.
+        """
+        from figgypy.prefork import prepare
+        return prepare(self, freeze_gc=freeze_gc)
+
+    def _check_writable(self):
+        if self._readonly:
+            raise FiggypyError('configuration is read-only after prefork')
+
+    @property
+    def search_path(self):
+        """Directories relative file names are found in, in order."""
+        if self._search_path is not None:
+            return self._search_path
+        return Config._shared_search_path()
+
+    @search_path.setter
+    def search_path(self, value):
+        self._search_path = value
+
+    @staticmethod
+    def _shared_search_path():
+        """Config._dirs if it was changed, else the default search path."""
+        if tuple(Config._dirs) != _LEGACY_DIRS:
+            return list(Config._dirs)
+        return search_dirs()
 
     @staticmethod
     def _find_file(f):
+        """Find a config file in the search path shared by every Config.
+
+        Objects find their files in their own search_path, with _find.
+        """
+        return FINDER.find(f, Config._shared_search_path())
+
+    def _find(self, f):
         """Find a config file if possible."""
-        if os.path.isabs(f):
-            return f
-        else:
-            for d in Config._dirs:
-                _f = os.path.join(d, f)
-                if os.path.isfile(_f):
-                    return _f
-            raise FiggypyError(
-                "could not find configuration file {} in dirs {}"
-                .format(f, Config._dirs)
-            )
+        with instrument.span('find'):
+            return FINDER.find(f, self.search_path)
+
+    def find_files(self, names):
+        """Find several config files at once.
+
+        Each directory of the search path is listed once, rather than
+        checked once per name.
+
+        Returns:
+            dict: name -> path, or None if it was not found
+        """
+        return FINDER.find_all(names, self.search_path)
+
+    def _own_layer(self, layer):
+        """Have a file layer search this object's search path."""
+        if isinstance(layer, FileLayer) and layer.search_path is None:
+            layer.search_path = self.search_path
+        return layer
 
     def _load_file(self, f):
         """Get values from config file"""
-        try:
-            with open(f, 'r') as _fo:
-                _seria_in = seria.load(_fo)
-                _y = _seria_in.dump('yaml')
-        except IOError:
-            raise FiggypyError("could not open configuration file")
-        self.values.update(yaml.full_load(_y))
+        if self._streaming:
+            self._load_values(*self._stream_file(f))
+            return
+        with instrument.span('read'):
+            try:
+                with open(f, 'r') as _fo:
+                    text = _fo.read()
+            except IOError:
+                raise FiggypyError("could not open configuration file")
+        instrument.count('bytes_read', len(text))
+        self._load_source(text, f)
+
+    def _stream_file(self, f):
+        """Read and parse config file f in one pass; see figgypy.stream.
+
+        Precompiled artifacts are not used, since checking one needs the
+        whole text.
+
+        Returns:
+            tuple: (values, refs), as taken by _load_values
+        """
+        with instrument.span('parse'):
+            values, refs = stream_load(f, sections=self._sections)
+        instrument.count('bytes_read', os.path.getsize(f))
+        return values, refs
+
+    def _load_source(self, text, f):
+        """Get values from config file f, whose contents are text.
+
+        With compiled set, a precompiled artifact for f is used instead of
+        parsing when it matches text; see figgypy.compiled.
+        """
+        compiled = None
+        if self._compiled:
+            with instrument.span('artifact'):
+                compiled = load_artifact(artifact_path(f), text)
+        if compiled is not None:
+            self._load_values(*compiled)
+        else:
+            self._load_text(text, f)
+
+    def _load_text(self, text, f=None):
+        """Get values from the contents of config file f."""
+        with instrument.span('parse'):
+            values = loads(text, filename=f)
+        with instrument.span('index'):
+            found = find_secrets(values) if might_contain_secrets(text) else []
+        self._load_values(values, {ref[0]: ref[3:] for ref in found})
+
+    def _load_values(self, values, refs):
+        """Merge in values read from a file.
+
+        refs maps the key path of each secret reference in values to its
+        (marker, payload).
+        """
+        merged = copy_paths(self.values, [])
+        merged.update(values)
+        self.values = merged
+        kept = {p: ref for p, ref in self._secret_refs.items() if p and p[0] not in values}
+        kept.update(refs)
+        self._secret_refs = kept
+        self._index_secrets(values, list(refs))
+
+    def _index_secrets(self, values, paths=None):
+        """Record where the secret references in values are.
+
+        values are the top level keys just added to self.values. Decryption
+        then only visits the recorded paths, instead of walking every tree.
+        """
+        if paths is None:
+            paths = secret_paths(values)
+        self._secret_paths = [
+            p for p in self._secret_paths if not p or p[0] not in values
+        ] + paths
+
+    def _resolver_settings(self):
+        """Markers to resolve and the options to resolve them with."""
+        disabled = {
+            '_gpg': not self.decrypt_gpg,
+            '_kms': not self.decrypt_kms,
+            '_ssm': not self.decrypt_ssm,
+        }
+        markers = [m for m in RESOLVERS if not disabled.get(m)]
+        options = {
+            'aws_config': self.aws_config,
+            'gpg_config': self.gpg_config,
+            'kms_max_workers': self._kms_max_workers,
+            'gpg_max_workers': self._gpg_max_workers,
+            'secret_cache': self._secret_cache,
+        }
+        return markers, options
 
     def _post_load_process(self):
-        if self.decrypt_gpg:
-            gpg_decrypt(self.values, self.gpg_config)
-        if self.decrypt_kms:
-            kms_decrypt(self.values, self.aws_config)
-        if self.decrypt_ssm:
-            ssm_decrypt(self.values, self.aws_config)
-        for k, v in self.values.items():
-            setattr(self, k, v)
+        with instrument.recording() as self._report:
+            self.post_load_count += 1
+            with instrument.span('decrypt'):
+                self._resolve()
+            self._publish()
+
+    def _resolve(self):
+        """Resolve or defer the secrets in values, see _post_load_process."""
+        if self._layers:
+            markers, options = self._resolver_settings()
+            for layer in self._layers:
+                layer.resolve(markers, options, self._lazy)
+            with instrument.span('merge'):
+                self._merge()
+        elif self._secret_paths:
+            markers, options = self._resolver_settings()
+            # Work on a copy, so values is never seen half resolved.
+            values = copy_paths(self.values, self._secret_paths)
+            if self._lazy:
+                values = defer_secrets(values, markers, self._secret_paths, **options)
+                self._secret_paths = pending_paths(values, self._secret_paths)
+            else:
+                resolve_secrets(values, markers, self._secret_paths, **options)
+                # Keep only what is still unresolved, such as disabled backends.
+                self._secret_paths = secret_paths(values, paths=self._secret_paths)
+            self.values = values
+
+    def _merge(self):
+        """Set values to the merge of the resolved layers."""
+        layers = self._layers[::-1]
+        self._view = MergedView([layer.values for layer in layers], layers)
+        # Mappings that several layers define are merged when first read,
+        # except in compact mode, which stores the whole tree anyway.
+        values = self._view.materialize(deep=self._compact)
+        for key, value in self._overrides.items():
+            dict.__setitem__(values, key, value)
+        refs, paths = {}, set()
+        for layer in self._layers:
+            paths.update(layer.secret_paths)
+            for path, ref in layer.secret_refs.items():
+                if path and path[0] not in self._overrides and self._shows(path, layer):
+                    refs[path] = ref
+        refs.update((ref[0], ref[3:]) for ref in find_secrets(self._overrides))
+        self._secret_refs = refs
+        self._secret_paths = sorted(paths, key=repr)
+        self.values = values
+
+    def _shows(self, path, layer):
+        """True if the value at key path comes from layer, not a higher one."""
+        try:
+            return self._view.provenance(path) is layer
+        except KeyError:
+            return False
+
+    def _publishable(self, key):
+        """True if top level key can be an attribute.
+
+        Keys named like a property of Config, such as layers or search_path,
+        or like an attribute set in __init__, such as values, are only in
+        values. As always, a key named like a method hides the method on
+        this object.
+        """
+        if not isinstance(key, str) or isinstance(getattr(type(self), key, None), property):
+            return False
+        return key in self._published or key not in self.__dict__
+
+    def _publish(self):
+        """Expose each top level value as an attribute."""
+        with instrument.span('publish'):
+            self._deferred_attrs = set()
+            if self._compact:
+                self.values = compact(self.values)
+            values = self.values
+            published = set()
+            # dict.items, so that lazy values are not resolved here.
+            for k, v in (values.items() if self._compact else dict.items(values)):
+                if not self._publishable(k):
+                    LOG.debug('Top level key %r is only in values; it is a Config member', k)
+                    continue
+                published.add(k)
+                if isinstance(v, LazySecret):
+                    self.__dict__.pop(k, None)
+                    self._deferred_attrs.add(k)
+                else:
+                    setattr(self, k, v)
+            # Keys no longer in values.
+            for k in self._published - published:
+                self.__dict__.pop(k, None)
+            self._published = published
+            self._index = PathIndex(values)
+
+    def _update_leaves(self, updates):
+        """Copy on write the values at several key paths.
+
+        Args:
+            updates (dict): key path tuple to new value
+        """
+        old = self.values
+        values = copy_paths(old, list(updates))
+        built_from, snapshot = self._snapshot
+        for path, value in updates.items():
+            _set_child(_node(values, path)[0], path[-1], value)
+            if built_from is old and not self._compact:
+                snapshot = replace(snapshot, path, value)
+        self.values = values
+        if self._layers:
+            self._update_layers(updates)
+        if self._compact:
+            self._publish()
+            return
+        keys = set(path[0] for path in updates)
+        self._reindex(old, values, keys)
+        # The top level containers were copied, so point the attributes at them.
+        for key in keys & self._published:
+            value = dict.__getitem__(values, key)
+            if not isinstance(value, LazySecret):
+                setattr(self, key, value)
+        if built_from is old:
+            self._snapshot = (values, snapshot)
+
+    def _update_layers(self, updates):
+        """Write updates to the layers they came from, so merges keep them."""
+        for path, value in updates.items():
+            if path[0] in self._overrides:
+                self._overrides = copy_paths(self._overrides, [path])
+                _set_child(_node(self._overrides, path)[0], path[-1], value)
+                continue
+            try:
+                layer = self._view.provenance(path)
+            except KeyError:
+                continue
+            layer.values = copy_paths(layer.values, [path])
+            found = _node(layer.values, path)
+            if found is not None:
+                _set_child(found[0], path[-1], value)
+        layers = self._layers[::-1]
+        self._view = MergedView([layer.values for layer in layers], layers)
+
+    def _reindex(self, old, values, keys):
+        """Move the key path index from old to values, where only keys changed."""
+        if self._index.values is old:
+            self._index = self._index.updated(values, keys)
+
+    def snapshot(self):
+        """Get the current configuration as a read-only tree.
+
+        Returns:
+            FrozenDict: values as of the last load, reload, or change; dicts
+                are FrozenDict and lists FrozenList. It never changes, so it
+                can be read from any thread without locks. Inside a pin
+                block, the pinned snapshot is returned instead.
+
+        The snapshot is built on the first call after values are replaced,
+        so loads do not pay for it when it is not used.
+        """
+        if self._pinned:
+            stack = getattr(self._pins, 'stack', None)
+            if stack:
+                return stack[-1]
+        return self._current_snapshot()
+
+    def _current_snapshot(self):
+        values = self.values
+        built_from, snapshot = self._snapshot
+        if built_from is not values:
+            # A compact tree is read-only already, and kept as it is.
+            snapshot = frozen(values)
+            self._snapshot = (values, snapshot)
+        return snapshot
+
+    @contextmanager
+    def pin(self):
+        """Read one snapshot for the length of a block, such as a request.
+
+            with cfg.pin() as snapshot:
+                handle(request, snapshot['db'])
+
+        Within the block, snapshot() and get_value in this thread read
+        the pinned snapshot, even if the configuration is reloaded.
+        """
+        stack = getattr(self._pins, 'stack', None)
+        if stack is None:
+            stack = self._pins.stack = []
+        stack.append(self._current_snapshot())
+        with self._pin_lock:
+            self._pinned += 1
+        try:
+            yield stack[-1]
+        finally:
+            stack.pop()
+            with self._pin_lock:
+                self._pinned -= 1
+
+    def __getattr__(self, name):
+        # Only called when normal lookup fails: top level secrets in lazy
+        # mode are resolved here on first access.
+        if name in self.__dict__.get('_deferred_attrs', ()):
+            value = self.values[name]
+            setattr(self, name, value)
+            return value
+        raise AttributeError(
+            "'{}' object has no attribute '{}'".format(type(self).__name__, name))
+
+    def _reload(self):
+        """Run the decryption pipeline now, or once the current batch ends."""
+        self._check_writable()
+        if self._batch_depth:
+            self._reload_pending = True
+        else:
+            self._post_load_process()
+
+    @contextmanager
+    def batch(self):
+        """Apply several setting changes with one reload.
+
+        Setters called inside the block only record that a reload is needed.
+        The decryption pipeline then runs once when the outermost block exits.
+
+            with cfg.batch():
+                cfg.aws_config = aws_config
+                cfg.decrypt_kms = True
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+        if not self._batch_depth and self._reload_pending:
+            self._reload_pending = False
+            self._post_load_process()
 
     @property
     def aws_config(self):
@@ -129,7 +634,7 @@ class Config(object):
         # Further validation for dict contents may be warranted.
         self._aws_config = value
         if self.values:
-            self._post_load_process()
+            self._reload()
 
     @property
     def config_file(self):
@@ -139,8 +644,12 @@ class Config(object):
         If only name or relative path is provided, look in this order:
 
         1. current directory
-        2. `~/.config/<file_name>`
-        3. `/etc/<file_name>`
+        2. `$XDG_CONFIG_HOME/<file_name>`, if set
+        3. `~/.config/<file_name>`
+        4. each of `$XDG_CONFIG_DIRS`
+        5. `/etc/<file_name>`
+
+        See search_path and figgypy.search to change this.
 
         It is a good idea to include you __package__ in the file name.
         For example, `cfg = Config(os.path.join(__package__, 'config.yaml'))`.
@@ -151,9 +660,22 @@ class Config(object):
 
     @config_file.setter
     def config_file(self, config_file):
-        self._load_file(self._find_file(config_file))
-        self._config_file = config_file
-        self._post_load_process()
+        self._check_writable()
+        if self._layers:
+            # Merged over the sources like any other.
+            self.add_source(config_file)
+            self._config_file = config_file
+            return
+        with instrument.recording() as self._report:
+            path = self._find(config_file)
+            self._load_file(path)
+            self._config_file = config_file
+            self._config_path = path
+            self._reload()
+        if self._watcher is not None and self._watcher.path != os.path.abspath(path):
+            watcher = self._watcher
+            self.stop_watching()
+            self.start_watching(watcher.debounce, watcher.interval, watcher.use_inotify)
 
     @property
     def decrypt_gpg(self):
@@ -163,7 +685,7 @@ class Config(object):
     def decrypt_gpg(self, value):
         self._decrypt_gpg = value is not False
         if self.values:
-            self._post_load_process()
+            self._reload()
 
     @property
     def decrypt_kms(self):
@@ -173,7 +695,7 @@ class Config(object):
     def decrypt_kms(self, value):
         self._decrypt_kms = value is not False
         if self.values:
-            self._post_load_process()
+            self._reload()
 
     @property
     def decrypt_ssm(self):
@@ -183,14 +705,293 @@ class Config(object):
     def decrypt_ssm(self, value):
         self._decrypt_ssm = value is not False
         if self.values:
-            self._post_load_process()
+            self._reload()
+
+    @property
+    def layers(self):
+        """Sources merged into values, lowest precedence first."""
+        return list(self._layers)
+
+    def add_source(self, source):
+        """Merge another source over the others.
+
+        Args:
+            source (str, dict, or Layer): a file name, found like
+                config_file; a dict; or a figgypy.layers.Layer, such as
+                EnvLayer('MYAPP_') for MYAPP_DB__HOST style variables
+
+        Returns:
+            Layer: the new layer, which reload_layer accepts
+
+        Mappings are merged key by key with the layers below, and any other
+        value replaces the one below it. Only the new layer's secrets are
+        resolved, and values is merged again one level deep; nested
+        mappings that several layers define are merged when first read.
+        See figgypy.layers.
+        """
+        self._check_writable()
+        with instrument.recording() as self._report:
+            return self._add_source(source)
+
+    def _add_source(self, source):
+        layer = self._own_layer(as_layer(source))
+        if not self._layers and self.values:
+            # What was loaded before becomes the lowest layer.
+            base = DictLayer(self.values, name=self._config_file or 'values')
+            base.load()
+            self._layers.append(base)
+        self._layers.append(layer)
+        self.reload_layer(layer)
+        return layer
+
+    def reload_layer(self, layer):
+        """Read one source again and merge it with the others.
+
+        Args:
+            layer (Layer or str): a layer, or the name of one; a file
+                layer is named by its file name
+
+        Returns:
+            list: changed key paths; on_change callbacks are called with them
+
+        Only this layer's secrets are resolved again.
+        """
+        self._check_writable()
+        if not isinstance(layer, Layer):
+            named = [l for l in self._layers if l.name == layer]
+            if not named:
+                raise FiggypyError('no configuration source named {}'.format(layer))
+            layer = named[-1]
+        with self._watch_lock, instrument.recording() as self._report:
+            layer.load()
+            markers, options = self._resolver_settings()
+            with instrument.span('decrypt'):
+                layer.resolve(markers, options, self._lazy)
+            old = self.values
+            with instrument.span('merge'):
+                self._merge()
+            changed = diff(old, self.values)
+            self.post_load_count += 1
+            self._publish()
+        if changed:
+            self._notify(changed)
+        return changed
 
-    def get_value(self, *args, **kwargs):
-        """Get from values dictionary by exposing self.values.get method.
+    def provenance(self, key=None):
+        """Tell which source a value came from.
 
-        dict.get() method on Config.values
+        Args:
+            key (optional[str]): top level key or key path
+
+        Returns:
+            str: name of the layer the value at key came from, or None if
+                there is none; for a mapping merged from several layers,
+                the highest. Without key, a dict of every leaf key path
+                tuple to the name of its layer. Values from set_value come
+                from 'set_value'.
+        """
+        if self._view is None:
+            raise FiggypyError('provenance is only kept for configurations with sources')
+        if key is None:
+            names = {path: layer.name for path, layer in self._view.leaves().items()
+                     if path[0] not in self._overrides}
+            for k, value in self._overrides.items():
+                for path in _leaf_paths(value, (k,)):
+                    names[path] = 'set_value'
+            return names
+        keys = compile_path(key) if is_path(key) else (key,)
+        if keys[0] in self._overrides:
+            return 'set_value' if _node(self._overrides, keys) is not None else None
+        try:
+            return self._view.provenance(keys).name
+        except KeyError:
+            return None
+
+    def on_change(self, callback, path=None):
+        """Register callback(cfg, changed_paths) for hot reloads and refreshes.
+
+        Args:
+            callback (callable): called after values change
+            path (optional[tuple or str]): only call back for changes at,
+                above, or below this key path; a str is a top level key
+
+        changed_paths lists the key path tuples that were added, removed,
+        or changed, limited to those related to path. Returns callback, so
+        this can be used as a decorator.
+        """
+        if isinstance(path, str):
+            path = (path,)
+        self._callbacks.append((callback, tuple(path) if path is not None else None))
+        return callback
+
+    def _notify(self, changed):
+        for callback, path in list(self._callbacks):
+            if path is not None:
+                paths = [p for p in changed if p[:len(path)] == path or path[:len(p)] == p]
+            else:
+                paths = changed
+            if not paths:
+                continue
+            try:
+                callback(self, paths)
+            except Exception:
+                LOG.exception('Error in configuration change callback')
+
+    def start_watching(self, debounce=DEBOUNCE, interval=POLL_INTERVAL, use_inotify=True):
+        """Reload config_file in the background whenever it changes.
+
+        Args:
+            debounce (optional[float]): seconds the file must be left alone
+                before reloading, so multi step saves reload once
+            interval (optional[float]): seconds between checks when inotify
+                is unavailable and the file is polled
+            use_inotify (optional[bool]): set False to always poll
+
+        Only the secrets whose references changed are resolved again; the
+        rest keep their resolved values. values is then replaced as a whole,
+        and the on_change callbacks are called with the changed key paths.
+        After a reload, values holds exactly what the file holds.
+
+        With sources, each file layer is watched, and a change reloads that
+        layer alone; see reload_layer.
+        """
+        if self._layers:
+            if not self._layer_watchers:
+                for layer in self._layers:
+                    if isinstance(layer, FileLayer) and layer.found is not None:
+                        self._layer_watchers.append(FileWatcher(
+                            layer.found, partial(self.reload_layer, layer), debounce=debounce,
+                            interval=interval, use_inotify=use_inotify).start())
+            return self._layer_watchers
+        if self._config_path is None:
+            raise FiggypyError('no configuration file to watch')
+        if self._watcher is None:
+            self._watcher = FileWatcher(self._config_path, self._hot_reload, debounce=debounce,
+                                        interval=interval, use_inotify=use_inotify).start()
+        return self._watcher
+
+    def stop_watching(self):
+        for watcher in self._layer_watchers:
+            watcher.stop()
+        self._layer_watchers = []
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+
+    def start_ssm_refresh(self, interval=REFRESH_INTERVAL, jitter=REFRESH_JITTER, rate=REFRESH_RATE):
+        """Poll the _ssm references in the background for rotated values.
+
+        Args:
+            interval (optional[float]): seconds between polls
+            jitter (optional[float]): fraction each wait is randomized by
+            rate (optional[float]): most GetParameters requests per second
+
+        Parameters are requested in batches, and only values whose SSM
+        version changed are written. on_change callbacks are then called
+        with the key paths that changed. See figgypy.refresh for details.
         """
-        return self.values.get(*args, **kwargs)
+        if self._refresher is None:
+            self._refresher = SSMRefresher(self, interval=interval, jitter=jitter, rate=rate).start()
+        return self._refresher
+
+    def stop_ssm_refresh(self):
+        if self._refresher is not None:
+            self._refresher.stop()
+            self._refresher = None
+
+    def _hot_reload(self):
+        """Reload config_file, re-resolving only references that changed.
+
+        Returns:
+            list: changed key paths, or None if the file could not be loaded
+        """
+        with self._watch_lock, instrument.recording() as self._report:
+            f = self._config_path
+            # The file may have been moved; find it again next time.
+            FINDER.invalidate(self._config_file)
+            try:
+                if self._streaming:
+                    values, refs = self._stream_file(f)
+                else:
+                    with instrument.span('read'):
+                        with open(f, 'r') as _fo:
+                            text = _fo.read()
+                    with instrument.span('parse'):
+                        values = loads(text, filename=f)
+                    found = find_secrets(values) if might_contain_secrets(text) else []
+                    refs = {ref[0]: ref[3:] for ref in found}
+            except (IOError, FiggypyError) as err:
+                LOG.warning('Keeping the current configuration; could not reload %s: %s', f, err)
+                return None
+            old = self.values
+            stale = []
+            for path, ref in refs.items():
+                previous = _node(old, path) if path else None
+                if previous is not None and self._secret_refs.get(path) == ref:
+                    previous = previous[1]
+                    if isinstance(previous, LazySecret):
+                        previous = previous.resolve() if previous.resolved else None
+                    elif secret_paths(previous):
+                        previous = None
+                else:
+                    previous = None
+                # Reuse the resolved value when the reference is unchanged.
+                if previous is not None:
+                    _set_child(_node(values, path)[0], path[-1], previous)
+                else:
+                    stale.append(path)
+            markers, options = self._resolver_settings()
+            if stale:
+                with instrument.span('decrypt'):
+                    if self._lazy:
+                        values = defer_secrets(values, markers, stale, **options)
+                    else:
+                        resolve_secrets(values, markers, stale, **options)
+            paths = list(refs)
+            if self._lazy:
+                paths = pending_paths(values, paths)
+            else:
+                paths = secret_paths(values, paths=paths)
+            changed = diff(thaw(old) if self._compact else old, values)
+            self._secret_refs = refs
+            self._secret_paths = paths
+            # One assignment, so readers see either the old tree or the new one.
+            self.values = values
+            self.post_load_count += 1
+            self._publish()
+        if changed:
+            self._notify(changed)
+        return changed
+
+    def get_value(self, key, default=None):
+        """Get from values dictionary by key or key path.
+
+        Args:
+            key (str): top level key, or key path like 'db.replicas[0].host'
+            default: returned if there is no value at key
+
+        A top level key is looked up with dict.get() on Config.values, or
+        on the pinned snapshot inside a pin block. Key paths are compiled
+        once, and the value found at each is remembered until values are
+        replaced, see figgypy.paths. The index follows values; change
+        nested values with set_value, not in place, to keep it current.
+        """
+        if self._pinned:
+            stack = getattr(self._pins, 'stack', None)
+            if stack:
+                snapshot = stack[-1]
+                if not is_path(key) or key in snapshot:
+                    return snapshot.get(key, default)
+                return descend(snapshot, compile_path(key), default)
+        index = self._index
+        if index.values is not self.values:
+            index = self._index = PathIndex(self.values)
+        else:
+            # Fast path for key paths read before.
+            node = index.hits.get(key, MISSING)
+            if node is not MISSING and not isinstance(node, LazySecret):
+                return node
+        return index.get(key, default)
 
     @property
     def gpg_config(self):
@@ -205,14 +1006,36 @@ class Config(object):
         # Further validation for dict contents may be warranted.
         self._gpg_config = value
         if self.values:
-            self._post_load_process()
+            self._reload()
 
     def set_value(self, key, value):
-        """Set value in values dict."""
-        self.values[key] = value
+        """Set value in values dict.
+
+        With sources, value replaces key in every layer, and is kept when
+        layers are reloaded.
+        """
+        self._check_writable()
+        if self._layers:
+            self._overrides[key] = value
+        old = self.values
+        values = copy_paths(old, [])
+        dict.__setitem__(values, key, value)
+        self.values = values
+        if self._compact:
+            self._publish()
+        else:
+            self._reindex(old, values, [key])
+            built_from, snapshot = self._snapshot
+            if built_from is old:
+                self._snapshot = (values, replace(snapshot, (key,), value))
+        self._index_secrets({key: value}, [(key,) + p for p in secret_paths(value)])
+        refs = {p: ref for p, ref in self._secret_refs.items() if p and p[0] != key}
+        refs.update((ref[0], ref[3:]) for ref in find_secrets({key: value}))
+        self._secret_refs = refs
 
     def setup(self, config_file=None, aws_config=None, gpg_config=None,
-              decrypt_gpg=True, decrypt_kms=True, decrypt_ssm=True):
+              decrypt_gpg=True, decrypt_kms=True, decrypt_ssm=True,
+              kms_max_workers=None, gpg_max_workers=None, secret_cache=None):
         """Make setup easier by providing a constructor method.
 
         Move to config_file
@@ -227,18 +1050,27 @@ class Config(object):
         For example, `cfg = Config(os.path.join(__package__, 'config.yaml'))`.
         This way it will look for your_package/config.yaml,
         ~/.config/your_package/config.yaml, and /etc/your_package/config.yaml.
+
+        All changes are applied together, with a single reload.
         """
-        if aws_config is not None:
-            self.aws_config = aws_config
-        if gpg_config is not None:
-            self.gpg_config = gpg_config
-        if decrypt_kms is not None:
-            self.decrypt_kms = decrypt_kms
-        if decrypt_gpg is not None:
-            self.decrypt_gpg = decrypt_gpg
-        if decrypt_ssm is not None:
-            self.decrypt_ssm = decrypt_ssm
-        # Again, load the file last so that it can rely on other properties.
-        if config_file is not None:
-            self.config_file = config_file
+        with self.batch():
+            if kms_max_workers is not None:
+                self._kms_max_workers = kms_max_workers
+            if gpg_max_workers is not None:
+                self._gpg_max_workers = gpg_max_workers
+            if secret_cache is not None:
+                self._secret_cache = secret_cache
+            if aws_config is not None:
+                self.aws_config = aws_config
+            if gpg_config is not None:
+                self.gpg_config = gpg_config
+            if decrypt_kms is not None:
+                self.decrypt_kms = decrypt_kms
+            if decrypt_gpg is not None:
+                self.decrypt_gpg = decrypt_gpg
+            if decrypt_ssm is not None:
+                self.decrypt_ssm = decrypt_ssm
+            # Again, load the file last so that it can rely on other properties.
+            if config_file is not None:
+                self.config_file = config_file
         return self
@@ -1,30 +1,368 @@
 # -*- coding: utf-8 -*-
-"""Decrypt objects in Config."""
+"""Decrypt objects in Config.
+
+Secrets are references in the configuration tree, either a dictionary
+holding a marker key such as "_kms", or a string holding inline text such
+as a PGP block. Each marker has a resolver registered for it. The tree is
+walked once to collect every reference, each resolver then resolves all of
+its references together, and the results are written back in place.
+"""
 from __future__ import unicode_literals
 from future.utils import bytes_to_native_str as n
 
 from base64 import b64decode
+from collections import OrderedDict
 import logging
 import os
+import random
+import threading
+import time
 
-import boto3
-from botocore.exceptions import ClientError, NoRegionError
-
-from figgypy.exceptions import FiggypyError
+from figgypy import aws, instrument
+from figgypy.cache import MISSING, SecretCache, default_cache, freeze
+from figgypy.compact import CompactDict, CompactList
 
 LOG = logging.getLogger(__name__)
 
-GPG_IMPORTED = False
-try:
-    from pretty_bad_protocol import gnupg
-    import pretty_bad_protocol._parsers
-    gnupg._parsers.Verify.TRUST_LEVELS["DECRYPTION_COMPLIANCE_MODE"] = 23
-    GPG_IMPORTED = True
-except ImportError:
-    LOG.exception('Could not load gnupg. Will be unable to unpack secrets.')
+# The backends are slow to import, so they are only imported once a secret
+# needs them; see _import_gnupg and figgypy.aws. GPG_IMPORTED is None
+# until gnupg has been tried.
+gnupg = None
+GPG_IMPORTED = None
+_IMPORT_LOCK = threading.Lock()
+
+
+def _import_gnupg():
+    """Import gnupg on first use.
+
+    Returns:
+        bool: True if gnupg can be used
+    """
+    global gnupg, GPG_IMPORTED
+    if GPG_IMPORTED is None:
+        with _IMPORT_LOCK:
+            if GPG_IMPORTED is None:
+                try:
+                    from pretty_bad_protocol import gnupg as _gnupg
+                    import pretty_bad_protocol._parsers
+                    _gnupg._parsers.Verify.TRUST_LEVELS["DECRYPTION_COMPLIANCE_MODE"] = 23
+                    gnupg = _gnupg
+                    GPG_IMPORTED = True
+                except ImportError:
+                    LOG.exception('Could not load gnupg. Will be unable to unpack secrets.')
+                    GPG_IMPORTED = False
+    return GPG_IMPORTED
+
+
+# marker -> (resolve, inline, context); see register_resolver.
+RESOLVERS = OrderedDict()
+
+
+def register_resolver(marker, resolve, inline=None, context=None):
+    """Register a secret backend.
+
+    Args:
+        marker (str): dictionary key marking a reference, like '_kms'
+        resolve (callable): called as resolve(payloads, **options) with the
+            distinct payloads found under marker, and the options passed to
+            resolve_secrets. Returns a dict of payload to resolved value.
+            Payloads that could not be resolved are left out, and stay as
+            they are in the configuration.
+        inline (optional[str]): text marking a plain string as a reference
+            for this backend, like 'BEGIN PGP'; the payload is the string
+        context (optional[tuple]): names of the options that decide what a
+            payload resolves to, like ('aws_config',). Results are only put
+            in a secret cache when this is given.
+
+    Backends registered later can replace built in ones by using the same
+    marker.
+    """
+    RESOLVERS[marker] = (resolve, inline, context)
+
+
+def _child(obj, key):
+    """Get obj[key], bypassing lookups overridden by dict and list subclasses."""
+    if isinstance(obj, dict):
+        return dict.__getitem__(obj, key)
+    if isinstance(obj, list):
+        return list.__getitem__(obj, key)
+    if isinstance(obj, (CompactDict, CompactList)):
+        return obj[key]
+    raise TypeError('cannot index {}'.format(type(obj).__name__))
+
+
+def _match(obj, markers, inlines):
+    """Return the marker and payload if obj is a reference, else None."""
+    if isinstance(obj, dict):
+        for marker in markers:
+            if marker in obj:
+                return marker, obj[marker]
+    elif isinstance(obj, str):
+        for marker, inline in inlines:
+            if inline in obj:
+                return marker, obj
+    return None
+
+
+def _markers(markers):
+    if markers is None:
+        markers = list(RESOLVERS)
+    markers = [m for m in markers if m in RESOLVERS]
+    inlines = [(m, RESOLVERS[m][1]) for m in markers if RESOLVERS[m][1]]
+    return markers, inlines
+
+
+def might_contain_secrets(text, markers=None):
+    """Cheaply check raw configuration text for any reference.
+
+    False means the parsed configuration has no references at all, so the
+    tree does not need to be walked.
+    """
+    markers, inlines = _markers(markers)
+    return (any(m in text for m in markers) or
+            any(inline in text for _, inline in inlines))
+
+
+def find_secrets(cfg, markers=None, paths=None):
+    """Find references in a configuration tree.
+
+    Args:
+        cfg (dict): configuration dictionary
+        markers (optional[list]): only find references for these markers
+        paths (optional[list]): only look at these key paths, as returned by
+            secret_paths, rather than walking the whole tree
+
+    Returns:
+        list: (path, parent, key, marker, payload) tuples, where
+            parent[key] is the reference. parent is None when cfg itself
+            is a reference.
+    """
+    markers, inlines = _markers(markers)
+    found = []
+    if not markers:
+        return found
+
+    if paths is not None:
+        for path in paths:
+            parent, key, obj = None, None, cfg
+            try:
+                for key in path:
+                    parent, obj = obj, _child(obj, key)
+            except (KeyError, IndexError, TypeError):
+                continue
+            match = _match(obj, markers, inlines)
+            if match is not None:
+                found.append((tuple(path), parent, key) + match)
+        return found
+
+    stack = []
+
+    def walk(obj, parent, key):
+        match = _match(obj, markers, inlines)
+        if match is not None:
+            found.append((tuple(stack), parent, key) + match)
+        elif isinstance(obj, dict):
+            for k, v in dict.items(obj):
+                if isinstance(v, (dict, list, str)):
+                    stack.append(k)
+                    walk(v, obj, k)
+                    stack.pop()
+        elif isinstance(obj, list):
+            for i, v in enumerate(list.__iter__(obj)):
+                if isinstance(v, (dict, list, str)):
+                    stack.append(i)
+                    walk(v, obj, i)
+                    stack.pop()
+
+    walk(cfg, None, None)
+    return found
+
+
+def secret_paths(cfg, markers=None, paths=None):
+    """List the key paths of every reference in a configuration tree.
+
+    Config builds this index when a file is loaded, so later decryption
+    passes only visit these paths instead of the whole tree.
+    """
+    return [ref[0] for ref in find_secrets(cfg, markers, paths)]
+
+
+def _cache_lookup(marker, payloads, secret_cache, options):
+    """Split payloads into cached values and payloads still to resolve.
+
+    Returns:
+        tuple: (cache, context, values, missing); cache is None when the
+            results should not be cached
+    """
+    context = RESOLVERS[marker][2]
+    if secret_cache is True:
+        secret_cache = default_cache()
+    if not isinstance(secret_cache, SecretCache) or context is None:
+        return None, None, {}, list(payloads)
+    context = tuple(options.get(name) for name in context)
+    values, missing = {}, []
+    for payload in payloads:
+        value = secret_cache.get(SecretCache.key(marker, payload, context))
+        if value is MISSING:
+            missing.append(payload)
+        else:
+            values[payload] = value
+    return secret_cache, context, values, missing
+
+
+def _cache_store(secret_cache, marker, context, fetched):
+    if secret_cache is not None:
+        secret_cache.set_many((SecretCache.key(marker, payload, context), value)
+                              for payload, value in fetched.items())
+
+
+def resolve_payloads(marker, payloads, secret_cache=None, **options):
+    """Resolve payloads with the resolver for marker, through a cache.
+
+    Returns:
+        dict: payload to resolved value, for the payloads that resolved
+    """
+    with instrument.span('resolve', backend=marker):
+        cache, context, values, missing = _cache_lookup(marker, payloads, secret_cache, options)
+        if cache is not None:
+            instrument.count('cache_hits', len(values), backend=marker)
+            instrument.count('cache_misses', len(missing), backend=marker)
+        if missing:
+            fetched = RESOLVERS[marker][0](missing, **options)
+            _cache_store(cache, marker, context, fetched)
+            values.update(fetched)
+            if instrument.active():
+                instrument.count('payloads', len(missing), backend=marker)
+                instrument.count('bytes_sent', sum(len(str(p)) for p in missing), backend=marker)
+                instrument.count('bytes_received', sum(len(str(v)) for v in fetched.values()),
+                                 backend=marker)
+    return values
+
+
+def _group(found):
+    """Map each marker to the distinct payloads found for it."""
+    by_marker = OrderedDict()
+    for ref in found:
+        payloads = by_marker.setdefault(ref[3], [])
+        if ref[4] not in payloads:
+            payloads.append(ref[4])
+    return by_marker
+
+
+def _apply(cfg, found, resolved):
+    """Write resolved values in place of the references in found."""
+    for _, parent, key, marker, payload in found:
+        if payload not in resolved.get(marker, ()):
+            continue
+        value = resolved[marker][payload]
+        if parent is None:
+            cfg = value
+        else:
+            parent[key] = value
+    return cfg
+
+
+def resolve_secrets(cfg, markers=None, paths=None, **options):
+    """Resolve references in a configuration tree in place.
+
+    Args:
+        cfg (dict): configuration dictionary
+        markers (optional[list]): only resolve these markers
+            defaults to every registered resolver
+        paths (optional[list]): only look at these key paths
+        options: passed to every resolver, for example aws_config,
+            gpg_config, kms_max_workers, and ssm_path_prefixes.
+            secret_cache may be a figgypy.cache.SecretCache, or True for
+            the process wide cache.
+
+    Returns:
+        dict: decrypted configuration dictionary
+    """
+    found = find_secrets(cfg, markers, paths)
+    resolved = {}
+    for marker, payloads in _group(found).items():
+        resolved[marker] = resolve_payloads(marker, payloads, **options)
+    return _apply(cfg, found, resolved)
+
+
+# Configured gpg handles, keyed by the frozen gpg_config.
+_GPG_HANDLES = {}
+_GPG_LOCK = threading.Lock()
+
+
+def _gpg_handle(gpg_config):
+    """Get the gpg handle for gpg_config, configuring it on first use.
+
+    Configuring gpg runs the binary to check its version, so handles are
+    kept for the life of the process. Returns None if gpg cannot be
+    configured; that is not cached, so a later call can try again.
+    """
+    key = freeze(gpg_config)
+    with _GPG_LOCK:
+        gpg = _GPG_HANDLES.get(key)
+        if gpg is None:
+            try:
+                gpg = gnupg.GPG(**gpg_config)
+            except (OSError, RuntimeError):
+                LOG.exception('Failed to configure gpg. Will be unable to decrypt secrets.')
+                return None
+            _GPG_HANDLES[key] = gpg
+        return gpg
+
+
+def clear_gpg_handles():
+    """Forget configured gpg handles, for example after changing a keyring."""
+    with _GPG_LOCK:
+        _GPG_HANDLES.clear()
 
 
-def gpg_decrypt(cfg, gpg_config=None):
+def _after_fork():
+    """Start the child of a fork without the parent's gpg handles and locks."""
+    global _GPG_LOCK, _IMPORT_LOCK
+    _GPG_LOCK = threading.Lock()
+    _IMPORT_LOCK = threading.Lock()
+    _GPG_HANDLES.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def _gpg_decrypt_one(gpg, payload):
+    """Decrypt one PGP block.
+
+    Returns:
+        str: plaintext, or None if it could not be decrypted
+    """
+    instrument.count('requests', backend='_gpg')
+    try:
+        decrypted = gpg.decrypt(payload)
+        if decrypted.ok:
+            return n(decrypted.data.decode('utf-8').encode())
+        LOG.error("gpg error unpacking secrets %s", decrypted.stderr)
+    except Exception as err:
+        LOG.error("error unpacking secrets %s", err)
+    return None
+
+
+def _gpg_resolve(payloads, gpg_config=None, gpg_max_workers=None, **options):
+    if not _import_gnupg():
+        return {}
+    gpg = _gpg_handle(gpg_config if gpg_config is not None else {})
+    if gpg is None:
+        return {}
+    # Each decrypt runs its own gpg process, so they can overlap.
+    if gpg_max_workers and gpg_max_workers > 1 and len(payloads) > 1:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=min(gpg_max_workers, len(payloads))) as pool:
+            decrypt_one = instrument.bind(_gpg_decrypt_one)
+            plaintexts = list(pool.map(lambda p: decrypt_one(gpg, p), payloads))
+    else:
+        plaintexts = [_gpg_decrypt_one(gpg, p) for p in payloads]
+    return {p: v for p, v in zip(payloads, plaintexts) if v is not None}
+
+
+def gpg_decrypt(cfg, gpg_config=None, max_workers=None):
     """Decrypt GPG objects in configuration.
 
     Args:
@@ -36,6 +374,8 @@ def gpg_decrypt(cfg, gpg_config=None):
                 gpg_config = {'homedir': '~/.gnupg/',
                               'binary': 'gpg',
                               'keyring': 'pubring.kbx'}
+        max_workers (optional[int]): run up to this many gpg processes at once
+            defaults to decrypting one at a time
 
     Returns:
         dict: decrypted configuration dictionary
@@ -61,59 +401,62 @@ def gpg_decrypt(cfg, gpg_config=None):
     will transform to:
 
         {'component': {'key': 'decrypted value'}}
+
+    The gpg handle for each gpg_config is configured once and reused for
+    the life of the process.
     """
-    def decrypt(obj):
-        """Decrypt the object.
-
-        It is an inner function because we must first verify that gpg
-        is ready. If we did them in the same function we would end up
-        calling the gpg checks several times, potentially, since we are
-        calling this recursively.
-        """
-        if isinstance(obj, list):
-            res_v = []
-            for item in obj:
-                res_v.append(decrypt(item))
-            return res_v
-        elif isinstance(obj, dict):
-            if '_gpg' in obj:
-                try:
-                    decrypted = gpg.decrypt(obj['_gpg'])
-                    if decrypted.ok:
-                        obj = n(decrypted.data.decode('utf-8').encode())
-                    else:
-                        LOG.error("gpg error unpacking secrets %s", decrypted.stderr)
-                except Exception as err:
-                    LOG.error("error unpacking secrets %s", err)
-            else:
-                for k, v in obj.items():
-                    obj[k] = decrypt(v)
-        else:
-            try:
-                if 'BEGIN PGP' in obj:
-                    try:
-                        decrypted = gpg.decrypt(obj)
-                        if decrypted.ok:
-                            obj = n(decrypted.data.decode('utf-8').encode())
-                        else:
-                            LOG.error("gpg error unpacking secrets %s", decrypted.stderr)
-                    except Exception as err:
-                        LOG.error("error unpacking secrets %s", err)
-            except TypeError:
-                LOG.debug('Pass on decryption. Only decrypt strings')
-        return obj
-
-    gpg_config = gpg_config if gpg_config is not None else {}
-    if GPG_IMPORTED:
+    return resolve_secrets(cfg, markers=['_gpg'], gpg_config=gpg_config,
+                           gpg_max_workers=max_workers)
+
+
+KMS_MAX_RETRIES = 5
+KMS_BACKOFF_BASE = 0.1
+
+
+def _kms_decrypt_one(client, ciphertext):
+    """Decrypt one KMS ciphertext, retrying when throttled.
+
+    Returns:
+        str: plaintext, or None if the key does not exist or is not accessible
+    """
+    from botocore.exceptions import ClientError
+    attempt = 0
+    while True:
+        instrument.count('requests', backend='_kms')
         try:
-            gpg = gnupg.GPG(**gpg_config)
-        except (OSError, RuntimeError):
-            LOG.exception('Failed to configure gpg. Will be unable to decrypt secrets.')
-        return decrypt(cfg)
-    return cfg
+            res = client.decrypt(CiphertextBlob=b64decode(ciphertext))
+            return n(res['Plaintext'])
+        except ClientError as err:
+            if 'AccessDeniedException' in err.args[0]:
+                LOG.warning('Unable to decrypt %s. Key does not exist or no access', ciphertext)
+                return None
+            if 'ThrottlingException' not in err.args[0] or attempt >= KMS_MAX_RETRIES:
+                raise
+        time.sleep(KMS_BACKOFF_BASE * 2 ** attempt * (0.5 + random.random() / 2))
+        attempt += 1
+
+
+def _kms_resolve(payloads, aws_config=None, kms_max_workers=None, **options):
+    from botocore.exceptions import NoRegionError
+    # One connection per worker, so pooled requests do not wait on each other.
+    pool_size = kms_max_workers if (kms_max_workers or 0) > aws.MAX_POOL_CONNECTIONS else None
+    try:
+        client = aws.client('kms', aws_config, max_pool_connections=pool_size)
+    except NoRegionError:
+        LOG.exception('Missing or invalid aws configuration. Will not be able to unpack KMS secrets.')
+        return {}
 
+    if kms_max_workers and kms_max_workers > 1 and len(payloads) > 1:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=min(kms_max_workers, len(payloads))) as pool:
+            decrypt_one = instrument.bind(_kms_decrypt_one)
+            plaintexts = list(pool.map(lambda c: decrypt_one(client, c), payloads))
+    else:
+        plaintexts = [_kms_decrypt_one(client, c) for c in payloads]
+    return {c: p for c, p in zip(payloads, plaintexts) if p is not None}
 
-def kms_decrypt(cfg, aws_config=None):
+
+def kms_decrypt(cfg, aws_config=None, max_workers=None):
     """Decrypt KMS objects in configuration.
 
     Args:
@@ -124,6 +467,8 @@ def kms_decrypt(cfg, aws_config=None):
                 aws_creds = {'aws_access_key_id': aws_access_key_id,
                              'aws_secret_access_key': aws_secret_access_key,
                              'region_name': 'us-east-1'}
+        max_workers (optional[int]): decrypt up to this many secrets at once
+            defaults to decrypting one at a time
 
     Returns:
         dict: decrypted configuration dictionary
@@ -144,50 +489,115 @@ def kms_decrypt(cfg, aws_config=None):
 
         {'component': {'key': 'decrypted value'}}
 
+    All ciphertexts are collected first. With max_workers, they are decrypted
+    in a thread pool sharing one client. Throttled requests are retried with
+    exponential backoff either way.
+
     To get the value to be stored as a KMS encrypted string:
 
         from figgypy.util import kms_encrypt
         encrypted = kms_encrypt('your secret', 'your key or alias', optional_aws_config)
     """
-    def decrypt(obj):
-        """Decrypt the object.
-
-        It is an inner function because we must first configure our KMS
-        client. Then we call this recursively on the object.
-        """
-        if isinstance(obj, list):
-            res_v = []
-            for item in obj:
-                res_v.append(decrypt(item))
-            return res_v
-        elif isinstance(obj, dict):
-            if '_kms' in obj:
-                try:
-                    res = client.decrypt(CiphertextBlob=b64decode(obj['_kms']))
-                    obj = n(res['Plaintext'])
-                except ClientError as err:
-                    if 'AccessDeniedException' in err.args[0]:
-                        LOG.warning('Unable to decrypt %s. Key does not exist or no access', obj['_kms'])
-                    else:
-                        raise
-            else:
-                for k, v in obj.items():
-                    obj[k] = decrypt(v)
+    return resolve_secrets(cfg, markers=['_kms'], aws_config=aws_config,
+                           kms_max_workers=max_workers)
+
+
+SSM_BATCH_SIZE = 10
+
+
+def _ssm_get_parameters(client, names, versions=None):
+    """Get parameters from ssm in batches of SSM_BATCH_SIZE.
+
+    Args:
+        client: ssm client
+        names (list): parameter names, optionally with a selector
+        versions (optional[dict]): filled with parameter name to version
+
+    Returns:
+        dict: parameter name to value for every parameter retrieved
+    """
+    from botocore.exceptions import ClientError
+    values = {}
+    for i in range(0, len(names), SSM_BATCH_SIZE):
+        chunk = names[i:i + SSM_BATCH_SIZE]
+        instrument.count('requests', backend='_ssm')
+        try:
+            res = client.get_parameters(Names=chunk, WithDecryption=True)
+        except ClientError as err:
+            if 'AccessDeniedException' not in err.args[0]:
+                raise
+            # One denied name fails the whole request; get the rest one by one.
+            params = [_ssm_get_parameter(client, name) for name in chunk]
+            res = {'Parameters': [param for param in params if param is not None]}
+        for param in res.get('Parameters', []):
+            name = param['Name'] + param.get('Selector', '')
+            values[name] = param['Value']
+            if versions is not None:
+                versions[name] = param.get('Version')
+        for name in res.get('InvalidParameters', []):
+            LOG.warning('Unable to decrypt %s. Parameter does not exist or no access', name)
+    return values
+
+
+def _ssm_get_parameter(client, name):
+    """Get one parameter from ssm.
+
+    Returns:
+        dict: the parameter, or None if it does not exist or is denied
+    """
+    from botocore.exceptions import ClientError
+    instrument.count('requests', backend='_ssm')
+    try:
+        return client.get_parameter(Name=name, WithDecryption=True)['Parameter']
+    except ClientError as err:
+        if not any(code in err.args[0] for code in
+                   ('AccessDeniedException', 'ParameterNotFound', 'ParameterVersionNotFound')):
+            raise
+    LOG.warning('Unable to decrypt %s. Parameter does not exist or no access', name)
+    return None
+
+
+def _ssm_get_parameters_by_path(client, path):
+    """Get every parameter below path from ssm.
+
+    Returns:
+        dict: parameter name to value for every parameter retrieved
+    """
+    from botocore.exceptions import ClientError
+    values = {}
+    paginator = client.get_paginator('get_parameters_by_path')
+    try:
+        for page in paginator.paginate(Path=path, Recursive=True, WithDecryption=True):
+            instrument.count('requests', backend='_ssm')
+            for param in page.get('Parameters', []):
+                values[param['Name']] = param['Value']
+    except ClientError as err:
+        if 'AccessDeniedException' in err.args[0]:
+            LOG.warning('Unable to decrypt parameters under %s. Path does not exist or no access', path)
         else:
-            pass
-        return obj
+            raise
+    return values
 
-    aws_config = aws_config if aws_config is None else {}
+
+def _ssm_resolve(payloads, aws_config=None, ssm_path_prefixes=None, **options):
+    from botocore.exceptions import NoRegionError
     try:
-        aws = boto3.session.Session(**aws_config)
-        client = aws.client('kms')
+        client = aws.client('ssm', aws_config)
     except NoRegionError:
-        LOG.exception('Missing or invalid aws configuration. Will not be able to unpack KMS secrets.')
-        return cfg
-    return decrypt(cfg)
+        LOG.info('Missing or invalid aws configuration. Will not be able to unpack SSM parameters.')
+        return {}
+
+    values = {}
+    for path in ssm_path_prefixes or []:
+        prefix = path.rstrip('/') + '/'
+        if any(name.startswith(prefix) for name in payloads):
+            values.update(_ssm_get_parameters_by_path(client, path))
+    remaining = [name for name in payloads if name not in values]
+    values.update(_ssm_get_parameters(client, remaining))
+    return {name: values[name] for name in payloads if name in values}
 
 
-def ssm_decrypt(cfg, aws_config=None):
+def ssm_decrypt(cfg, aws_config=None, path_prefixes=None):
     """Decrypt/get ssm parameter store objects in configuration.
     Args:
         cfg (dict): configuration dictionary
@@ -197,6 +607,8 @@ def ssm_decrypt(cfg, aws_config=None):
                 aws_creds = {'aws_access_key_id': aws_access_key_id,
                              'aws_secret_access_key': aws_secret_access_key,
                              'region_name': 'us-east-1'}
+        path_prefixes (optional[list]): parameter paths to fetch with
+            GetParametersByPath; useful when many parameters share a prefix
 
     Returns:
         dict: decrypted configuration dictionary
@@ -218,40 +630,15 @@ def ssm_decrypt(cfg, aws_config=None):
 
         {'component': {'key': 'retrieved/decrypted value'}}
 
-
+    All references are collected first, then retrieved with GetParameters in
+    batches of ten, so a configuration makes one request per ten parameters
+    rather than one per parameter. Parameters under any of path_prefixes are
+    retrieved with GetParametersByPath instead.
     """
-    def decrypt(obj):
-        """Decrypt/get the object.
-
-        It is an inner function because we must first configure our ssm
-        client. Then we call this recursively on the object.
-        """
-        if isinstance(obj, list):
-            res_v = []
-            for item in obj:
-                res_v.append(decrypt(item))
-            return res_v
-        elif isinstance(obj, dict):
-            if '_ssm' in obj:
-                try:
-                    res = client.get_parameter(Name=obj['_ssm'], WithDecryption=True)
-                    obj = n(res['Parameter']['Value'])
-                except ClientError as err:
-                    if 'AccessDeniedException' in err.args[0]:
-                        LOG.warning('Unable to decrypt %s. Parameter does not exist or no access', obj['_ssm'])
-                    else:
-                        raise
-            else:
-                for k, v in obj.items():
-                    obj[k] = decrypt(v)
-        else:
-            pass
-        return obj
+    return resolve_secrets(cfg, markers=['_ssm'], aws_config=aws_config,
+                           ssm_path_prefixes=path_prefixes)
 
-    aws_config = aws_config if aws_config is None else {}
-    try:
-        aws = boto3.session.Session(**aws_config)
-        client = aws.client('ssm')
-    except NoRegionError:
-        LOG.info('Missing or invalid aws configuration. Will not be able to unpack KMS secrets.')
-    return decrypt(cfg)
+
+register_resolver('_gpg', _gpg_resolve, inline='BEGIN PGP', context=('gpg_config',))
+register_resolver('_kms', _kms_resolve, context=('aws_config',))
+register_resolver('_ssm', _ssm_resolve, context=('aws_config',))
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""Keep resolved secrets in an encrypted file for fast restarts.
+
+DiskSecretCache is a SecretCache that also writes its entries to a file.
+Entries are encrypted with AES-GCM under a data key from KMS. The file
+holds the data key encrypted by KMS, so a restart needs one KMS Decrypt
+call to read every cached secret, instead of one call per secret.
+
+Expired, corrupted, or tampered entries are ignored, and resolved live.
+This needs the cryptography package: pip install figgypy[disk-cache]
+"""
+from base64 import b64decode, b64encode
+import hashlib
+import hmac
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from figgypy import aws
+from figgypy.cache import MISSING, SecretCache
+from figgypy.exceptions import FiggypyError
+
+LOG = logging.getLogger(__name__)
+
+CRYPTO_IMPORTED = False
+try:
+    from cryptography.exceptions import InvalidTag
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    CRYPTO_IMPORTED = True
+except ImportError:
+    LOG.debug('Could not load cryptography. Will be unable to use a disk cache.')
+
+FORMAT_VERSION = 1
+
+
+class DiskSecretCache(SecretCache):
+    """SecretCache that persists its entries to an encrypted file.
+
+    Args:
+        path (str): cache file; created with mode 0600
+        key_id (str): KMS key id or alias used to create the data key
+        aws_config (optional[dict]): arguments passed into the boto3 session
+            used for the data key
+        ttl, maxsize, protect: see SecretCache; ttl is measured in wall
+            clock time, so it carries over restarts
+
+    Values that cannot be stored as json are kept in memory only.
+    """
+    def __init__(self, path, key_id, aws_config=None, ttl=300, maxsize=1024, protect=None):
+        if not CRYPTO_IMPORTED:
+            raise FiggypyError('cryptography is required for DiskSecretCache')
+        super(DiskSecretCache, self).__init__(ttl=ttl, maxsize=maxsize, protect=protect)
+        self.path = path
+        self.key_id = key_id
+        self.aws_config = aws_config if aws_config is not None else {}
+        self._data_key = None
+        self._encrypted_data_key = None
+        # Set when no data key can be had; the cache then works in memory only.
+        self._disabled = False
+        # entry id -> stored entry, for the entries on disk.
+        self._stored = {}
+        self._file_lock = threading.Lock()
+
+    def _now(self):
+        return time.time()
+
+    def _entry_id(self, key):
+        return hmac.new(self._data_key, repr(key).encode('utf-8'), hashlib.sha256).hexdigest()
+
+    def _kms(self):
+        return aws.client('kms', self.aws_config)
+
+    def _open(self):
+        """Read the cache file, or create a data key if it cannot be used.
+
+        Returns:
+            bool: True if the disk cache can be used
+        """
+        if self._data_key is not None or self._disabled:
+            return not self._disabled
+        stored = {}
+        try:
+            with open(self.path, 'r') as _fo:
+                contents = json.load(_fo)
+            if contents.get('version') != FORMAT_VERSION:
+                raise ValueError('unknown cache format')
+            encrypted_data_key = b64decode(contents['data_key'])
+            res = self._kms().decrypt(CiphertextBlob=encrypted_data_key)
+            self._data_key = res['Plaintext']
+            self._encrypted_data_key = encrypted_data_key
+            stored = contents.get('entries', {})
+        except (IOError, OSError):
+            LOG.debug('No disk cache at %s', self.path)
+        except (ValueError, KeyError, TypeError, AttributeError, ClientError, BotoCoreError) as err:
+            LOG.warning('Ignoring unusable disk cache %s: %s', self.path, err)
+        if self._data_key is None:
+            try:
+                res = self._kms().generate_data_key(KeyId=self.key_id, KeySpec='AES_256')
+            except (ClientError, BotoCoreError) as err:
+                LOG.warning('Unable to create a data key; disk cache disabled: %s', err)
+                self._disabled = True
+                return False
+            self._data_key = res['Plaintext']
+            self._encrypted_data_key = res['CiphertextBlob']
+            stored = {}
+        now = self._now()
+        self._stored = {
+            entry_id: entry for entry_id, entry in stored.items()
+            if isinstance(entry, dict) and (entry.get('expires') is None or entry['expires'] >= now)
+        }
+        return True
+
+    def _decrypt_entry(self, entry_id, entry):
+        try:
+            value = AESGCM(self._data_key).decrypt(
+                b64decode(entry['nonce']), b64decode(entry['value']), entry_id.encode('ascii'))
+            return json.loads(value.decode('utf-8'))
+        except (InvalidTag, ValueError, KeyError, TypeError) as err:
+            LOG.warning('Ignoring corrupted disk cache entry: %s', err)
+            return None
+
+    def get(self, key):
+        value = super(DiskSecretCache, self).get(key)
+        if value is not MISSING:
+            return value
+        with self._file_lock:
+            if not self._open():
+                return MISSING
+            entry_id = self._entry_id(key)
+            entry = self._stored.get(entry_id)
+            if entry is None:
+                return MISSING
+            if entry.get('expires') is not None and entry['expires'] < self._now():
+                del self._stored[entry_id]
+                return MISSING
+            value = self._decrypt_entry(entry_id, entry)
+            if value is None:
+                del self._stored[entry_id]
+                return MISSING
+        # Promote into memory, keeping the expiry from disk.
+        self._store(key, value, entry.get('expires'))
+        with self._lock:
+            self.misses -= 1
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self.set_many([(key, value)])
+
+    def set_many(self, items):
+        items = list(items)
+        for key, value in items:
+            SecretCache.set(self, key, value)
+        with self._file_lock:
+            if not self._open():
+                return
+            expires = self._now() + self.ttl if self.ttl is not None else None
+            for key, value in items:
+                try:
+                    plaintext = json.dumps(value).encode('utf-8')
+                except (TypeError, ValueError):
+                    continue
+                entry_id = self._entry_id(key)
+                nonce = os.urandom(12)
+                ciphertext = AESGCM(self._data_key).encrypt(nonce, plaintext, entry_id.encode('ascii'))
+                self._stored[entry_id] = {
+                    'expires': expires,
+                    'nonce': b64encode(nonce).decode('ascii'),
+                    'value': b64encode(ciphertext).decode('ascii'),
+                }
+            self._write()
+
+    def _write(self):
+        if len(self._stored) > self.maxsize:
+            by_expiry = sorted(self._stored.items(), key=lambda e: e[1].get('expires') or 0)
+            self._stored = dict(by_expiry[-self.maxsize:])
+        contents = {
+            'version': FORMAT_VERSION,
+            'data_key': b64encode(self._encrypted_data_key).decode('ascii'),
+            'entries': self._stored,
+        }
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.figgypy-cache-')
+        try:
+            with os.fdopen(fd, 'w') as _fo:
+                json.dump(contents, _fo)
+            os.chmod(tmp, 0o600)
+            os.replace(tmp, self.path)
+        except (IOError, OSError) as err:
+            LOG.warning('Unable to write disk cache %s: %s', self.path, err)
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    def invalidate(self, marker=None, payload=None):
+        """Drop matching entries from memory, and every entry from disk.
+
+        Entry ids on disk are keyed hashes, so they cannot be matched by
+        marker or payload; the file is cleared instead.
+        """
+        super(DiskSecretCache, self).invalidate(marker, payload)
+        with self._file_lock:
+            if self._data_key is not None:
+                self._stored = {}
+                self._write()
+            else:
+                try:
+                    os.remove(self.path)
+                except OSError:
+                    pass
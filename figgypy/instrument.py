@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""Time the stages of loading a configuration.
+
+Loading records spans, like finding, reading, and parsing the file and
+resolving each secret backend, and counts, like backend requests, bytes,
+and secret cache hits. Each load collects them in a LoadReport, which
+Config.load_report returns. Hooks added with add_hook receive them as
+they happen, for sending to statsd, OpenTelemetry, or anything else:
+
+    figgypy.instrument.add_hook(StatsdHook(statsd.StatsClient()))
+
+Only the load and reload paths are instrumented, not reading values.
+With no hook added, the cost is a few clock reads per stage of a load.
+"""
+import logging
+import threading
+import time
+
+LOG = logging.getLogger(__name__)
+
+# Hooks receiving every span and count, in the order added.
+HOOKS = []
+_local = threading.local()
+
+
+class Hook(object):
+    """Receives spans and counts; subclasses override what they need.
+
+    name is like 'parse' or 'resolve', and tags is a dict, like
+    {'backend': '_kms'}. Hooks are called from the thread doing the work,
+    which may be a worker thread of a backend.
+    """
+    def span(self, name, start, duration, tags):
+        """A stage that started at start (time.time()) and took duration seconds."""
+
+    def count(self, name, value, tags):
+        """value more of name, like 3 'requests'."""
+
+
+class StatsdHook(Hook):
+    """Send spans as timers and counts as counters to a statsd client.
+
+    Args:
+        client: has timing(stat, milliseconds) and incr(stat, count), like
+            statsd.StatsClient
+        prefix (optional[str]): prepended to every stat name
+
+    The backend tag is added to the name, as in 'figgypy.resolve.kms'.
+    """
+    def __init__(self, client, prefix='figgypy'):
+        self.client = client
+        self.prefix = prefix
+
+    def _stat(self, name, tags):
+        parts = [self.prefix, name]
+        if 'backend' in tags:
+            parts.append(tags['backend'].lstrip('_'))
+        return '.'.join(p for p in parts if p)
+
+    def span(self, name, start, duration, tags):
+        self.client.timing(self._stat(name, tags), duration * 1000.0)
+
+    def count(self, name, value, tags):
+        self.client.incr(self._stat(name, tags), value)
+
+
+class OpenTelemetryHook(Hook):
+    """Record spans and counts with OpenTelemetry.
+
+    Args:
+        tracer (optional): an opentelemetry Tracer; spans are not recorded
+            without one
+        meter (optional): an opentelemetry Meter; counts are not recorded
+            without one
+    """
+    def __init__(self, tracer=None, meter=None):
+        self.tracer = tracer
+        self.meter = meter
+        self._counters = {}
+
+    def span(self, name, start, duration, tags):
+        if self.tracer is not None:
+            started = int(start * 1e9)
+            span = self.tracer.start_span('figgypy.' + name, start_time=started, attributes=tags)
+            span.end(end_time=started + int(duration * 1e9))
+
+    def count(self, name, value, tags):
+        if self.meter is not None:
+            counter = self._counters.get(name)
+            if counter is None:
+                counter = self._counters[name] = self.meter.create_counter('figgypy.' + name)
+            counter.add(value, attributes=tags)
+
+
+def add_hook(hook):
+    """Send spans and counts to hook from now on. Returns hook."""
+    HOOKS.append(hook)
+    return hook
+
+
+def remove_hook(hook):
+    HOOKS.remove(hook)
+
+
+class LoadReport(object):
+    """Spans and counts recorded during one load.
+
+    Backends record from their worker threads too, so adding is locked.
+    """
+    def __init__(self):
+        self.start = time.time()
+        self.duration = None
+        # (name, start, duration, tags)
+        self.spans = []
+        # (name, backend) -> total
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, name, start, duration, tags):
+        with self._lock:
+            self.spans.append((name, start, duration, tags))
+
+    def add_count(self, name, value, tags):
+        key = (name, tags.get('backend'))
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + value
+
+    def as_dict(self):
+        """Summarize the load.
+
+        Returns:
+            dict: with
+                seconds: the whole load
+                stages: stage name -> seconds, summed over repeats
+                backends: backend marker -> dict of seconds, requests,
+                    payloads, bytes_sent, bytes_received, cache_hits,
+                    cache_misses, and cache_hit_rate (None without lookups)
+                counts: other counts by name
+        """
+        stages, backends, counts = {}, {}, {}
+        for name, _, duration, tags in self.spans:
+            backend = tags.get('backend')
+            if backend is None:
+                stages[name] = stages.get(name, 0.0) + duration
+            else:
+                stats = backends.setdefault(backend, {})
+                stats['seconds'] = stats.get('seconds', 0.0) + duration
+        for (name, backend), value in self.counts.items():
+            if backend is None:
+                counts[name] = value
+            else:
+                stats = backends.setdefault(backend, {})
+                stats[name] = stats.get(name, 0) + value
+        for stats in backends.values():
+            for key in ('seconds', 'requests', 'payloads', 'bytes_sent', 'bytes_received',
+                        'cache_hits', 'cache_misses'):
+                stats.setdefault(key, 0)
+            lookups = stats['cache_hits'] + stats['cache_misses']
+            stats['cache_hit_rate'] = stats['cache_hits'] / float(lookups) if lookups else None
+        return {'seconds': self.duration, 'stages': stages, 'backends': backends,
+                'counts': counts}
+
+
+def current():
+    """The LoadReport being recorded in this thread, or None."""
+    return getattr(_local, 'report', None)
+
+
+def active():
+    """True if anything would receive a span or count from this thread."""
+    return bool(HOOKS) or getattr(_local, 'report', None) is not None
+
+
+class recording(object):
+    """Record spans and counts in this thread into a LoadReport.
+
+        with recording() as report:
+            ...
+
+    Inside another recording block, the outer report is used, so a load
+    made of several steps is one report. report.duration is set on exit.
+    """
+    __slots__ = ('report', '_outer', '_owner')
+
+    def __init__(self, report=None):
+        self._outer = current()
+        self._owner = report is None and self._outer is None
+        self.report = report or self._outer or LoadReport()
+
+    def __enter__(self):
+        _local.report = self.report
+        return self.report
+
+    def __exit__(self, *exc):
+        _local.report = self._outer
+        if self._owner:
+            self.report.duration = time.time() - self.report.start
+
+
+def bind(func, report=None):
+    """Wrap func to record into this thread's report from another thread."""
+    report = report or current()
+    if report is None:
+        return func
+
+    def bound(*args, **kwargs):
+        with recording(report):
+            return func(*args, **kwargs)
+    return bound
+
+
+class _Span(object):
+    __slots__ = ('name', 'tags', 'start', '_clock')
+
+    def __init__(self, name, tags):
+        self.name = name
+        self.tags = tags
+
+    def __enter__(self):
+        self.start = time.time()
+        self._clock = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        emit_span(self.name, self.start, time.perf_counter() - self._clock, self.tags)
+
+
+class _NoSpan(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name, **tags):
+    """Time a with block as a span, if anything is recording."""
+    if not HOOKS and getattr(_local, 'report', None) is None:
+        return _NO_SPAN
+    return _Span(name, tags)
+
+
+def emit_span(name, start, duration, tags):
+    report = getattr(_local, 'report', None)
+    if report is not None:
+        report.add_span(name, start, duration, tags)
+    for hook in HOOKS:
+        try:
+            hook.span(name, start, duration, tags)
+        except Exception:
+            LOG.exception('Error in instrumentation hook')
+
+
+def count(name, value=1, **tags):
+    """Add value to the count name, if anything is recording."""
+    report = getattr(_local, 'report', None)
+    if report is not None:
+        report.add_count(name, value, tags)
+    for hook in HOOKS:
+        try:
+            hook.count(name, value, tags)
+        except Exception:
+            LOG.exception('Error in instrumentation hook')
@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+"""Merge configuration from several sources.
+
+A layered Config reads an ordered list of sources, such as a base file,
+an environment file, a host file, and environment variables. Later layers
+take precedence: mappings are merged key by key, and any other value in a
+later layer replaces the one below it.
+
+Each layer keeps its own parsed and resolved tree, so when one layer
+changes only that layer is resolved again. MergedView looks keys up
+through the layers like collections.ChainMap, merging a subtree only when
+it is first read. materialize builds one level of the merged dict:
+subtrees from a single layer are shared with it, and subtrees several
+layers define are LazySubtree placeholders, merged when first read. Config
+changes values by copying the containers it writes to, never in place, so
+sharing them with the layers is safe.
+"""
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+import os
+
+from figgypy import instrument
+from figgypy.decrypt import find_secrets, might_contain_secrets, resolve_secrets, secret_paths
+from figgypy.exceptions import FiggypyError
+from figgypy.lazy import LazyDict, LazySubtree, _node, defer_secrets, pending_paths
+from figgypy.loader import loads
+from figgypy.search import find_file
+from figgypy.snapshot import copy_paths
+
+
+class Layer(object):
+    """One source of configuration values.
+
+    Args:
+        name (str): shown by Config.provenance
+
+    Subclasses implement read, returning the parsed values and the raw
+    text if there is any.
+    """
+    def __init__(self, name):
+        self.name = name
+        # Values as read, with secret references in place.
+        self.raw = {}
+        # Values with secrets resolved or deferred.
+        self.values = {}
+        self.secret_refs = {}
+        # Key paths that still hold references after resolving.
+        self.secret_paths = []
+
+    def __repr__(self):
+        return '<{} {}>'.format(type(self).__name__, self.name)
+
+    def read(self):
+        raise NotImplementedError
+
+    def load(self):
+        """Read the source again and index its secret references."""
+        with instrument.span('read', layer=self.name):
+            values, text = self.read()
+        with instrument.span('index', layer=self.name):
+            if text is None or might_contain_secrets(text):
+                found = find_secrets(values)
+            else:
+                found = []
+        self.raw = values
+        self.values = values
+        self.secret_refs = {ref[0]: ref[3:] for ref in found}
+        self.secret_paths = [ref[0] for ref in found]
+
+    def resolve(self, markers, options, lazy=False):
+        """Resolve this layer's secrets into values, leaving raw unchanged."""
+        paths = list(self.secret_refs)
+        if not paths:
+            self.values, self.secret_paths = self.raw, []
+            return
+        values = copy_paths(self.raw, paths)
+        if lazy:
+            values = defer_secrets(values, markers, paths, **options)
+            self.secret_paths = pending_paths(values, paths)
+        else:
+            resolve_secrets(values, markers, paths, **options)
+            self.secret_paths = secret_paths(values, paths=paths)
+        self.values = values
+
+
+class FileLayer(Layer):
+    """Values from a configuration file.
+
+    Args:
+        path (str): file to read; see Config.config_file for how relative
+            names are found
+        optional (optional[bool]): treat a missing file as empty
+        search_path (optional[list]): directories to find path in; defaults
+            to the search path of the Config it is added to
+    """
+    def __init__(self, path, optional=False, search_path=None):
+        super(FileLayer, self).__init__(path)
+        self.path = path
+        self.optional = optional
+        self.search_path = search_path
+        # Where path was found; None until found.
+        self.found = None
+
+    def read(self):
+        try:
+            self.found = find_file(self.path, self.search_path)
+            with open(self.found, 'r') as _fo:
+                text = _fo.read()
+        except (IOError, FiggypyError):
+            if self.optional:
+                return {}, ''
+            raise FiggypyError('could not open configuration file {}'.format(self.path))
+        return loads(text, filename=self.found), text
+
+
+class DictLayer(Layer):
+    """Values from a dict, such as defaults set in code."""
+    def __init__(self, values, name='dict'):
+        super(DictLayer, self).__init__(name)
+        self.source = values
+
+    def read(self):
+        return self.source, None
+
+
+class EnvLayer(Layer):
+    """Values from environment variables.
+
+    Args:
+        prefix (str): only read variables starting with this, like 'MYAPP_'
+        separator (optional[str]): splits a name into nested keys
+            defaults to '__', so MYAPP_DB__HOST sets db.host
+        environ (optional[dict]): read from this instead of os.environ
+
+    Keys are lower cased and values are kept as strings.
+    """
+    def __init__(self, prefix, separator='__', environ=None):
+        super(EnvLayer, self).__init__('env:{}'.format(prefix))
+        self.prefix = prefix
+        self.separator = separator
+        self.environ = environ
+
+    def read(self):
+        environ = self.environ if self.environ is not None else os.environ
+        values = {}
+        for name in sorted(environ):
+            if not name.startswith(self.prefix) or name == self.prefix:
+                continue
+            keys = name[len(self.prefix):].lower().split(self.separator)
+            node = values
+            for key in keys[:-1]:
+                child = node.get(key)
+                if not isinstance(child, dict):
+                    child = node[key] = {}
+                node = child
+            node[keys[-1]] = environ[name]
+        return values, None
+
+
+def as_layer(source):
+    """Make a Layer from a file name, a dict, or a Layer."""
+    if isinstance(source, Layer):
+        return source
+    if isinstance(source, dict):
+        return DictLayer(source)
+    if isinstance(source, str):
+        return FileLayer(source)
+    raise FiggypyError('unsupported configuration source {!r}'.format(source))
+
+
+class MergedView(Mapping):
+    """Read only merge of several mappings, looked up like a ChainMap.
+
+    Args:
+        maps (list): mappings, highest precedence first
+        names (list): a label for each mapping, returned by provenance
+
+    A key defined as a mapping in several layers reads as another
+    MergedView of those mappings, built on first read and kept. Values are
+    read without resolving lazy secrets.
+    """
+    def __init__(self, maps, names):
+        self.maps = maps
+        self.names = names
+        self._children = {}
+
+    def _layers(self, key):
+        """(value, name) for each layer defining key, highest first."""
+        return [(dict.__getitem__(m, key), name)
+                for m, name in zip(self.maps, self.names) if key in m]
+
+    def __getitem__(self, key):
+        child = self._children.get(key)
+        if child is not None:
+            return child
+        found = self._layers(key)
+        if not found:
+            raise KeyError(key)
+        dicts = []
+        for value, name in found:
+            if not isinstance(value, dict):
+                break
+            dicts.append((value, name))
+        if len(dicts) > 1:
+            child = self._children[key] = MergedView([d[0] for d in dicts], [d[1] for d in dicts])
+            return child
+        return found[0][0]
+
+    def __iter__(self):
+        seen = set()
+        for m in reversed(self.maps):
+            for key in m:
+                if key not in seen:
+                    seen.add(key)
+                    yield key
+
+    def __len__(self):
+        return len(set().union(*self.maps))
+
+    def __contains__(self, key):
+        return any(key in m for m in self.maps)
+
+    def provenance(self, keys):
+        """Label of the mapping the value at the key path keys comes from.
+
+        For a mapping merged from several layers, the highest one is named.
+        Raises KeyError if there is no value at keys.
+        """
+        view = self
+        for i, key in enumerate(keys):
+            found = view._layers(key)
+            if not found:
+                raise KeyError(key)
+            value = view[key]
+            if not isinstance(value, MergedView) or i == len(keys) - 1:
+                if _node(found[0][0], keys[i + 1:]) is None:
+                    raise KeyError(keys)
+                return found[0][1]
+            view = value
+        raise KeyError(keys)
+
+    def leaves(self, prefix=()):
+        """Map the key path of every leaf value to the label of its mapping."""
+        result = {}
+        for key in self:
+            value = self[key]
+            path = prefix + (key,)
+            if isinstance(value, MergedView):
+                result.update(value.leaves(path))
+            else:
+                name = self._layers(key)[0][1]
+                for leaf in _leaf_paths(value, path):
+                    result[leaf] = name
+        return result
+
+    def materialize(self, deep=False):
+        """Build the merged dict.
+
+        Args:
+            deep (optional[bool]): merge every subtree now, instead of
+                leaving LazySubtree placeholders for those that several
+                layers define
+
+        Returns:
+            dict: a LazyDict if it holds placeholders; subtrees from a
+                single layer are shared with it, and lazy secrets are not
+                resolved
+        """
+        items, lazy = [], any(isinstance(m, LazyDict) for m in self.maps)
+        for key in self:
+            value = self[key]
+            if isinstance(value, MergedView):
+                if deep:
+                    value = value.materialize(deep)
+                else:
+                    value, lazy = LazySubtree(value), True
+            items.append((key, value))
+        merged = LazyDict() if lazy else {}
+        for key, value in items:
+            dict.__setitem__(merged, key, value)
+        return merged
+
+
+def _leaf_paths(value, path):
+    if isinstance(value, dict) and value:
+        paths = []
+        for k, v in dict.items(value):
+            paths.extend(_leaf_paths(v, path + (k,)))
+        return paths
+    if isinstance(value, list) and value:
+        paths = []
+        for i, v in enumerate(list.__iter__(value)):
+            paths.extend(_leaf_paths(v, path + (i,)))
+        return paths
+    return [path]
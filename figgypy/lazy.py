@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""Resolve secrets on first access instead of when loading.
+
+In lazy mode each reference in the configuration is replaced with a
+LazySecret placeholder, and the containers holding them with LazyDict and
+LazyList. Reading a placeholder through one of those containers resolves
+it, memoizes the result, and puts the value in place of the placeholder.
+Comparing a lazy container resolves everything in it.
+"""
+import os
+import threading
+import weakref
+
+from figgypy.decrypt import _child, find_secrets, resolve_payloads
+
+# LazySecrets not resolved yet, so that a forked child can give each a new
+# lock.
+_UNRESOLVED = weakref.WeakSet()
+
+
+class LazySecret(object):
+    """A secret reference that is resolved the first time it is read.
+
+    Args:
+        marker (str): resolver marker, like '_kms'
+        payload: what the resolver resolves, like the ciphertext
+        node: the original reference, kept if resolution fails
+        options (dict): options for the resolver, see resolve_secrets
+    """
+    __slots__ = ('marker', 'payload', 'node', 'options', '_lock', '_resolved', '_value',
+                 '__weakref__')
+
+    def __init__(self, marker, payload, node, options):
+        self.marker = marker
+        self.payload = payload
+        self.node = node
+        self.options = options
+        self._lock = threading.Lock()
+        self._resolved = False
+        self._value = None
+        _UNRESOLVED.add(self)
+
+    def __repr__(self):
+        return '<LazySecret {} {}>'.format(
+            self.marker, 'resolved' if self._resolved else 'unresolved')
+
+    @property
+    def resolved(self):
+        return self._resolved
+
+    def resolve(self):
+        """Resolve the secret once; later and concurrent calls share the value."""
+        if not self._resolved:
+            with self._lock:
+                if not self._resolved:
+                    values = resolve_payloads(self.marker, [self.payload], **self.options)
+                    self._value = values[self.payload] if self.payload in values else self.node
+                    self._resolved = True
+                    _UNRESOLVED.discard(self)
+        return self._value
+
+
+class LazySubtree(LazySecret):
+    """A subtree built the first time it is read.
+
+    Args:
+        node: what the subtree is built from, with a materialize method,
+            like figgypy.layers.MergedView; kept after it is built
+
+    Containers and snapshots read it like a LazySecret, but it is never
+    sent to a resolver.
+    """
+    __slots__ = ()
+
+    def __init__(self, node):
+        super(LazySubtree, self).__init__(None, None, node, None)
+
+    def __repr__(self):
+        return '<LazySubtree {}>'.format('built' if self._resolved else 'not built')
+
+    def resolve(self):
+        """Build the subtree once; later and concurrent calls share it."""
+        if not self._resolved:
+            with self._lock:
+                if not self._resolved:
+                    self._value = self.node.materialize()
+                    self._resolved = True
+                    _UNRESOLVED.discard(self)
+        return self._value
+
+
+class LazyDict(dict):
+    """dict that resolves LazySecret values as they are read.
+
+    __iter__ is overridden so that dict(), {**d}, f(**d), and update
+    go through __getitem__ rather than copying the placeholders.
+    """
+
+    def _resolve(self, key, value):
+        if isinstance(value, LazySecret):
+            value = value.resolve()
+            dict.__setitem__(self, key, value)
+        return value
+
+    def __getitem__(self, key):
+        return self._resolve(key, dict.__getitem__(self, key))
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def items(self):
+        return [(k, self[k]) for k in self]
+
+    def values(self):
+        return [self[k] for k in self]
+
+    def __iter__(self):
+        return dict.__iter__(self)
+
+    def pop(self, key, *args):
+        value = dict.pop(self, key, *args)
+        return value.resolve() if isinstance(value, LazySecret) else value
+
+    def copy(self):
+        return dict(self.items())
+
+    def __reduce__(self):
+        return (LazyDict, (dict(self.items()),))
+
+    def __repr__(self):
+        # Subtrees are built to show them; secrets are left unresolved.
+        return repr({k: v.resolve() if isinstance(v, LazySubtree) else v
+                     for k, v in dict.items(self)})
+
+    def __eq__(self, other):
+        return dict(self.items()) == other
+
+    def __ne__(self, other):
+        return not self == other
+
+
+class LazyList(list):
+    """list that resolves LazySecret items as they are read."""
+
+    def _resolve(self, index, value):
+        if isinstance(value, LazySecret):
+            value = value.resolve()
+            list.__setitem__(self, index, value)
+        return value
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self._resolve(index, list.__getitem__(self, index))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def pop(self, *args):
+        value = list.pop(self, *args)
+        return value.resolve() if isinstance(value, LazySecret) else value
+
+    def copy(self):
+        return list(self)
+
+    def __reduce__(self):
+        return (LazyList, (list(self),))
+
+    def __eq__(self, other):
+        return list(self) == other
+
+    def __ne__(self, other):
+        return not self == other
+
+
+def _set_child(obj, key, value):
+    """Set obj[key] without resolving anything."""
+    if isinstance(obj, dict):
+        dict.__setitem__(obj, key, value)
+    else:
+        list.__setitem__(obj, key, value)
+
+
+def _node(cfg, path):
+    """Get the object at path without resolving any secret.
+
+    A LazySubtree on the way is built, but left in its container.
+
+    Returns:
+        tuple: (parent, obj), or None if path does not exist
+    """
+    parent, obj = None, cfg
+    try:
+        for key in path:
+            if isinstance(obj, LazySubtree):
+                obj = obj.resolve()
+            parent, obj = obj, _child(obj, key)
+    except (KeyError, IndexError, TypeError):
+        return None
+    return parent, obj
+
+
+def _lazy_container(obj):
+    if isinstance(obj, (LazyDict, LazyList)):
+        return obj
+    if isinstance(obj, dict):
+        return LazyDict(obj)
+    return LazyList(obj)
+
+
+def defer_secrets(cfg, markers=None, paths=None, **options):
+    """Replace references in cfg with LazySecret placeholders.
+
+    Args:
+        cfg (dict): configuration dictionary
+        markers (optional[list]): only defer these markers
+        paths (optional[list]): only look at these key paths
+        options: passed to the resolver when a placeholder is read
+
+    Returns:
+        LazyDict: the configuration, with every container on the way to a
+            placeholder converted to LazyDict or LazyList
+
+    Placeholders left unresolved by an earlier call are replaced, so they
+    resolve with the current options.
+    """
+    for path in paths or []:
+        found = _node(cfg, path)
+        if found is None:
+            continue
+        parent, obj = found
+        if isinstance(obj, LazySecret) and not obj.resolved and parent is not None:
+            _set_child(parent, path[-1], obj.node)
+
+    cfg = _lazy_container(cfg)
+    for path, _, _, marker, payload in find_secrets(cfg, markers, paths):
+        if not path:
+            continue
+        parent = cfg
+        for key in path[:-1]:
+            child = _lazy_container(_child(parent, key))
+            _set_child(parent, key, child)
+            parent = child
+        node = _child(parent, path[-1])
+        _set_child(parent, path[-1], LazySecret(marker, payload, node, options))
+    return cfg
+
+
+def pending_paths(cfg, paths):
+    """Paths that still hold a reference or an unresolved placeholder."""
+    pending = []
+    for path in paths:
+        found = _node(cfg, path)
+        if found is None:
+            continue
+        obj = found[1]
+        if isinstance(obj, LazySecret):
+            if not obj.resolved:
+                pending.append(path)
+        elif find_secrets(obj):
+            pending.append(path)
+    return pending
+
+
+def _after_fork():
+    """Give unresolved placeholders in a forked child new locks.
+
+    A placeholder may have been resolving in another thread of the parent
+    when it forked, and its lock would then never be released in the child.
+    """
+    for secret in list(_UNRESOLVED):
+        secret._lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""Load configuration files into python objects.
+
+Each file is read once and parsed once, directly into the structure used
+by Config.values. The format is detected from the file extension when
+possible, and from the content otherwise.
+"""
+import json
+import logging
+
+import yaml
+
+from figgypy.exceptions import FiggypyError
+
+LOG = logging.getLogger(__name__)
+
+# The tags yaml.full_load accepts, as Config always has, in libyaml when it
+# is available.
+try:
+    from yaml import CFullLoader as YamlLoader
+except ImportError:
+    from yaml import FullLoader as YamlLoader
+
+# xmltodict pulls in urllib and the sax modules, so it is only imported
+# when an xml file is loaded. XML_IMPORTED is None until then.
+xmltodict = None
+XML_IMPORTED = None
+
+
+def _import_xmltodict():
+    global xmltodict, XML_IMPORTED
+    if XML_IMPORTED is None:
+        try:
+            import xmltodict as _xmltodict
+            xmltodict = _xmltodict
+            XML_IMPORTED = True
+        except ImportError:
+            LOG.debug('Could not load xmltodict. Will be unable to load xml.')
+            XML_IMPORTED = False
+    return XML_IMPORTED
+
+JSON = 'json'
+XML = 'xml'
+YAML = 'yaml'
+
+EXTENSIONS = {
+    '.json': JSON,
+    '.xml': XML,
+    '.yaml': YAML,
+    '.yml': YAML,
+}
+
+# Root element added when a multi-key dictionary was serialized to xml.
+XML_ROOT = 'SERIAROOT'
+
+
+def detect_format(text, filename=None):
+    """Detect the format of configuration text.
+
+    Args:
+        text (str): configuration file contents
+        filename (optional[str]): file name, used for the extension
+
+    Returns:
+        str: one of 'json', 'xml', or 'yaml'
+
+    The extension wins when it is known. Otherwise the first significant
+    character decides; anything that is not xml or json is parsed as yaml,
+    which is a superset of json anyway.
+    """
+    if filename is not None:
+        for ext, fmt in EXTENSIONS.items():
+            if filename.lower().endswith(ext):
+                return fmt
+    stripped = text.lstrip()
+    if stripped.startswith('<'):
+        return XML
+    if stripped.startswith(('{', '[')):
+        return JSON
+    return YAML
+
+
+def _str_to_num(value):
+    """Convert a string to int or float if it round trips exactly."""
+    try:
+        if str(int(value)) == value:
+            return int(value)
+    except ValueError:
+        pass
+    try:
+        if str(float(value)) == value:
+            return float(value)
+    except ValueError:
+        pass
+    return value
+
+
+def _xml_postprocessor(path, key, value):
+    if isinstance(value, str):
+        value = _str_to_num(value)
+    return key, value
+
+
+def _load_json(text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        # Not strict json; yaml accepts the relaxed forms.
+        return _load_yaml(text)
+
+
+def _load_xml(text):
+    if not _import_xmltodict():
+        raise FiggypyError('xmltodict is required to load xml configuration')
+    values = xmltodict.parse(text, postprocessor=_xml_postprocessor)
+    if XML_ROOT in values:
+        values = values[XML_ROOT]
+    return values
+
+
+def _load_yaml(text):
+    return yaml.load(text, Loader=YamlLoader)
+
+
+_LOADERS = {
+    JSON: _load_json,
+    XML: _load_xml,
+    YAML: _load_yaml,
+}
+
+
+def loads(text, fmt=None, filename=None):
+    """Parse configuration text.
+
+    Args:
+        text (str): configuration file contents
+        fmt (optional[str]): 'json', 'xml', or 'yaml'; detected if omitted
+        filename (optional[str]): file name, used to detect the format
+
+    Returns:
+        dict: configuration dictionary
+    """
+    if fmt is None:
+        fmt = detect_format(text, filename)
+    try:
+        loader = _LOADERS[fmt]
+    except KeyError:
+        raise FiggypyError('unsupported configuration format {}'.format(fmt))
+    try:
+        values = loader(text)
+    except FiggypyError:
+        raise
+    except Exception as err:
+        raise FiggypyError('could not parse configuration: {}'.format(err))
+    if values is None:
+        return {}
+    if not isinstance(values, dict):
+        raise FiggypyError('configuration must be a mapping at the top level')
+    return values
+
+
+def load(f, fmt=None):
+    """Read and parse a configuration file.
+
+    Args:
+        f (str): path to the configuration file
+        fmt (optional[str]): 'json', 'xml', or 'yaml'; detected if omitted
+
+    Returns:
+        dict: configuration dictionary
+
+    Raises IOError if the file cannot be read.
+    """
+    with open(f, 'r') as _fo:
+        text = _fo.read()
+    return loads(text, fmt=fmt, filename=f)
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""Look up nested values with key path strings.
+
+A key path names a value below the top level, like 'db.replicas[0].host'.
+Keys are separated by dots, list indexes go in brackets, and keys that
+contain dots or brackets can be quoted in brackets: "hosts['a.example']".
+Paths are compiled to tuples of keys once, and the compiled form is cached.
+
+Config keeps a PathIndex from each key path read to its value, so a
+repeated lookup is a dict lookup rather than a walk. Nothing is indexed
+up front; a path is walked the first time it is read.
+"""
+from functools import lru_cache
+import re
+
+from figgypy.cache import MISSING
+from figgypy.compact import CompactDict
+from figgypy.exceptions import FiggypyError
+from figgypy.lazy import LazySecret
+
+_FIRST = re.compile(r'[^.\[\]]+')
+_TOKEN = re.compile(r"""
+    \.(?P<key>[^.\[\]]+)                  # .key
+    | \[(?P<index>-?\d+)\]                # [0]
+    | \[(?P<quote>['"])(?P<quoted>.*?)(?P=quote)\]  # ['key.with.dots']
+""", re.VERBOSE)
+
+
+def is_path(key):
+    """True if key is a key path string rather than a plain key."""
+    return isinstance(key, str) and ('.' in key or '[' in key)
+
+
+@lru_cache(maxsize=4096)
+def compile_path(path):
+    """Compile a key path string to a tuple of keys.
+
+    Args:
+        path (str): key path, like 'db.replicas[0].host'
+
+    Returns:
+        tuple: keys and indexes, like ('db', 'replicas', 0, 'host')
+    """
+    keys, pos = [], 0
+    first = _FIRST.match(path)
+    if first is not None:
+        keys, pos = [first.group()], first.end()
+    elif not path.startswith('['):
+        raise FiggypyError('invalid key path {!r} at 0'.format(path))
+    while pos < len(path):
+        match = _TOKEN.match(path, pos)
+        if match is None or match.end() == pos:
+            raise FiggypyError('invalid key path {!r} at {}'.format(path, pos))
+        if match.group('key') is not None:
+            keys.append(match.group('key'))
+        elif match.group('index') is not None:
+            keys.append(int(match.group('index')))
+        else:
+            keys.append(match.group('quoted'))
+        pos = match.end()
+    return tuple(keys)
+
+
+def find_node(tree, keys):
+    """Get the node at keys without resolving lazy placeholders.
+
+    Returns:
+        the node, or MISSING if keys lead out of the dicts and lists of
+        tree, such as into a placeholder or a string, or do not exist
+    """
+    node = tree
+    try:
+        for key in keys:
+            if isinstance(node, dict):
+                node = dict.__getitem__(node, key)
+            elif isinstance(node, list):
+                node = list.__getitem__(node, key)
+            elif isinstance(node, tuple):
+                # FrozenList, in a prefork snapshot.
+                node = tuple.__getitem__(node, key)
+            else:
+                return MISSING
+    except (KeyError, IndexError, TypeError):
+        return MISSING
+    return node
+
+
+def descend(tree, keys, default=None):
+    """Get the value at keys by indexing each level, or default."""
+    value = tree
+    try:
+        for key in keys:
+            value = value[key]
+    except (KeyError, IndexError, TypeError):
+        return default
+    return value
+
+
+class PathIndex(object):
+    """Key path lookups into one values tree.
+
+    Args:
+        values (dict): configuration values; the index is only valid while
+            they are not changed in place
+        hits (optional[dict]): key path string -> node, to start with
+
+    Paths found once are remembered by their string in hits, so repeated
+    lookups are a single dict lookup. Compact values are descended with
+    CompactDict.descend instead; see figgypy.compact.
+    """
+    __slots__ = ('values', 'hits')
+
+    def __init__(self, values, hits=None):
+        self.values = values
+        self.hits = {} if hits is None else hits
+
+    def updated(self, values, keys):
+        """Index values, which differs from self.values only at keys."""
+        keys = set(keys)
+        return PathIndex(values, {path: node for path, node in self.hits.items()
+                                  if compile_path(path)[0] not in keys})
+
+    def get(self, key, default=None):
+        """Get the value at a top level key or key path, or default."""
+        node = self.hits.get(key, MISSING)
+        if node is MISSING:
+            values = self.values
+            if not is_path(key) or key in values:
+                return values.get(key, default)
+            keys = compile_path(key)
+            if isinstance(values, CompactDict):
+                node = values.descend(keys, MISSING)
+            else:
+                node = find_node(values, keys)
+            if node is MISSING:
+                # Through a placeholder, which reading resolves, or missing.
+                return descend(values, keys, default)
+            self.hits[key] = node
+        return node.resolve() if isinstance(node, LazySecret) else node
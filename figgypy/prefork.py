@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""Share one resolved configuration with pre-forked workers.
+
+Servers like gunicorn and uwsgi, and multiprocessing with the fork start
+method, load the application in a master process and fork workers from it.
+prepare resolves every secret of a Config once in the master and makes it
+read-only, so each worker uses the inherited copy instead of decrypting
+everything again:
+
+    cfg = figgypy.Config('config.yaml', lazy=True)
+    figgypy.prefork.prepare(cfg)  # or cfg.prefork()
+    # fork workers
+
+Values become FrozenDict and FrozenList trees, which are never written
+after forking. With freeze_gc=True, prepare then moves everything to the
+permanent generation with gc.freeze, so the garbage collector in the
+workers does not write to the pages holding them, and they stay shared by
+copy on write. gc.freeze applies to every object in the process, not just
+the configuration, so it is left to the application to ask for.
+
+In a forked child, figgypy starts with new locks, including those of
+secret caches and lazy placeholders, an empty boto3 client pool, and no
+gpg handles, since those of the parent are not safe to use.
+Background watching and SSM refresh are stopped by prepare; start them
+again in a worker if it needs them.
+"""
+import gc
+import logging
+import os
+import threading
+import weakref
+
+from figgypy.decrypt import resolve_payloads
+from figgypy.lazy import LazySecret, LazySubtree
+from figgypy.snapshot import FrozenDict, FrozenList
+
+LOG = logging.getLogger(__name__)
+
+# Configs prepared in this process, reset in forked children.
+_PREPARED = weakref.WeakSet()
+
+
+def _placeholders(obj, found):
+    """Collect the unresolved LazySecrets in obj, grouped for resolving."""
+    if isinstance(obj, LazySubtree):
+        _placeholders(obj.resolve(), found)
+    elif isinstance(obj, LazySecret):
+        if not obj.resolved:
+            found.setdefault((obj.marker, id(obj.options)), []).append(obj)
+    elif isinstance(obj, dict):
+        for value in dict.values(obj):
+            _placeholders(value, found)
+    elif isinstance(obj, (list, tuple)):
+        for value in (list.__iter__(obj) if isinstance(obj, list) else tuple.__iter__(obj)):
+            _placeholders(value, found)
+
+
+def _rebuild(obj, resolved):
+    """Build a frozen copy of obj with every placeholder replaced."""
+    if isinstance(obj, LazySecret):
+        if obj.resolved:
+            return _rebuild(obj.resolve(), resolved)
+        return _rebuild(resolved.get(id(obj), obj.node), resolved)
+    if isinstance(obj, dict):
+        return FrozenDict((k, _rebuild(v, resolved)) for k, v in dict.items(obj))
+    if isinstance(obj, list):
+        return FrozenList(_rebuild(v, resolved) for v in list.__iter__(obj))
+    if isinstance(obj, FrozenList):
+        return FrozenList(_rebuild(v, resolved) for v in tuple.__iter__(obj))
+    return obj
+
+
+def resolve_all(values):
+    """Resolve every lazy secret in values, one batch per backend.
+
+    Returns:
+        FrozenDict: values with no placeholders left
+    """
+    found = {}
+    _placeholders(values, found)
+    resolved = {}
+    for (marker, _), secrets in found.items():
+        payloads = list(dict.fromkeys(secret.payload for secret in secrets))
+        results = resolve_payloads(marker, payloads, **secrets[0].options)
+        for secret in secrets:
+            if secret.payload in results:
+                resolved[id(secret)] = results[secret.payload]
+    return _rebuild(values, resolved)
+
+
+def prepare(cfg, freeze_gc=False):
+    """Resolve cfg completely and make it read-only, before forking.
+
+    Args:
+        cfg (Config): configuration to share with workers
+        freeze_gc (optional[bool]): call gc.freeze, where available, so
+            the shared objects are not written to by garbage collection;
+            this freezes every object in the process. defaults to False
+
+    Returns:
+        Config: cfg; setting values or settings on it raises FiggypyError
+    """
+    cfg.stop_watching()
+    cfg.stop_ssm_refresh()
+    with cfg._watch_lock:
+        cfg.values = resolve_all(cfg.values)
+        cfg._secret_paths = []
+        cfg._publish()
+        cfg._readonly = True
+    _PREPARED.add(cfg)
+    if freeze_gc and hasattr(gc, 'freeze'):
+        gc.collect()
+        gc.freeze()
+    return cfg
+
+
+def _after_fork():
+    """Give prepared configs in a forked child their own locks."""
+    for cfg in list(_PREPARED):
+        cfg._watch_lock = threading.Lock()
+        cfg._pin_lock = threading.Lock()
+        cfg._pins = threading.local()
+        cfg._pinned = 0
+        # The threads did not survive the fork.
+        cfg._watcher = cfg._refresher = None
+        cfg._layer_watchers = []
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""Pick up rotated SSM parameters without reloading the configuration.
+
+SSMRefresher polls the parameters behind the _ssm references of a Config,
+from its file, every one of its sources, and set_value, in batches of
+SSM_BATCH_SIZE, and compares the versions SSM returns with the versions
+it saw before. Only the values that changed are written, and the Config's
+change callbacks are called with their key paths.
+
+Each wait between polls is randomized by a jitter fraction, and requests
+are spaced to stay under a rate limit, so a fleet started together does
+not poll SSM at the same moment.
+"""
+import logging
+import random
+import threading
+import time
+
+from figgypy import aws
+from figgypy.cache import SecretCache, default_cache
+from figgypy.decrypt import SSM_BATCH_SIZE, _ssm_get_parameters
+from figgypy.lazy import LazySecret, _node
+
+LOG = logging.getLogger(__name__)
+
+# Seconds between polls.
+REFRESH_INTERVAL = 300
+# Fraction of the interval each wait is randomly lengthened or shortened by.
+REFRESH_JITTER = 0.1
+# GetParameters requests per second, at most.
+REFRESH_RATE = 5.0
+
+
+class SSMRefresher(object):
+    """Poll the _ssm references of cfg in a background thread.
+
+    Args:
+        cfg (Config): configuration to update
+        interval (optional[float]): see REFRESH_INTERVAL
+        jitter (optional[float]): see REFRESH_JITTER
+        rate (optional[float]): see REFRESH_RATE; None for no limit
+
+    The first poll happens at a random point within the first interval.
+    It records the versions of the parameters, and writes any value that
+    differs from the one loaded.
+    """
+    def __init__(self, cfg, interval=REFRESH_INTERVAL, jitter=REFRESH_JITTER, rate=REFRESH_RATE):
+        self.cfg = cfg
+        self.interval = interval
+        self.jitter = jitter
+        self.rate = rate
+        # parameter name -> last version seen
+        self.versions = {}
+        self._last_request = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='figgypy-ssm-refresh')
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _run(self):
+        delay = random.uniform(0, self.interval)
+        while not self._stop.wait(delay):
+            try:
+                self.refresh()
+            except Exception:
+                LOG.exception('Unable to refresh SSM parameters')
+            delay = self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def _throttle(self):
+        """Wait until another request is allowed under the rate limit."""
+        if self.rate:
+            if self._last_request is not None:
+                wait = self._last_request + 1.0 / self.rate - time.monotonic()
+                if wait > 0:
+                    self._stop.wait(wait)
+            self._last_request = time.monotonic()
+
+    def refresh(self):
+        """Poll every _ssm reference once and apply what changed.
+
+        Returns:
+            list: key paths whose values changed
+        """
+        cfg = self.cfg
+        if not cfg.decrypt_ssm:
+            return []
+        refs = [(path, ref[1]) for path, ref in cfg._secret_refs.items()
+                if ref[0] == '_ssm' and path]
+        names = sorted(set(name for _, name in refs))
+        if not names:
+            return []
+        from botocore.exceptions import BotoCoreError, ClientError
+        try:
+            client = aws.client('ssm', cfg.aws_config)
+        except BotoCoreError as err:
+            LOG.warning('Unable to refresh SSM parameters: %s', err)
+            return []
+        values, versions = {}, {}
+        for i in range(0, len(names), SSM_BATCH_SIZE):
+            if self._stop.is_set():
+                break
+            self._throttle()
+            try:
+                values.update(_ssm_get_parameters(client, names[i:i + SSM_BATCH_SIZE], versions))
+            except (BotoCoreError, ClientError) as err:
+                LOG.warning('Unable to refresh SSM parameters: %s', err)
+
+        updates = {}
+        with cfg._watch_lock:
+            for path, name in refs:
+                if name not in values:
+                    continue
+                found = _node(cfg.values, path)
+                if found is None:
+                    continue
+                current = found[1]
+                if isinstance(current, LazySecret):
+                    if not current.resolved:
+                        # Not read yet; it resolves to the current value.
+                        continue
+                    current = current.resolve()
+                known = self.versions.get(name)
+                if known is not None and known == versions.get(name):
+                    continue
+                if current == values[name]:
+                    continue
+                updates[path] = values[name]
+            if updates:
+                cfg._update_leaves(updates)
+            self.versions.update(versions)
+        changed = list(updates)
+        if changed:
+            self._invalidate([name for path, name in refs if path in changed])
+            cfg._notify(changed)
+        return changed
+
+    def _invalidate(self, names):
+        cache = self.cfg._secret_cache
+        if cache is True:
+            cache = default_cache()
+        if isinstance(cache, SecretCache):
+            for name in names:
+                cache.invalidate('_ssm', name)
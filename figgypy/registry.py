@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""Share named configurations across an application.
+
+figgypy.set_config holds one global Config. Applications with several,
+such as one per tenant or per service, register each under a name, and
+get it by name wherever it is needed:
+
+    figgypy.register_config('billing', 'billing.yaml', aws_config=aws_config)
+    figgypy.get_config('billing').get_value('db.host')
+
+A registered Config is loaded the first time it is asked for. Names
+registered with the same source and settings share one Config, so it is
+loaded and decrypted once. Loads are single-flight: threads asking for a
+Config that is still loading wait for that load rather than starting
+their own. Only the max_size configurations used most recently are kept;
+one evicted is loaded again when next asked for. preload loads everything
+registered, in parallel, for example at startup.
+"""
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import inspect
+import logging
+import os
+import threading
+
+from figgypy.cache import freeze
+from figgypy.config import Config
+
+LOG = logging.getLogger(__name__)
+
+# Default number of loaded configurations a Registry keeps.
+REGISTRY_SIZE = 64
+_SIGNATURE = inspect.signature(Config)
+
+
+def config_key(*args, **kwargs):
+    """Make a hashable key from Config arguments.
+
+    Arguments that load the same thing give the same key, whether given by
+    position or keyword, or left as their defaults.
+    """
+    bound = _SIGNATURE.bind(*args, **kwargs)
+    bound.apply_defaults()
+    arguments = dict(bound.arguments)
+    if isinstance(arguments.get('config_file'), str):
+        arguments['config_file'] = os.path.normpath(arguments['config_file'])
+    return freeze(arguments)
+
+
+class Registry(object):
+    """Named configurations, loaded on first use.
+
+    Args:
+        max_size (optional[int]): keep at most this many loaded
+            configurations, evicting the least recently used; None keeps
+            every one. Configurations added with set are never evicted.
+    """
+    def __init__(self, max_size=REGISTRY_SIZE):
+        self.max_size = max_size
+        # name -> (key, args, kwargs)
+        self._specs = {}
+        # key -> loaded Config, least recently used first
+        self._loaded = OrderedDict()
+        # key -> Future of a load in progress
+        self._loading = {}
+        # name -> Config added with set
+        self._pinned = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, *args, **kwargs):
+        """Register how to load the Config called name.
+
+        Arguments are the same as for Config. Registering a name again with
+        different arguments replaces it.
+        """
+        spec = (config_key(*args, **kwargs), args, kwargs)
+        with self._lock:
+            self._pinned.pop(name, None)
+            self._specs[name] = spec
+
+    def set(self, name, config):
+        """Add an already loaded Config as name."""
+        with self._lock:
+            self._specs.pop(name, None)
+            self._pinned[name] = config
+
+    def names(self):
+        """Every registered name."""
+        with self._lock:
+            return sorted(set(self._specs) | set(self._pinned))
+
+    def __contains__(self, name):
+        with self._lock:
+            return name in self._specs or name in self._pinned
+
+    def get(self, name):
+        """Get the Config called name, loading it if needed.
+
+        Raises ValueError if name is not registered, and whatever loading
+        it raises, such as FiggypyError.
+        """
+        with self._lock:
+            if name in self._pinned:
+                return self._pinned[name]
+            try:
+                key, args, kwargs = self._specs[name]
+            except KeyError:
+                raise ValueError('configuration {!r} not registered; '
+                                 'run figgypy.register_config first'.format(name))
+            cfg = self._loaded.get(key)
+            if cfg is not None:
+                self._loaded.move_to_end(key)
+                return cfg
+            future = self._loading.get(key)
+            owner = future is None
+            if owner:
+                future = self._loading[key] = Future()
+        if not owner:
+            return future.result()
+        try:
+            cfg = Config(*args, **kwargs)
+        except BaseException as err:
+            with self._lock:
+                del self._loading[key]
+            future.set_exception(err)
+            raise
+        with self._lock:
+            del self._loading[key]
+            self._loaded[key] = cfg
+            evicted = self._evict()
+        future.set_result(cfg)
+        for old in evicted:
+            old.stop_watching()
+            old.stop_ssm_refresh()
+        return cfg
+
+    def _evict(self):
+        """Drop the least recently used configurations over max_size."""
+        evicted = []
+        while self.max_size is not None and len(self._loaded) > self.max_size:
+            key, cfg = self._loaded.popitem(last=False)
+            LOG.debug('Evicting configuration %r', key)
+            evicted.append(cfg)
+        return evicted
+
+    def preload(self, names=None, max_workers=None):
+        """Load configurations in parallel.
+
+        Args:
+            names (optional[list]): names to load; defaults to every one
+                registered
+            max_workers (optional[int]): load this many at once; defaults
+                to one thread per configuration
+
+        Returns:
+            dict: name -> Config
+
+        Every load is attempted; the first error is raised after all have
+        finished.
+        """
+        if names is None:
+            names = self.names()
+        if not names:
+            return {}
+        with ThreadPoolExecutor(max_workers=max_workers or len(names)) as pool:
+            futures = {name: pool.submit(self.get, name) for name in names}
+        return {name: future.result() for name, future in futures.items()}
+
+    def remove(self, name):
+        """Forget name. Its Config is kept while other names share it."""
+        with self._lock:
+            self._pinned.pop(name, None)
+            spec = self._specs.pop(name, None)
+            if spec is None or any(s[0] == spec[0] for s in self._specs.values()):
+                return
+            cfg = self._loaded.pop(spec[0], None)
+        if cfg is not None:
+            cfg.stop_watching()
+            cfg.stop_ssm_refresh()
+
+    def clear(self):
+        """Forget every name and loaded Config."""
+        with self._lock:
+            loaded = list(self._loaded.values())
+            self._specs.clear()
+            self._pinned.clear()
+            self._loaded.clear()
+        for cfg in loaded:
+            cfg.stop_watching()
+            cfg.stop_ssm_refresh()
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        # Loads in progress ran in threads that did not survive the fork.
+        self._loading = {}
+
+
+# The registry used by figgypy.get_config and figgypy.register_config.
+REGISTRY = Registry()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=REGISTRY._after_fork)
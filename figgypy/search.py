@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""Find configuration files by name in a search path.
+
+A relative name is looked up in each directory of the search path in turn,
+and the first match wins. The default search path is:
+
+1. the current directory
+2. `$XDG_CONFIG_HOME`, if set
+3. `~/.config`, so files there are still found when it is
+4. each of `$XDG_CONFIG_DIRS`, if set
+5. `/etc/`
+
+FIGGYPY_PATH, a list of directories separated like PATH, replaces it.
+
+Found locations are remembered. Relative directories, such as the current
+one, are made absolute first, so a location found before a chdir is not
+used after it. A remembered location is trusted for
+FIND_CACHE_TTL seconds, then checked against the modification times of the
+directories searched to find it, which change when a file is added to or
+removed from one of them. find_files looks up many names with one
+directory listing per directory instead of one stat per name and directory.
+"""
+import os
+import threading
+import time
+
+from figgypy.exceptions import FiggypyError
+
+# Environment variable listing directories to search instead of the defaults.
+SEARCH_PATH_ENV = 'FIGGYPY_PATH'
+# Seconds a found location is used without checking it again.
+FIND_CACHE_TTL = 1.0
+
+
+def search_dirs(environ=None):
+    """The default search path, read from the environment now."""
+    environ = os.environ if environ is None else environ
+    override = environ.get(SEARCH_PATH_ENV)
+    if override:
+        return [d for d in override.split(os.pathsep) if d]
+    home = os.path.join(os.path.expanduser('~'), '.config')
+    xdg_home = environ.get('XDG_CONFIG_HOME')
+    homes = [xdg_home, home] if xdg_home and xdg_home != home else [home]
+    xdg_dirs = [d for d in environ.get('XDG_CONFIG_DIRS', '').split(os.pathsep) if d]
+    return [os.curdir] + homes + xdg_dirs + ['/etc/']
+
+
+def _absolute(dirs):
+    """dirs as a tuple, with relative directories resolved against the cwd."""
+    return tuple(d if os.path.isabs(d) else os.path.abspath(d) for d in dirs)
+
+
+def _mtime(directory):
+    try:
+        return os.stat(directory).st_mtime_ns
+    except OSError:
+        return None
+
+
+class FileFinder(object):
+    """Find files in a search path, remembering where they were found.
+
+    Args:
+        ttl (optional[float]): see FIND_CACHE_TTL
+    """
+    def __init__(self, ttl=FIND_CACHE_TTL):
+        self.ttl = ttl
+        # (name, dirs) -> (path, directories searched, their mtimes, checked at)
+        self._found = {}
+        self._lock = threading.Lock()
+
+    def _remember(self, name, dirs, path):
+        searched = []
+        for d in dirs:
+            candidate = os.path.join(d, name)
+            searched.append(os.path.dirname(candidate))
+            if candidate == path:
+                break
+        stamps = tuple(_mtime(d) for d in searched)
+        with self._lock:
+            self._found[(name, dirs)] = (path, searched, stamps, time.monotonic())
+
+    def _remembered(self, name, dirs):
+        entry = self._found.get((name, dirs))
+        if entry is None:
+            return None
+        path, searched, stamps, checked = entry
+        now = time.monotonic()
+        if now - checked < self.ttl:
+            return path
+        if tuple(_mtime(d) for d in searched) != stamps:
+            return None
+        with self._lock:
+            self._found[(name, dirs)] = (path, searched, stamps, now)
+        return path
+
+    def find(self, name, dirs):
+        """Path of the first dir/name that is a file.
+
+        Args:
+            name (str): file name or relative path; an absolute path is
+                returned as it is
+            dirs (list): directories to search, in order; relative ones
+                are taken from the current directory
+
+        Raises FiggypyError if there is none.
+        """
+        if os.path.isabs(name):
+            return name
+        dirs = _absolute(dirs)
+        path = self._remembered(name, dirs)
+        if path is not None:
+            return path
+        for d in dirs:
+            candidate = os.path.join(d, name)
+            if os.path.isfile(candidate):
+                self._remember(name, dirs, candidate)
+                return candidate
+        raise FiggypyError(
+            "could not find configuration file {} in dirs {}".format(name, list(dirs)))
+
+    def find_all(self, names, dirs):
+        """Find several files, listing each directory once.
+
+        Returns:
+            dict: name -> path, or None for a name that was not found
+        """
+        dirs = _absolute(dirs)
+        result, wanted = {}, []
+        for name in names:
+            path = name if os.path.isabs(name) else self._remembered(name, dirs)
+            if path is not None:
+                result[name] = path
+            else:
+                wanted.append(name)
+        listings = {}
+        for name in wanted:
+            result[name] = None
+            for d in dirs:
+                candidate = os.path.join(d, name)
+                parent, base = os.path.split(candidate)
+                if parent not in listings:
+                    try:
+                        listings[parent] = set(e.name for e in os.scandir(parent) if e.is_file())
+                    except OSError:
+                        listings[parent] = set()
+                if base in listings[parent]:
+                    self._remember(name, dirs, candidate)
+                    result[name] = candidate
+                    break
+        return result
+
+    def invalidate(self, name=None):
+        """Forget where name was found, or every location without name."""
+        with self._lock:
+            if name is None:
+                self._found.clear()
+            else:
+                for key in [k for k in self._found if k[0] == name]:
+                    del self._found[key]
+
+
+# Shared by every Config.
+FINDER = FileFinder()
+
+
+def find_file(name, dirs=None):
+    """Find name in dirs, or in the default search path; see FileFinder.find."""
+    return FINDER.find(name, search_dirs() if dirs is None else dirs)
+
+
+def find_files(names, dirs=None):
+    """Find several names at once; see FileFinder.find_all."""
+    return FINDER.find_all(names, search_dirs() if dirs is None else dirs)
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""Read-only configuration trees for sharing between threads.
+
+Config builds a snapshot of its values the first time one is asked for
+after they are loaded, reloaded, or changed, and publishes it by replacing
+a single reference. A snapshot is
+never changed after it is published: mappings are FrozenDict and lists are
+FrozenList, and changes build a new snapshot that shares every unchanged
+branch with the old one. Readers therefore need no locks, and a reader
+holding a snapshot sees one consistent configuration.
+
+Secret placeholders from lazy mode are kept as they are, and resolved when
+read, without modifying the snapshot. Subtrees not built yet, such as
+merged layers, are built into the snapshot.
+"""
+from figgypy.compact import CompactDict, CompactList, thaw as _thaw_compact
+from figgypy.decrypt import _child
+from figgypy.lazy import LazySecret, LazySubtree, _set_child
+
+
+def _read(value):
+    return value.resolve() if isinstance(value, LazySecret) else value
+
+
+def _readonly(self, *args, **kwargs):
+    raise TypeError('{} is read-only'.format(type(self).__name__))
+
+
+class FrozenDict(dict):
+    """dict that cannot be changed after it is built.
+
+    Like figgypy.lazy.LazyDict, __iter__ is overridden so that dict() and
+    ** copies read placeholders through __getitem__.
+    """
+    __slots__ = ()
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+    __ior__ = _readonly
+
+    def __getitem__(self, key):
+        return _read(dict.__getitem__(self, key))
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def items(self):
+        return [(k, self[k]) for k in self]
+
+    def values(self):
+        return [self[k] for k in self]
+
+    def __iter__(self):
+        return dict.__iter__(self)
+
+    def copy(self):
+        return dict(self.items())
+
+    def __eq__(self, other):
+        return dict(self.items()) == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self.items()),))
+
+
+class FrozenList(tuple):
+    """tuple that resolves secret placeholders as they are read."""
+    __slots__ = ()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return FrozenList(tuple.__getitem__(self, index))
+        return _read(tuple.__getitem__(self, index))
+
+    def __iter__(self):
+        for value in tuple.__iter__(self):
+            yield _read(value)
+
+    def __eq__(self, other):
+        if isinstance(other, list):
+            other = tuple(other)
+        return tuple(self) == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = tuple.__hash__
+
+
+def frozen(obj):
+    """Build a read-only copy of a configuration tree.
+
+    Frozen branches are reused as they are, so freezing is cheap for a
+    tree built mostly from an earlier snapshot.
+    """
+    if isinstance(obj, (FrozenDict, FrozenList)):
+        return obj
+    if isinstance(obj, LazySubtree):
+        return frozen(obj.resolve())
+    if isinstance(obj, dict):
+        return FrozenDict((k, frozen(v)) for k, v in dict.items(obj))
+    if isinstance(obj, list):
+        return FrozenList(frozen(v) for v in list.__iter__(obj))
+    return obj
+
+
+def thaw(obj):
+    """Build a mutable copy of a snapshot, with dicts and lists."""
+    if isinstance(obj, (CompactDict, CompactList)):
+        return _thaw_compact(obj)
+    if isinstance(obj, dict):
+        return {k: thaw(v) for k, v in dict.items(obj)}
+    if isinstance(obj, FrozenList):
+        return [thaw(v) for v in tuple.__iter__(obj)]
+    if isinstance(obj, list):
+        return [thaw(v) for v in list.__iter__(obj)]
+    return obj
+
+
+def replace(tree, path, value):
+    """Return a snapshot of tree with the value at path replaced.
+
+    Only the containers along path are copied; the rest are shared. A key
+    missing from a mapping is added.
+    """
+    if not path:
+        return frozen(value)
+    key, rest = path[0], path[1:]
+    if isinstance(tree, FrozenList):
+        items = list(tuple.__iter__(tree))
+        items[key] = replace(items[key], rest, value)
+        return FrozenList(items)
+    items = dict(dict.items(tree))
+    items[key] = replace(items.get(key, FrozenDict()), rest, value)
+    return FrozenDict(items)
+
+
+def copy_paths(tree, paths):
+    """Copy the containers along paths, sharing everything else.
+
+    Returns:
+        dict: a new top level dict; changing the containers along paths in
+            it leaves tree as it was
+
+    A compact tree is thawed whole, since its containers cannot be copied
+    one at a time; see figgypy.compact. A LazySubtree along a path is
+    built, and its copy put in its place.
+    """
+    if isinstance(tree, CompactDict):
+        return thaw(tree)
+    copied = set()
+
+    def copy(obj):
+        new = type(obj)()
+        if isinstance(obj, dict):
+            dict.update(new, dict.items(obj))
+        else:
+            list.extend(new, list.__iter__(obj))
+        copied.add(id(new))
+        return new
+
+    root = copy(tree)
+    for path in paths:
+        obj = root
+        for key in path[:-1]:
+            try:
+                child = _child(obj, key)
+            except (KeyError, IndexError, TypeError):
+                break
+            if isinstance(child, LazySubtree):
+                child = child.resolve()
+            if not isinstance(child, (dict, list)):
+                break
+            if id(child) not in copied:
+                child = copy(child)
+                _set_child(obj, key, child)
+            obj = child
+    return root
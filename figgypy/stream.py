@@ -0,0 +1,518 @@
+# -*- coding: utf-8 -*-
+"""Load very large configuration files in a single pass.
+
+figgypy.loader reads the whole file into a string before parsing it, so
+while a file loads its text and its parsed tree are both in memory, and
+libyaml composes a node for every value besides. The loaders here read
+the file in chunks instead, and build the tree in a single pass, so peak
+memory stays close to the size of the tree itself:
+
+- yaml files are read as parser events, which are built straight into
+  python objects, without composing nodes
+- json files are read with ijson when it is installed, and otherwise
+  item by item from a buffer of the file, decoding only values nested
+  JSON_STREAM_DEPTH deep whole
+- xml files have no streaming loader, and are loaded with
+  figgypy.loader
+
+Secret references are recorded while the file is read, so Config does
+not walk the tree again. Given sections, only those top level keys are
+kept; the others are read past without being built where possible, and
+reading stops as soon as every requested section has been read:
+
+    values, refs = figgypy.stream.load('routes.yaml', sections=['routes'])
+
+A yaml alias to an anchor in a skipped section cannot be resolved, and
+raises FiggypyError; include the section that defines the anchor.
+"""
+import json
+import logging
+import re
+
+from yaml.composer import Composer
+from yaml.constructor import FullConstructor
+from yaml.events import (
+    AliasEvent,
+    MappingEndEvent,
+    MappingStartEvent,
+    ScalarEvent,
+    SequenceEndEvent,
+    SequenceStartEvent,
+    StreamEndEvent,
+)
+from yaml.nodes import ScalarNode
+from yaml.resolver import Resolver
+
+from figgypy.decrypt import _markers, _match, find_secrets
+from figgypy.exceptions import FiggypyError
+from figgypy import loader
+
+LOG = logging.getLogger(__name__)
+
+# Characters read from the file at a time.
+CHUNK_SIZE = 1 << 16
+# json objects and arrays nested less deep than this are read item by
+# item; deeper values are decoded whole, which is faster.
+JSON_STREAM_DEPTH = 2
+MERGE_TAG = 'tag:yaml.org,2002:merge'
+STR_TAG = 'tag:yaml.org,2002:str'
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# ijson is optional; the json loader below is used without it.
+ijson = None
+IJSON_IMPORTED = None
+
+
+def _import_ijson():
+    global ijson, IJSON_IMPORTED
+    if IJSON_IMPORTED is None:
+        try:
+            import ijson as _ijson
+            ijson = _ijson
+            IJSON_IMPORTED = True
+        except ImportError:
+            LOG.debug('Could not load ijson. Using the built in json streaming.')
+            IJSON_IMPORTED = False
+    return IJSON_IMPORTED
+
+
+class _EventBuilder(object):
+    """Build python objects straight from yaml parser events.
+
+    No node tree is composed, except for collections with an explicit tag,
+    like !!set, which are composed and constructed as usual. Sets marked
+    when a scalar looks like a secret reference.
+    """
+    def start_building(self, sections):
+        self.sections = sections
+        self.objects = {}
+        self.marked = False
+
+    def build(self):
+        event = self.peek_event()
+        if isinstance(event, AliasEvent):
+            self.get_event()
+            return self._alias(event)
+        if isinstance(event, ScalarEvent):
+            self.get_event()
+            value = self._scalar(event)
+        elif isinstance(event, SequenceStartEvent) and event.implicit:
+            self.get_event()
+            value = []
+            if event.anchor is not None:
+                self.objects[event.anchor] = value
+            while not self.check_event(SequenceEndEvent):
+                value.append(self.build())
+            self.get_event()
+        elif isinstance(event, MappingStartEvent) and event.implicit:
+            self.get_event()
+            value = {}
+            if event.anchor is not None:
+                self.objects[event.anchor] = value
+            merged = []
+            while not self.check_event(MappingEndEvent):
+                key = self.build()
+                if key is _MERGE:
+                    merged.append(self.build())
+                else:
+                    value[key] = self.build()
+            self.get_event()
+            _merge(value, merged)
+            return value
+        else:
+            value = self.construct_document(self.compose_node(None, None))
+        if event.anchor is not None:
+            self.objects[event.anchor] = value
+        return value
+
+    def _alias(self, event):
+        try:
+            return self.objects[event.anchor]
+        except KeyError:
+            pass
+        if event.anchor in self.anchors:
+            # Defined inside a composed collection.
+            return self.construct_document(self.anchors[event.anchor])
+        raise FiggypyError('found undefined alias {}'.format(event.anchor))
+
+    def _scalar(self, event):
+        text = event.value
+        if not self.marked and self.sections.may_mark(text):
+            self.marked = True
+        tag = event.tag
+        if tag is None or tag == '!':
+            tag = self.resolve(ScalarNode, text, event.implicit)
+        if tag == STR_TAG:
+            return text
+        if tag == MERGE_TAG:
+            return _MERGE
+        return self.construct_document(
+            ScalarNode(tag, text, event.start_mark, event.end_mark, event.style))
+
+    def skip(self):
+        """Consume the events of one value without building it."""
+        depth = 0
+        while True:
+            event = self.get_event()
+            if isinstance(event, (MappingStartEvent, SequenceStartEvent)):
+                depth += 1
+            elif isinstance(event, (MappingEndEvent, SequenceEndEvent)):
+                depth -= 1
+            if depth == 0:
+                return
+
+
+# Key of a yaml merge, as in <<: *defaults.
+_MERGE = object()
+
+
+def _merge(value, merged):
+    """Add the keys of merged mappings that value does not set itself."""
+    for defaults in merged:
+        for mapping in (defaults if isinstance(defaults, list) else [defaults]):
+            if not isinstance(mapping, dict):
+                raise FiggypyError('expected a mapping to merge, found {}'.format(
+                    type(mapping).__name__))
+            for key, item in mapping.items():
+                if key not in value:
+                    value[key] = item
+
+
+try:
+    from yaml._yaml import CParser
+
+    class _YamlStream(CParser, _EventBuilder, Composer, FullConstructor, Resolver):
+        """libyaml events, built into python objects as they arrive."""
+        def __init__(self, stream):
+            CParser.__init__(self, stream)
+            Composer.__init__(self)
+            FullConstructor.__init__(self)
+            Resolver.__init__(self)
+except ImportError:
+    from yaml.parser import Parser
+    from yaml.reader import Reader
+    from yaml.scanner import Scanner
+
+    class _YamlStream(Reader, Scanner, Parser, _EventBuilder, Composer, FullConstructor,
+                      Resolver):
+        """Pure python events, built into python objects as they arrive."""
+        def __init__(self, stream):
+            Reader.__init__(self, stream)
+            Scanner.__init__(self)
+            Parser.__init__(self)
+            Composer.__init__(self)
+            FullConstructor.__init__(self)
+            Resolver.__init__(self)
+
+
+class _Sections(object):
+    """Collect top level sections and the references in them.
+
+    Args:
+        sections (optional[list]): only keep these top level keys
+        markers (optional[list]): only record references for these markers
+    """
+    def __init__(self, sections=None, markers=None):
+        self.values = {}
+        self.refs = {}
+        self.wanted = set(sections) if sections is not None else None
+        self.markers = markers
+        self._keys, self._inlines = _markers(markers)
+        self._keys = frozenset(self._keys)
+        texts = list(self._keys) + [inline for _, inline in self._inlines]
+        self._pattern = re.compile('|'.join(re.escape(t) for t in texts)) if texts else None
+
+    def wants(self, key):
+        return self.wanted is None or key in self.wanted
+
+    @property
+    def done(self):
+        """True once every wanted section has been read."""
+        return self.wanted is not None and not self.wanted.difference(self.values)
+
+    def might_contain(self, text, start, end):
+        """Cheaply check text[start:end] for references."""
+        return self._pattern is not None and self._pattern.search(text, start, end) is not None
+
+    def may_mark(self, scalar):
+        """Check a yaml scalar for a marker or inline reference."""
+        return scalar in self._keys or any(inline in scalar for _, inline in self._inlines)
+
+    def add(self, key, value, marked=True):
+        """Keep a section; marked False means it has no references."""
+        if key in self.values:
+            # A repeated key replaces the earlier section.
+            for path in [p for p in self.refs if p and p[0] == key]:
+                del self.refs[path]
+        self.values[key] = value
+        if marked:
+            for ref in find_secrets({key: value}, self.markers):
+                self.refs[ref[0]] = ref[3:]
+
+    def result(self):
+        """(values, refs), with refs mapping key paths to (marker, payload)."""
+        match = _match(self.values, self._keys, ())
+        if match is not None:
+            self.refs[()] = match
+        return self.values, self.refs
+
+
+def _load_yaml(fo, sections):
+    parser = _YamlStream(fo)
+    parser.start_building(sections)
+    try:
+        parser.get_event()
+        if parser.check_event(StreamEndEvent):
+            return sections.result()
+        parser.get_event()
+        if not parser.check_event(MappingStartEvent):
+            if parser.build() is not None:
+                raise FiggypyError('configuration must be a mapping at the top level')
+            return sections.result()
+        parser.get_event()
+        merged = []
+        while not parser.check_event(MappingEndEvent):
+            key = parser.build()
+            if key is _MERGE:
+                merged.append(parser.build())
+                continue
+            if not sections.wants(key):
+                parser.skip()
+                continue
+            parser.marked = False
+            value = parser.build()
+            sections.add(key, value, parser.marked)
+            if sections.done and not merged:
+                return sections.result()
+        defaults = {}
+        _merge(defaults, merged)
+        for key, value in defaults.items():
+            if sections.wants(key) and key not in sections.values:
+                sections.add(key, value)
+        parser.get_event()
+        parser.get_event()
+        if not parser.check_event(StreamEndEvent):
+            raise FiggypyError('configuration must be a single yaml document')
+        return sections.result()
+    finally:
+        parser.dispose()
+
+
+class _JsonReader(object):
+    """Read a json object from a file, a buffer at a time.
+
+    Objects and arrays less than JSON_STREAM_DEPTH deep are read item by
+    item; deeper values are decoded whole with the json module. So the
+    buffer holds at most one such value and a chunk of the file.
+
+    Keys in the values decoded whole are shared between values, as
+    json.loads shares them within a document.
+    """
+    def __init__(self, fo, sections, chunk_size=CHUNK_SIZE):
+        self.fo = fo
+        self.sections = sections
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.marked = False
+        self._keys = {}
+        self.decoder = json.JSONDecoder(object_pairs_hook=self._object)
+
+    def _object(self, pairs):
+        keys = self._keys
+        return {keys.setdefault(k, k): v for k, v in pairs}
+
+    def _read(self):
+        # Read at least as much as is buffered, so that retrying a long
+        # value costs linear time overall.
+        data = self.fo.read(max(self.chunk_size, len(self.buf) - self.pos))
+        if not data:
+            self.eof = True
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+
+    def peek(self):
+        """Next non-whitespace character, or '' at the end of the file."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf) or self.eof:
+                return self.buf[self.pos:self.pos + 1]
+            self._read()
+
+    def _expect(self, chars):
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError('expected {!r} at {!r}'.format(chars, self.buf[self.pos:self.pos + 20]))
+        self.pos += 1
+        return char
+
+    def _decode(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except ValueError:
+                if self.eof:
+                    raise
+            else:
+                # A number at the end of the buffer may continue in the file.
+                if end < len(self.buf) or self.eof:
+                    if not self.marked and self.sections.might_contain(self.buf, self.pos, end):
+                        self.marked = True
+                    self.pos = end
+                    return value
+            self._read()
+
+    def value(self, depth):
+        char = self.peek()
+        if depth >= JSON_STREAM_DEPTH or char not in ('{', '['):
+            return self._decode()
+        self.pos += 1
+        if char == '[':
+            value = []
+            if self.peek() == ']':
+                self.pos += 1
+                return value
+            while True:
+                value.append(self.value(depth + 1))
+                if self._expect(',]') == ']':
+                    return value
+        return dict(self.items(depth))
+
+    def items(self, depth, wants=None):
+        """Yield the (key, value) pairs of an object whose { was read.
+
+        Values of keys for which wants returns False are skipped, and
+        yielded as None, item by item like the others.
+        """
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            if self.peek() != '"':
+                raise ValueError('expected a string key at {!r}'.format(
+                    self.buf[self.pos:self.pos + 20]))
+            key = self._decode()
+            self._expect(':')
+            if wants is None or wants(key):
+                yield key, self.value(depth + 1)
+            else:
+                self.skip(depth + 1)
+                yield key, None
+            if self._expect(',}') == '}':
+                return
+
+    def skip(self, depth):
+        """Read a value without keeping it."""
+        char = self.peek()
+        if depth >= JSON_STREAM_DEPTH or char not in ('{', '['):
+            self._decode()
+        elif char == '{':
+            self.pos += 1
+            for _ in self.items(depth, wants=lambda key: False):
+                pass
+        else:
+            self.pos += 1
+            if self.peek() == ']':
+                self.pos += 1
+                return
+            while True:
+                self.skip(depth + 1)
+                if self._expect(',]') == ']':
+                    return
+
+    def end(self):
+        if self.peek():
+            raise ValueError('extra data after the configuration')
+
+
+def _load_json(fo, sections):
+    reader = _JsonReader(fo, sections)
+    first = reader.peek()
+    if not first:
+        return sections.result()
+    if first != '{':
+        # A list or a bare value; loads reports it.
+        loader.loads(reader.buf[reader.pos:] + fo.read(), fmt=loader.JSON)
+        return sections.result()
+    reader.pos += 1
+    for key, value in reader.items(0, sections.wants):
+        if sections.wants(key):
+            sections.add(key, value, reader.marked)
+            if sections.done:
+                return sections.result()
+        reader.marked = False
+    reader.end()
+    return sections.result()
+
+
+def _load_ijson(f, sections):
+    """Like _load_json, with ijson; its errors are raised as ValueError."""
+    try:
+        with open(f, 'rb') as _fo:
+            _, event, _ = next(ijson.parse(_fo))
+            _fo.seek(0)
+            if event != 'start_map':
+                # A list or a bare value; loads reports it.
+                loader.loads(_fo.read().decode('utf-8'), fmt=loader.JSON)
+                return sections.result()
+            for key, value in ijson.kvitems(_fo, '', use_float=True):
+                if sections.wants(key):
+                    sections.add(key, value)
+                    if sections.done:
+                        break
+    except ijson.JSONError as err:
+        raise ValueError(str(err))
+    return sections.result()
+
+
+def load(f, fmt=None, sections=None, markers=None):
+    """Read and parse a configuration file without reading it whole.
+
+    Args:
+        f (str): path to the configuration file
+        fmt (optional[str]): 'json', 'xml', or 'yaml'; detected if omitted
+        sections (optional[list]): only load these top level keys
+        markers (optional[list]): only record references for these markers;
+            defaults to every registered backend
+
+    Returns:
+        tuple: (values, refs), where refs maps the key path of each secret
+            reference in values to its (marker, payload)
+
+    Raises FiggypyError if the file cannot be read or parsed.
+    """
+    if fmt is None:
+        try:
+            with open(f, 'r') as _fo:
+                fmt = loader.detect_format(_fo.read(CHUNK_SIZE), f)
+        except IOError:
+            raise FiggypyError('could not open configuration file')
+    collected = _Sections(sections, markers)
+    try:
+        if fmt == loader.XML:
+            values = loader.load(f, fmt=fmt)
+            for key, value in values.items():
+                if collected.wants(key):
+                    collected.add(key, value)
+            return collected.result()
+        if fmt == loader.JSON:
+            try:
+                if _import_ijson():
+                    return _load_ijson(f, collected)
+                with open(f, 'r') as _fo:
+                    return _load_json(_fo, collected)
+            except ValueError:
+                # Not strict json; yaml accepts the relaxed forms.
+                collected = _Sections(sections, markers)
+        elif fmt != loader.YAML:
+            raise FiggypyError('unsupported configuration format {}'.format(fmt))
+        with open(f, 'r') as _fo:
+            return _load_yaml(_fo, collected)
+    except FiggypyError:
+        raise
+    except IOError:
+        raise FiggypyError('could not open configuration file')
+    except Exception as err:
+        raise FiggypyError('could not parse configuration: {}'.format(err))
@@ -3,12 +3,11 @@ from __future__ import unicode_literals
 from future.utils import bytes_to_native_str as n
 
 from base64 import b64encode
-import os
 
-import boto3
+from figgypy import aws
 
 
-def kms_encrypt(value, key, aws_config=None):
+def kms_encrypt(value, key, aws_config=None, max_pool_connections=None):
     """Encrypt and value with KMS key.
 
     Args:
@@ -20,18 +19,20 @@ def kms_encrypt(value, key, aws_config=None):
                 aws_creds = {'aws_access_key_id': aws_access_key_id,
                              'aws_secret_access_key': aws_secret_access_key,
                              'region_name': 'us-east-1'}
+        max_pool_connections (optional[int]): size of the client's connection
+            pool; see figgypy.aws.client
 
     Returns:
         str: encrypted cipher text
+
+    The client is pooled, so repeated calls reuse its session and connections.
     """
-    aws_config = aws_config or {}
-    aws = boto3.session.Session(**aws_config)
-    client = aws.client('kms')
+    client = aws.client('kms', aws_config, max_pool_connections=max_pool_connections)
     enc_res = client.encrypt(KeyId=key, Plaintext=value)
     return n(b64encode(enc_res['CiphertextBlob']))
 
 
-def ssm_store_parameter(name, value, key=None, aws_config=None):
+def ssm_store_parameter(name, value, key=None, aws_config=None, max_pool_connections=None):
     """Store a value in SSM Parameter Store.
 
     Args:
@@ -45,19 +46,21 @@ def ssm_store_parameter(name, value, key=None, aws_config=None):
                 aws_creds = {'aws_access_key_id': aws_access_key_id,
                              'aws_secret_access_key': aws_secret_access_key,
                              'region_name': 'us-east-1'}
+        max_pool_connections (optional[int]): size of the client's connection
+            pool; see figgypy.aws.client
 
     Returns:
         str: name of parameter stored
+
+    The client is pooled, so repeated calls reuse its session and connections.
     """
-    aws_config = aws_config or {}
-    aws = boto3.session.Session(**aws_config)
-    client = aws.client('ssm')
+    client = aws.client('ssm', aws_config, max_pool_connections=max_pool_connections)
     params = {
-        Name: name,
-        Value: value,
-        Overwrite: True,
-        Description: "Figgypy created/updated parameter",
-        Type: "SecureString",
+        'Name': name,
+        'Value': value,
+        'Overwrite': True,
+        'Description': "Figgypy created/updated parameter",
+        'Type': "SecureString",
     }
     if key:
         params["KeyId"] = key
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""Watch a configuration file and report what changed in it.
+
+FileWatcher calls back once a file has stopped changing for a short while,
+so an editor writing a file in several steps causes a single reload. It
+uses inotify where the platform has it, and polls the file otherwise.
+diff lists the key paths that differ between two configuration trees.
+"""
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+import logging
+import os
+import select
+import struct
+import threading
+import time
+
+from figgypy.lazy import LazySecret, LazySubtree
+
+LOG = logging.getLogger(__name__)
+
+# Seconds a file must be left alone before the callback runs.
+DEBOUNCE = 0.2
+# Seconds between checks when polling.
+POLL_INTERVAL = 1.0
+
+_IN_MODIFY = 0x2
+_IN_ATTRIB = 0x4
+_IN_CLOSE_WRITE = 0x8
+_IN_MOVED_FROM = 0x40
+_IN_MOVED_TO = 0x80
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_MASK = (_IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM |
+            _IN_MOVED_TO | _IN_CREATE | _IN_DELETE)
+_EVENT = struct.Struct('iIII')
+
+
+def _inotify(directory):
+    """Start an inotify watch on directory.
+
+    The directory is watched rather than the file, so that editors that
+    save by writing a new file and renaming it over the old one are seen.
+
+    Returns:
+        int: inotify file descriptor; OSError is raised if unavailable
+    """
+    import ctypes
+    import ctypes.util
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        init, add_watch = libc.inotify_init1, libc.inotify_add_watch
+    except (OSError, AttributeError) as err:
+        raise OSError('inotify unavailable: {}'.format(err))
+    fd = init(os.O_NONBLOCK | os.O_CLOEXEC)
+    if fd < 0:
+        raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+    if add_watch(fd, os.fsencode(directory), _IN_MASK) < 0:
+        errno = ctypes.get_errno()
+        os.close(fd)
+        raise OSError(errno, 'inotify_add_watch failed')
+    return fd
+
+
+def _inotify_names(data):
+    """File names in a buffer of inotify events."""
+    names, offset = [], 0
+    while offset + _EVENT.size <= len(data):
+        _, _, _, length = _EVENT.unpack_from(data, offset)
+        offset += _EVENT.size
+        names.append(os.fsdecode(data[offset:offset + length].rstrip(b'\0')))
+        offset += length
+    return names
+
+
+class FileWatcher(object):
+    """Call callback after path changes, in a background thread.
+
+    Args:
+        path (str): file to watch; it may be missing for a while
+        callback (callable): called with no arguments once path has not
+            changed for debounce seconds
+        debounce (optional[float]): see DEBOUNCE
+        interval (optional[float]): see POLL_INTERVAL
+        use_inotify (optional[bool]): set False to always poll
+    """
+    def __init__(self, path, callback, debounce=DEBOUNCE, interval=POLL_INTERVAL,
+                 use_inotify=True):
+        self.path = os.path.abspath(path)
+        self.callback = callback
+        self.debounce = debounce
+        self.interval = interval
+        self.use_inotify = use_inotify
+        self._fd = None
+        self._wake = None
+        self._signature = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def using_inotify(self):
+        return self._fd is not None
+
+    def start(self):
+        if self.use_inotify:
+            try:
+                self._fd = _inotify(os.path.dirname(self.path))
+                self._wake = os.pipe()
+            except OSError as err:
+                LOG.debug('Polling %s: %s', self.path, err)
+        self._signature = self._stat()
+        self._thread = threading.Thread(target=self._run, name='figgypy-watch')
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._wake is not None:
+            os.write(self._wake[1], b'x')
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        for fd in [self._fd] + list(self._wake or ()):
+            if fd is not None:
+                os.close(fd)
+        self._fd = self._wake = None
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_ino, st.st_size, st.st_mtime_ns
+
+    def _wait_inotify(self, timeout):
+        ready, _, _ = select.select([self._fd, self._wake[0]], [], [], timeout)
+        if self._fd not in ready:
+            return False
+        try:
+            data = os.read(self._fd, 65536)
+        except BlockingIOError:
+            return False
+        return os.path.basename(self.path) in _inotify_names(data)
+
+    def _wait_poll(self, timeout):
+        if self._stop.wait(timeout):
+            return False
+        signature = self._stat()
+        if signature != self._signature:
+            self._signature = signature
+            return True
+        return False
+
+    def _run(self):
+        wait = self._wait_inotify if self._fd is not None else self._wait_poll
+        last_change = None
+        while not self._stop.is_set():
+            if last_change is None:
+                timeout = self.interval
+            else:
+                timeout = max(0, last_change + self.debounce - time.monotonic())
+            if wait(timeout):
+                last_change = time.monotonic()
+            elif last_change is not None and time.monotonic() - last_change >= self.debounce:
+                last_change = None
+                if self._stop.is_set():
+                    break
+                try:
+                    self.callback()
+                except Exception:
+                    LOG.exception('Error handling a change to %s', self.path)
+
+
+def diff(old, new, path=()):
+    """List the key paths where two configuration trees differ.
+
+    Args:
+        old: previous tree
+        new: current tree
+        path (optional[tuple]): prefix for the returned paths
+
+    Returns:
+        list: key path tuples of every added, removed, or changed value;
+            a list that changes length is reported as a whole
+
+    Secret placeholders are compared by their references, so nothing is
+    resolved, and subtrees not built yet through what they are built from.
+    Shared branches are not compared.
+    """
+    if isinstance(old, LazySubtree):
+        old = old.node
+    if isinstance(new, LazySubtree):
+        new = new.node
+    if old is new:
+        return []
+    if isinstance(old, Mapping) and isinstance(new, Mapping):
+        changed = []
+        for key in _keys(old) + [k for k in _keys(new) if k not in old]:
+            if key not in old or key not in new:
+                changed.append(path + (key,))
+            else:
+                changed.extend(diff(_get(old, key), _get(new, key), path + (key,)))
+        return changed
+    if isinstance(old, list) and isinstance(new, list):
+        if len(old) != len(new):
+            return [path]
+        changed = []
+        for i, (a, b) in enumerate(zip(list.__iter__(old), list.__iter__(new))):
+            changed.extend(diff(a, b, path + (i,)))
+        return changed
+    if isinstance(old, LazySecret) and isinstance(new, LazySecret):
+        if (old.marker, old.payload) != (new.marker, new.payload):
+            return [path]
+        return []
+    if type(old) is not type(new) or old != new:
+        return [path]
+    return []
+
+
+def _keys(mapping):
+    return list(dict.keys(mapping)) if isinstance(mapping, dict) else list(mapping)
+
+
+def _get(mapping, key):
+    """mapping[key], without resolving placeholders in dicts."""
+    return dict.__getitem__(mapping, key) if isinstance(mapping, dict) else mapping[key]
@@ -11,8 +11,8 @@ install_requires = [
     'boto3',
     'future',
     'pretty-bad-protocol',
-    'seria',
-    'pyyaml'
+    'pyyaml',
+    'xmltodict'
 ]
 
 setup(
@@ -25,9 +25,13 @@ setup(
     author_email='theherk@gmail.com',
     url='https://github.com/theherk/figgypy',
     download_url='https://github.com/theherk/figgypy/archive/1.2.dev.zip',
-    packages=find_packages(),
+    packages=find_packages(exclude=['benchmarks']),
     platforms=['all'],
     license='MIT',
+    python_requires='>=3.7',
     install_requires=install_requires,
+    extras_require={
+        'disk-cache': ['cryptography'],
+    },
     test_suite='tests'
 )
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import os
+import unittest
+
+import figgypy
+from figgypy.config import Config
+from tests.stubs import StubKMS, StubSSM, stub_session
+
+
+class TestAio(unittest.TestCase):
+    def setUp(self):
+        self.clients = {'kms': StubKMS(), 'ssm': StubSSM({'/app/api-key': 'api key'})}
+
+    def tearDown(self):
+        figgypy.set_config(None)
+
+    def test_aload_matches_sync_gpg(self):
+        kwargs = {'gpg_config': {'homedir': 'tests/resources/test-keys'}}
+        c = asyncio.run(Config.aload('tests/resources/test-config.yaml', **kwargs))
+        self.assertEqual(c.values, Config('tests/resources/test-config.yaml', **kwargs).values)
+        self.assertEqual(c.db['pass'], 'test password')
+        self.assertEqual(c.post_load_count, 1)
+
+    def test_aload_matches_sync_aws(self):
+        with stub_session(self.clients):
+            c = asyncio.run(Config.aload('tests/resources/test-secrets.yaml'))
+            self.assertEqual(c.values, Config('tests/resources/test-secrets.yaml').values)
+        self.assertEqual(c.db['pass'], 'kms password')
+        self.assertEqual(c.api['keys'][0], 'api key')
+        self.assertEqual(c._secret_paths, [])
+
+    def test_aload_report(self):
+        with stub_session(self.clients):
+            c = asyncio.run(Config.aload('tests/resources/test-secrets.yaml'))
+            report = c.load_report()
+            self.assertEqual(set(report['stages']), set(
+                Config('tests/resources/test-secrets.yaml').load_report()['stages']))
+        self.assertEqual(report['backends']['_kms']['requests'], 2)
+        self.assertEqual(report['counts']['bytes_read'], 150)
+        self.assertGreater(report['seconds'], 0)
+
+    def test_aload_lazy(self):
+        with stub_session(self.clients):
+            c = asyncio.run(Config.aload('tests/resources/test-secrets.yaml', lazy=True))
+            self.assertEqual(self.clients['kms'].calls, 0)
+            self.assertEqual(c.token, 'token value')
+
+    def test_aload_watch(self):
+        path = os.path.abspath('tests/resources/test-config.json')
+        c = asyncio.run(Config.aload(path, watch=True))
+        try:
+            self.assertEqual(c._watcher.path, path)
+            self.assertEqual(c.number, 1)
+        finally:
+            c.stop_watching()
+        c = asyncio.run(Config.aload('tests/resources/test-config.json'))
+        c.start_watching(use_inotify=False).stop()
+
+    def test_aload_sections(self):
+        c = asyncio.run(Config.aload('tests/resources/test-config.json', sections=['number']))
+        self.assertEqual(c.values, {'number': 1})
+
+    def test_aset_config(self):
+        with stub_session(self.clients):
+            c = asyncio.run(figgypy.aset_config('tests/resources/test-secrets.yaml'))
+        self.assertIs(figgypy.get_config(), c)
+        self.assertEqual(c.token, 'token value')
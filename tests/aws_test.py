@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import threading
+import unittest
+from unittest import mock
+
+from figgypy import aws
+from figgypy.decrypt import kms_decrypt
+from figgypy.util import kms_encrypt, ssm_store_parameter
+from tests.stubs import StubKMS, stub_session
+
+
+class TestClientPool(unittest.TestCase):
+    def test_reuses_session_and_client(self):
+        with stub_session(StubKMS()) as session:
+            first = aws.client('kms', {'region_name': 'us-east-1'})
+            second = aws.client('kms', {'region_name': 'us-east-1', 'profile_name': None})
+            self.assertIs(first, second)
+            self.assertEqual(session.call_count, 1)
+            self.assertEqual(session.return_value.client.call_count, 1)
+
+    def test_keyed_by_config_region_and_pool_size(self):
+        with stub_session(StubKMS()) as session:
+            aws.client('kms', {'region_name': 'us-east-1'})
+            aws.client('kms', {'region_name': 'us-west-2'})
+            aws.client('kms', {'region_name': 'us-east-1'}, region_name='eu-west-1')
+            aws.client('kms', {'region_name': 'us-east-1'}, max_pool_connections=50)
+            self.assertEqual(session.call_count, 2)
+            self.assertEqual(session.return_value.client.call_count, 4)
+            _, kwargs = session.return_value.client.call_args
+            self.assertEqual(kwargs['config'].max_pool_connections, 50)
+
+    def test_thread_safe(self):
+        with stub_session(StubKMS()) as session:
+            threads = [threading.Thread(target=aws.client, args=('kms',)) for _ in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            self.assertEqual(session.return_value.client.call_count, 1)
+
+    def test_decrypt_and_encrypt_share_clients(self):
+        kms = mock.Mock()
+        kms.encrypt.return_value = {'CiphertextBlob': b'ciphertext'}
+        kms.decrypt.return_value = {'Plaintext': b'secret'}
+        ssm = mock.Mock()
+        with stub_session({'kms': kms, 'ssm': ssm}) as session:
+            encrypted = kms_encrypt('secret', 'alias/key')
+            for _ in range(3):
+                res = kms_decrypt({'a': {'_kms': encrypted}})
+                self.assertEqual(res['a'], 'secret')
+            ssm_store_parameter('/app/name', 'value', key='alias/key')
+            self.assertEqual(ssm.put_parameter.call_args[1]['Name'], '/app/name')
+            self.assertEqual(session.call_count, 1)
+            self.assertEqual(session.return_value.client.call_count, 2)
+
+    def test_kms_workers_widen_pool(self):
+        with stub_session(StubKMS()) as session:
+            kms_decrypt({'a': {'_kms': StubKMS.encrypt('x')}}, max_workers=32)
+            _, kwargs = session.return_value.client.call_args
+            self.assertEqual(kwargs['config'].max_pool_connections, 32)
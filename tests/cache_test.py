@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+import unittest
+from unittest import mock
+
+from figgypy.cache import MISSING, SecretCache
+from figgypy.config import Config
+from tests.stubs import StubKMS, StubSSM, stub_session
+
+
+class TestSecretCache(unittest.TestCase):
+    def test_get_set(self):
+        cache = SecretCache()
+        key = SecretCache.key('_kms', 'ciphertext', ({'region_name': 'us-east-1'},))
+        self.assertIs(cache.get(key), MISSING)
+        cache.set(key, 'plaintext')
+        self.assertEqual(cache.get(key), 'plaintext')
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_context_is_part_of_key(self):
+        cache = SecretCache()
+        cache.set(SecretCache.key('_kms', 'c', ({'region_name': 'us-east-1'},)), 'east')
+        self.assertIs(cache.get(SecretCache.key('_kms', 'c', ({'region_name': 'us-west-2'},))),
+                      MISSING)
+
+    def test_ttl(self):
+        cache = SecretCache(ttl=10)
+        with mock.patch('figgypy.cache.time.monotonic', return_value=100):
+            cache.set('k', 'v')
+        with mock.patch('figgypy.cache.time.monotonic', return_value=105):
+            self.assertEqual(cache.get('k'), 'v')
+        with mock.patch('figgypy.cache.time.monotonic', return_value=111):
+            self.assertIs(cache.get('k'), MISSING)
+        self.assertEqual(len(cache), 0)
+
+    def test_lru_eviction(self):
+        cache = SecretCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIs(cache.get('b'), MISSING)
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_invalidate(self):
+        cache = SecretCache()
+        cache.set(SecretCache.key('_kms', 'a'), 1)
+        cache.set(SecretCache.key('_ssm', 'a'), 2)
+        cache.set(SecretCache.key('_ssm', 'b'), 3)
+        cache.invalidate(marker='_ssm', payload='a')
+        self.assertEqual(len(cache), 2)
+        cache.invalidate(marker='_kms')
+        self.assertEqual(len(cache), 1)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_protect(self):
+        for protect in ('obfuscate', 'lock'):
+            cache = SecretCache(protect=protect)
+            cache.set('text', 'correct horse')
+            cache.set('bytes', b'battery staple')
+            cache.set('number', 3)
+            value = cache._entries['text'][1]
+            self.assertNotIn(b'correct horse', bytes(value.data))
+            self.assertEqual(cache.get('text'), 'correct horse')
+            self.assertEqual(cache.get('bytes'), b'battery staple')
+            self.assertEqual(cache.get('number'), 3)
+            cache.clear()
+            self.assertEqual(bytes(value.data), b'\0' * len('correct horse'))
+        self.assertRaises(ValueError, SecretCache, protect='encrypt')
+
+    def test_shared_across_configs(self):
+        kms = StubKMS()
+        ssm = StubSSM({'/app/api-key': 'api key'})
+        cache = SecretCache()
+        with stub_session({'kms': kms, 'ssm': ssm}):
+            first = Config('tests/resources/test-secrets.yaml', secret_cache=cache)
+            second = Config('tests/resources/test-secrets.yaml', secret_cache=cache)
+            lazy = Config('tests/resources/test-secrets.yaml', secret_cache=cache, lazy=True)
+            self.assertEqual(lazy.db['pass'], 'kms password')
+            # Another region resolves its secrets again.
+            Config('tests/resources/test-secrets.yaml', secret_cache=cache,
+                   aws_config={'region_name': 'us-west-2'})
+        self.assertEqual(first.values, second.values)
+        self.assertEqual(second.db['pass'], 'kms password')
+        self.assertEqual(kms.calls, 4)
+        self.assertEqual(len(ssm.calls), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
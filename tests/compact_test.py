@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+import copy
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from figgypy.compact import CompactDict, CompactList, NodeTable, compact
+from figgypy.config import Config
+from figgypy.exceptions import FiggypyError
+from figgypy.snapshot import copy_paths, thaw
+from tests.stubs import StubKMS, StubSSM, stub_session
+
+
+class TestCompact(unittest.TestCase):
+    def setUp(self):
+        self.tree = {
+            'svc': {'host': 'a', 'ports': [1, 2, {'tls': True}], 'none': None, 'empty': {}},
+            'other': {'host': 'a', 'ports': []},
+            3: 'int key',
+            True: 'bool key',
+        }
+
+    def test_mapping_api(self):
+        c = compact(self.tree)
+        self.assertEqual(c, self.tree)
+        self.assertEqual(self.tree, c)
+        self.assertEqual(list(c), list(self.tree))
+        self.assertEqual(len(c), 4)
+        self.assertIsInstance(c['svc'], CompactDict)
+        self.assertIsInstance(c['svc']['ports'], CompactList)
+        self.assertEqual(c['svc']['ports'][-1], {'tls': True})
+        self.assertEqual(c['svc']['ports'][:2], [1, 2])
+        self.assertEqual((c[3], c[True], c[1]), ('int key', 'bool key', 'bool key'))
+        self.assertEqual(c.get('missing', 5), 5)
+        self.assertNotIn('host', c)
+        self.assertRaises(KeyError, lambda: c['missing'])
+        self.assertRaises(IndexError, lambda: c['svc']['ports'][3])
+        with self.assertRaises(TypeError):
+            c['x'] = 1
+        self.assertIsNone(c['svc']['none'])
+        self.assertNotEqual(c['svc'], c['other'])
+        self.assertIs(compact(c), c)
+
+    def test_copies(self):
+        c = compact(self.tree)
+        self.assertIs(copy.deepcopy(c), c)
+        self.assertEqual(pickle.loads(pickle.dumps(c)), self.tree)
+        self.assertEqual(thaw(c), self.tree)
+        self.assertIsInstance(thaw(c)['svc']['ports'], list)
+        copied = copy_paths(c, [('svc', 'host')])
+        copied['svc']['host'] = 'b'
+        self.assertEqual(c['svc']['host'], 'a')
+
+    def test_shares_keys_and_leaves(self):
+        table = NodeTable({'a': [{'host': 'x' * 3}, {'host': ''.join(['x'] * 3)}], 'b': 1, 'c': True})
+        self.assertEqual(table.keys, ['a', 'b', 'c', 'host'])
+        self.assertEqual(table.leaves, ['xxx', 1, True])
+        # Keys are sorted by id in each container; order is kept apart.
+        c = CompactDict(NodeTable({'z': 1, 'a': 2}))
+        self.assertEqual(list(c.items()), [('z', 1), ('a', 2)])
+
+
+class TestConfigCompact(unittest.TestCase):
+    def setUp(self):
+        self.clients = {'kms': StubKMS(), 'ssm': StubSSM({'/app/api-key': 'api key'})}
+
+    def test_load(self):
+        with stub_session(self.clients):
+            c = Config('tests/resources/test-secrets.yaml', compact=True)
+        self.assertIsInstance(c.values, CompactDict)
+        self.assertEqual(c.db['pass'], 'kms password')
+        self.assertEqual(c.get_value('api.keys[0]'), 'api key')
+        self.assertIsInstance(c.db, CompactDict)
+        self.assertIs(c.snapshot(), c.values)
+        self.assertRaises(AttributeError, lambda: c.missing)
+        with self.assertRaises(FiggypyError):
+            Config(compact=True, lazy=True)
+
+    def test_changes(self):
+        with stub_session(self.clients):
+            c = Config('tests/resources/test-secrets.yaml', compact=True)
+            c.set_value('number', 2)
+            self.assertEqual(c.number, 2)
+            c._update_leaves({('db', 'host'): 'other'})
+            self.assertEqual(c.get_value('db.host'), 'other')
+            self.assertEqual(c.db['pass'], 'kms password')
+            self.assertIsInstance(c.values, CompactDict)
+
+    def test_compact_key(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp, 'c.yaml')
+            with open(path, 'w') as _fo:
+                _fo.write('compact: true\ndb: {host: a}\n')
+            c = Config(path)
+            self.assertIsInstance(c.values, dict)
+            c.set_value('number', 2)
+            self.assertIsInstance(c.values, dict)
+            self.assertEqual(c.db, {'host': 'a'})
+            self.assertEqual(c.get_value('compact'), True)
+            c = Config(path, compact=True)
+            c.set_value('db', {'host': 'b'})
+            self.assertEqual(c.db['host'], 'b')
+            self.assertEqual(c.compact, True)
+        finally:
+            shutil.rmtree(tmp)
+
+    def test_reload(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp, 'c.yaml')
+            with open(path, 'w') as _fo:
+                _fo.write('a: {b: 1}\nc: 2\n')
+            c = Config(path, compact=True)
+            with open(path, 'w') as _fo:
+                _fo.write('a: {b: 3}\n')
+            self.assertEqual(c._hot_reload(), [('a', 'b'), ('c',)])
+            self.assertEqual(c.values, {'a': {'b': 3}})
+            self.assertEqual(c.a, {'b': 3})
+            self.assertFalse(hasattr(c, 'c'))
+        finally:
+            shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from figgypy.compiled import MAGIC, artifact_path, compile_file, load_artifact, main
+from figgypy.config import Config
+from figgypy.exceptions import FiggypyError
+from tests.stubs import StubKMS, StubSSM, stub_session
+
+
+class TestCompiled(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'test-secrets.yaml')
+        shutil.copy('tests/resources/test-secrets.yaml', self.path)
+        self.clients = {'kms': StubKMS(), 'ssm': StubSSM({'/app/api-key': 'api key'})}
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_load_without_parsing(self):
+        artifact = compile_file(self.path)
+        self.assertEqual(artifact, artifact_path(self.path))
+        with stub_session(self.clients):
+            with mock.patch('figgypy.config.loads', side_effect=AssertionError('parsed')):
+                c = Config(self.path, compiled=True)
+        self.assertEqual(c.db['pass'], 'kms password')
+        self.assertEqual(c.api['keys'], ['api key', 'plain'])
+        self.assertEqual(c._secret_refs[('token',)], ('_kms', 'ZXVsYXYgbmVrb3Q='))
+
+    def test_stale_artifact(self):
+        compile_file(self.path)
+        with open(self.path, 'a') as _fo:
+            _fo.write('added: true\n')
+        with open(self.path) as _fo:
+            self.assertIsNone(load_artifact(artifact_path(self.path), _fo.read()))
+        with stub_session(self.clients):
+            c = Config(self.path, compiled=True)
+        self.assertTrue(c.added)
+
+    def test_bad_artifacts(self):
+        with open(self.path) as _fo:
+            text = _fo.read()
+        self.assertIsNone(load_artifact(os.path.join(self.dir, 'missing.figc'), text))
+        for data in (b'', b'not an artifact'):
+            with open(artifact_path(self.path), 'wb') as _fo:
+                _fo.write(data)
+            self.assertIsNone(load_artifact(artifact_path(self.path), text))
+
+    def test_opt_in(self):
+        compile_file(self.path)
+        with stub_session(self.clients):
+            with mock.patch('figgypy.config.load_artifact') as load:
+                c = Config(self.path)
+        load.assert_not_called()
+        self.assertEqual(c.db['pass'], 'kms password')
+
+    def test_other_versions(self):
+        artifact = compile_file(self.path)
+        with open(self.path) as _fo:
+            text = _fo.read()
+        with open(artifact, 'rb') as _fo:
+            data = _fo.read()
+        self.assertIsNotNone(load_artifact(artifact, text))
+        # Another format version, then another Python version.
+        for offset in (len(MAGIC), len(MAGIC) + 2):
+            with open(artifact, 'wb') as _fo:
+                _fo.write(data[:offset] + bytes([data[offset] ^ 1]) + data[offset + 1:])
+            self.assertIsNone(load_artifact(artifact, text))
+
+    def test_unmarshalable(self):
+        path = os.path.join(self.dir, 'dates.yaml')
+        with open(path, 'w') as _fo:
+            _fo.write('day: 2020-01-01\n')
+        self.assertRaises(FiggypyError, compile_file, path)
+
+    def test_main(self):
+        output = os.path.join(self.dir, 'out.figc')
+        with mock.patch('builtins.print'):
+            main([self.path, '-o', output])
+        self.assertTrue(os.path.isfile(output))
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 import os
 import unittest
+from unittest import mock
 
 import figgypy.config
 
@@ -18,8 +19,8 @@ class TestConfig(unittest.TestCase):
         self.assertEqual(c.db['host'], 'db.heck.ya')
         self.assertEqual(c.db['pass'], 'test password')
 
+    @mock.patch('figgypy.decrypt.GPG_IMPORTED', False)
     def test_config_load_without_gpg(self):
-        figgypy.decrypt.GPG_IMPORTED = False
         c = figgypy.config.Config('tests/resources/test-config.yaml')
         encrypted_password = (
             '-----BEGIN PGP MESSAGE-----\n'
@@ -44,6 +45,51 @@ class TestConfig(unittest.TestCase):
         self.assertEqual(c.db['host'], 'db.heck.ya')
         self.assertEqual(c.db['pass'].rstrip('\n'), encrypted_password.rstrip('\n'))
 
+    def test_setup_reloads_once(self):
+        c = figgypy.config.Config('tests/resources/test-config.json')
+        self.assertEqual(c.post_load_count, 1)
+        c.setup(config_file='tests/resources/test-config.json', aws_config={},
+                gpg_config={}, decrypt_gpg=True, decrypt_kms=False, decrypt_ssm=True)
+        self.assertEqual(c.post_load_count, 2)
+        self.assertFalse(c.decrypt_kms)
+
+    def test_batch_reloads_once(self):
+        c = figgypy.config.Config('tests/resources/test-config.json')
+        with c.batch():
+            c.aws_config = {}
+            c.gpg_config = {}
+            with c.batch():
+                c.decrypt_kms = False
+            self.assertEqual(c.post_load_count, 1)
+        self.assertEqual(c.post_load_count, 2)
+
+    def test_batch_without_changes_does_not_reload(self):
+        c = figgypy.config.Config('tests/resources/test-config.json')
+        with c.batch():
+            pass
+        self.assertEqual(c.post_load_count, 1)
+
+    def test_secret_index(self):
+        c = figgypy.config.Config('tests/resources/test-config.json')
+        self.assertEqual(c._secret_paths, [])
+        c = figgypy.config.Config('tests/resources/test-config.yaml', decrypt_gpg=False)
+        self.assertEqual(c._secret_paths, [('db', 'pass')])
+        c.set_value('other', {'key': {'_kms': 'ciphertext'}})
+        self.assertEqual(c._secret_paths, [('db', 'pass'), ('other', 'key')])
+        c.set_value('db', {'host': 'db.heck.ya'})
+        self.assertEqual(c._secret_paths, [('other', 'key')])
+
+    def test_enable_decryption_after_load(self):
+        c = figgypy.config.Config(
+            config_file='tests/resources/test-config.yaml',
+            gpg_config={'homedir': 'tests/resources/test-keys'},
+            decrypt_gpg=False
+        )
+        self.assertTrue(c.db['pass'].startswith('-----BEGIN PGP MESSAGE-----'))
+        c.decrypt_gpg = True
+        self.assertEqual(c.db['pass'], 'test password')
+        self.assertEqual(c._secret_paths, [])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,16 +1,157 @@
 # -*- coding: utf-8 -*-
+from base64 import b64encode
 import unittest
+from unittest import mock
+
+import figgypy.decrypt
+from figgypy.loader import load
+from figgypy.decrypt import (
+    clear_gpg_handles,
+    gpg_decrypt,
+    kms_decrypt,
+    might_contain_secrets,
+    register_resolver,
+    resolve_secrets,
+    secret_paths,
+    ssm_decrypt,
+    RESOLVERS,
+)
+from tests.stubs import StubKMS, StubSSM, stub_session
 
 
 class TestDecrypt(unittest.TestCase):
     def test_gpg_decrypt(self):
-        return
+        block = load('tests/resources/test-config.yaml')['db']['pass']
+        gpg_config = {'homedir': 'tests/resources/test-keys'}
+        clear_gpg_handles()
+        res = gpg_decrypt({'inline': block, 'key': {'_gpg': block}}, gpg_config)
+        handles = list(figgypy.decrypt._GPG_HANDLES.values())
+        again = gpg_decrypt({'items': [block, {'_gpg': block}, 'plain']}, dict(gpg_config),
+                            max_workers=4)
+        self.assertEqual(res, {'inline': 'test password', 'key': 'test password'})
+        self.assertEqual(again, {'items': ['test password', 'test password', 'plain']})
+        self.assertEqual(len(handles), 1)
+        self.assertEqual(list(figgypy.decrypt._GPG_HANDLES.values()), handles)
+
+    def test_find_secrets(self):
+        cfg = {
+            'a': [1, {'_kms': 'k'}, 'x -----BEGIN PGP MESSAGE----- y'],
+            'b': {'c': {'_ssm': '/p'}, 'd': 'plain'},
+        }
+        self.assertEqual(sorted(secret_paths(cfg)), [('a', 1), ('a', 2), ('b', 'c')])
+        self.assertEqual(secret_paths(cfg, markers=['_ssm']), [('b', 'c')])
+        self.assertEqual(secret_paths(cfg, paths=[('a', 1), ('b', 'd'), ('z',)]), [('a', 1)])
+        self.assertEqual(secret_paths({'_kms': 'k'}), [()])
+
+    def test_might_contain_secrets(self):
+        self.assertFalse(might_contain_secrets('a: 1\nb: [2, 3]\n'))
+        self.assertTrue(might_contain_secrets('a:\n  _ssm: /p\n'))
+        self.assertTrue(might_contain_secrets('a: "-----BEGIN PGP MESSAGE-----"'))
+
+    def test_register_resolver(self):
+        calls = []
+
+        def resolve(payloads, **options):
+            calls.append((payloads, options))
+            return {p: p.upper() for p in payloads if p != 'skip'}
+
+        register_resolver('_upper', resolve)
+        try:
+            items = [{'_upper': 'a'}, {'_upper': 'skip'}, 3]
+            cfg = {'items': items, 'again': {'_upper': 'a'}}
+            res = resolve_secrets(cfg, markers=['_upper'], option='value')
+        finally:
+            del RESOLVERS['_upper']
+        self.assertIs(res['items'], items)
+        self.assertEqual(items, ['A', {'_upper': 'skip'}, 3])
+        self.assertEqual(res['again'], 'A')
+        self.assertEqual(calls, [(['a', 'skip'], {'option': 'value'})])
+
+    def kms_config(self):
+        return {
+            'secrets': [{'_kms': StubKMS.encrypt('secret {}'.format(i))} for i in range(20)],
+            'nested': {'key': {'_kms': StubKMS.encrypt('nested')}},
+            'denied': {'_kms': b64encode(b'denied').decode('ascii')},
+            'plain': 'value',
+        }
 
     def test_kms_decrypt(self):
-        return
+        client = StubKMS()
+        with stub_session(client):
+            res = kms_decrypt(self.kms_config(), {})
+        self.assertEqual(res['secrets'], ['secret {}'.format(i) for i in range(20)])
+        self.assertEqual(res['nested'], {'key': 'nested'})
+        self.assertEqual(res['denied'], self.kms_config()['denied'])
+        self.assertEqual(res['plain'], 'value')
+
+    def test_kms_decrypt_concurrent(self):
+        with stub_session(StubKMS()):
+            serial = kms_decrypt(self.kms_config(), {})
+        client = StubKMS(overlap=2)
+        with stub_session(client):
+            pooled = kms_decrypt(self.kms_config(), {}, max_workers=8)
+        self.assertEqual(pooled, serial)
+        # Two calls waited for each other, so they were in flight together.
+        self.assertTrue(client.overlapped)
+        self.assertLessEqual(client.max_in_flight, 8)
+
+    def test_kms_decrypt_retries_throttling(self):
+        client = StubKMS(throttle=3)
+        with stub_session(client), mock.patch.object(figgypy.decrypt, 'KMS_BACKOFF_BASE', 0):
+            res = kms_decrypt({'a': {'_kms': StubKMS.encrypt('a')}}, {})
+        self.assertEqual(res, {'a': 'a'})
+        self.assertEqual(client.calls, 4)
 
     def test_ssm_decrypt(self):
-        return
+        client = StubSSM({'/app/{}'.format(i): 'value {}'.format(i) for i in range(25)})
+        cfg = {
+            'items': [{'_ssm': '/app/{}'.format(i)} for i in range(25)],
+            'again': {'_ssm': '/app/0'},
+            'plain': 'value',
+        }
+        with stub_session(client):
+            res = ssm_decrypt(cfg, {})
+        self.assertEqual(res['items'], ['value {}'.format(i) for i in range(25)])
+        self.assertEqual(res['again'], 'value 0')
+        self.assertEqual(res['plain'], 'value')
+        self.assertEqual([len(names) for _, names in client.calls], [10, 10, 5])
+
+    def test_ssm_decrypt_by_path(self):
+        client = StubSSM({'/app/a': 'a', '/app/b': 'b', '/other/c': 'c'})
+        cfg = {'a': {'_ssm': '/app/a'}, 'b': {'_ssm': '/app/b'}, 'c': {'_ssm': '/other/c'}}
+        with stub_session(client):
+            res = ssm_decrypt(cfg, {}, path_prefixes=['/app'])
+        self.assertEqual(res, {'a': 'a', 'b': 'b', 'c': 'c'})
+        self.assertEqual(client.calls, [('get_parameters_by_path', '/app'),
+                                        ('get_parameters', ['/other/c'])])
+
+    def test_ssm_decrypt_missing_or_denied(self):
+        client = StubSSM({'/app/a': 'a'}, denied=('/denied',))
+        cfg = {'a': {'_ssm': '/app/a'}, 'missing': {'_ssm': '/missing'}}
+        with stub_session(client):
+            res = ssm_decrypt(cfg, {})
+        self.assertEqual(res, {'a': 'a', 'missing': {'_ssm': '/missing'}})
+        denied = {'d': {'_ssm': '/denied'}}
+        with stub_session(client):
+            self.assertEqual(ssm_decrypt(denied, {}), {'d': {'_ssm': '/denied'}})
+
+    def test_ssm_decrypt_denied_in_batch(self):
+        client = StubSSM({'/app/{}'.format(i): 'value {}'.format(i) for i in range(12)},
+                         denied=('/app/3',))
+        cfg = {'items': [{'_ssm': '/app/{}'.format(i)} for i in range(12)] + [{'_ssm': '/missing'}]}
+        with stub_session(client):
+            res = ssm_decrypt(cfg, {})
+        expected = ['value {}'.format(i) for i in range(12)] + [{'_ssm': '/missing'}]
+        expected[3] = {'_ssm': '/app/3'}
+        self.assertEqual(res['items'], expected)
+        # Only the batch holding the denied name falls back to single requests.
+        self.assertEqual([call for call, _ in client.calls],
+                         ['get_parameters'] + ['get_parameter'] * 10 + ['get_parameters'])
+
+    def test_ssm_decrypt_without_references(self):
+        with mock.patch('boto3.session.Session') as session:
+            ssm_decrypt({'a': [1, {'b': 2}]}, {})
+        session.assert_not_called()
 
 
 if __name__ == "__main__":
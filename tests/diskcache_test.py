@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from figgypy.config import Config
+from figgypy.diskcache import CRYPTO_IMPORTED, DiskSecretCache
+from tests.stubs import StubKMS, StubSSM, stub_session
+
+
+@unittest.skipUnless(CRYPTO_IMPORTED, reason='cryptography is required')
+class TestDiskSecretCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'secrets.cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def boot(self, **kwargs):
+        """Load the test config the way a freshly started process would."""
+        kms = StubKMS()
+        ssm = StubSSM({'/app/api-key': 'api key'})
+        cache = DiskSecretCache(self.path, 'alias/figgypy-test', **kwargs)
+        with stub_session({'kms': kms, 'ssm': ssm}):
+            c = Config('tests/resources/test-secrets.yaml', secret_cache=cache)
+        return c, kms, ssm
+
+    def test_warm_restart(self):
+        cold, kms, ssm = self.boot()
+        self.assertEqual(kms.calls, 3)
+        self.assertEqual(len(ssm.calls), 1)
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+        with open(self.path) as _fo:
+            self.assertNotIn('kms password', _fo.read())
+
+        warm, kms, ssm = self.boot()
+        self.assertEqual(warm.values, cold.values)
+        self.assertEqual(kms.calls, 1)
+        self.assertEqual(ssm.calls, [])
+
+    def test_expired_entries_resolve_live(self):
+        self.boot(ttl=60)
+        with mock.patch('figgypy.diskcache.time.time', return_value=2 ** 40):
+            c, kms, ssm = self.boot(ttl=60)
+        self.assertEqual(c.db['pass'], 'kms password')
+        self.assertEqual(kms.calls, 3)
+        self.assertEqual(len(ssm.calls), 1)
+
+    def test_corrupted_file_resolves_live(self):
+        with open(self.path, 'w') as _fo:
+            _fo.write('not json')
+        c, kms, _ = self.boot()
+        self.assertEqual(c.db['pass'], 'kms password')
+        self.assertEqual(kms.calls, 3)
+        _, kms, _ = self.boot()
+        self.assertEqual(kms.calls, 1)
+
+    def test_tampered_entry_resolves_live(self):
+        self.boot()
+        with open(self.path) as _fo:
+            contents = json.load(_fo)
+        for entry in contents['entries'].values():
+            entry['value'] = entry['value'][::-1]
+        with open(self.path, 'w') as _fo:
+            json.dump(contents, _fo)
+        c, kms, ssm = self.boot()
+        self.assertEqual(c.db['pass'], 'kms password')
+        self.assertEqual(kms.calls, 3)
+        self.assertEqual(len(ssm.calls), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+import json
+import subprocess
+import sys
+import unittest
+
+from benchmarks.import_bench import HEAVY_MODULES, heavy_imports, import_times
+
+LOADED = (
+    'import json, sys, figgypy\n'
+    '{}\n'
+    'print(json.dumps(sorted(m for m in sys.modules if m.split(".")[0] in {})))\n'
+)
+
+
+def loaded_modules(statement=''):
+    """Modules from HEAVY_MODULES imported after running statement."""
+    res = subprocess.run(
+        [sys.executable, '-c', LOADED.format(statement, list(HEAVY_MODULES))],
+        stdout=subprocess.PIPE, universal_newlines=True, check=True)
+    return json.loads(res.stdout)
+
+
+class TestImport(unittest.TestCase):
+    def test_import_is_light(self):
+        self.assertEqual(heavy_imports(import_times()), [])
+
+    def test_plain_config_is_light(self):
+        self.assertEqual(loaded_modules(
+            "figgypy.Config('tests/resources/test-config.json')"), [])
+
+    def test_backend_imported_when_needed(self):
+        loaded = loaded_modules(
+            "figgypy.Config('tests/resources/test-config.yaml', "
+            "gpg_config={'homedir': 'tests/resources/test-keys'})")
+        self.assertIn('pretty_bad_protocol', loaded)
+        self.assertNotIn('boto3', loaded)
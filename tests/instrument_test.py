@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+import unittest
+from unittest import mock
+
+from figgypy import instrument
+from figgypy.cache import SecretCache
+from figgypy.config import Config
+from tests.stubs import StubKMS, StubSSM, stub_session
+
+
+class Recorder(instrument.Hook):
+    def __init__(self):
+        self.spans = []
+        self.counts = []
+
+    def span(self, name, start, duration, tags):
+        self.spans.append((name, tags))
+
+    def count(self, name, value, tags):
+        self.counts.append((name, value, tags))
+
+
+class TestInstrument(unittest.TestCase):
+    def setUp(self):
+        self.clients = {'kms': StubKMS(), 'ssm': StubSSM({'/app/api-key': 'api key'})}
+
+    def tearDown(self):
+        del instrument.HOOKS[:]
+
+    def test_load_report(self):
+        cache = SecretCache()
+        with stub_session(self.clients):
+            c = Config('tests/resources/test-secrets.yaml', secret_cache=cache, kms_max_workers=2)
+            report = c.load_report()
+            self.assertEqual(set(report['stages']),
+                             {'find', 'read', 'parse', 'index', 'decrypt', 'publish'})
+            kms = report['backends']['_kms']
+            self.assertEqual((kms['requests'], kms['payloads'], kms['cache_misses']), (2, 2, 2))
+            self.assertEqual(kms['cache_hit_rate'], 0.0)
+            self.assertEqual(report['backends']['_ssm']['requests'], 1)
+            self.assertEqual(report['counts']['bytes_read'], 150)
+            self.assertGreaterEqual(report['seconds'], sum(report['stages'].values()) * 0.5)
+
+            c = Config('tests/resources/test-secrets.yaml', secret_cache=cache)
+            kms = c.load_report()['backends']['_kms']
+            self.assertEqual((kms['requests'], kms['cache_hits'], kms['cache_hit_rate']), (0, 2, 1.0))
+        self.assertIsNone(Config().load_report())
+
+    def test_hooks(self):
+        hook = instrument.add_hook(Recorder())
+        with stub_session(self.clients):
+            Config('tests/resources/test-secrets.yaml')
+        self.assertIn(('resolve', {'backend': '_kms'}), hook.spans)
+        self.assertIn(('parse', {}), hook.spans)
+        self.assertIn(('requests', 1, {'backend': '_ssm'}), hook.counts)
+        instrument.remove_hook(hook)
+        self.assertEqual(instrument.HOOKS, [])
+
+    def test_no_hooks(self):
+        self.assertIs(instrument.span('x'), instrument._NO_SPAN)
+        self.assertFalse(instrument.active())
+        instrument.count('x')
+        with instrument.recording() as report:
+            self.assertTrue(instrument.active())
+            with instrument.recording() as inner:
+                self.assertIs(inner, report)
+            instrument.count('x', 2)
+        self.assertEqual(report.counts, {('x', None): 2})
+        self.assertIsNotNone(report.duration)
+
+    def test_statsd_hook(self):
+        client = mock.Mock()
+        hook = instrument.StatsdHook(client)
+        hook.span('resolve', 0, 0.5, {'backend': '_kms'})
+        hook.count('requests', 3, {'backend': '_ssm'})
+        client.timing.assert_called_once_with('figgypy.resolve.kms', 500.0)
+        client.incr.assert_called_once_with('figgypy.requests.ssm', 3)
+
+    def test_opentelemetry_hook(self):
+        tracer, meter = mock.Mock(), mock.Mock()
+        hook = instrument.OpenTelemetryHook(tracer, meter)
+        hook.span('parse', 1.0, 0.25, {})
+        tracer.start_span.assert_called_once_with('figgypy.parse', start_time=10 ** 9,
+                                                  attributes={})
+        tracer.start_span.return_value.end.assert_called_once_with(end_time=125 * 10 ** 7)
+        hook.count('requests', 2, {'backend': '_kms'})
+        hook.count('requests', 1, {'backend': '_kms'})
+        meter.create_counter.assert_called_once_with('figgypy.requests')
+        self.assertEqual(meter.create_counter.return_value.add.call_count, 2)
+
+    def test_broken_hook(self):
+        hook = instrument.add_hook(mock.Mock(span=mock.Mock(side_effect=RuntimeError)))
+        with mock.patch.object(instrument.LOG, 'exception') as log:
+            with instrument.span('x'):
+                pass
+        self.assertTrue(log.called)
+        instrument.remove_hook(hook)
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+from figgypy.config import Config
+from figgypy.exceptions import FiggypyError
+from figgypy.layers import DictLayer, EnvLayer, FileLayer, MergedView
+from figgypy.lazy import LazySubtree
+from figgypy.snapshot import FrozenDict
+from tests.stubs import StubKMS, StubSSM, stub_session
+
+
+def write(path, text):
+    with open(path, 'w') as _fo:
+        _fo.write(text)
+
+
+class TestMergedView(unittest.TestCase):
+    def test_merge(self):
+        low = {'db': {'host': 'a', 'port': 1, 'opts': {'x': 1}}, 'list': [1], 'only_low': {'k': 1}}
+        high = {'db': {'host': 'b', 'opts': {'y': 2}}, 'list': [2]}
+        view = MergedView([high, low], ['high', 'low'])
+        self.assertEqual(sorted(view), ['db', 'list', 'only_low'])
+        self.assertIsInstance(view['db'], MergedView)
+        self.assertIs(view['db'], view['db'])
+        self.assertEqual(view['list'], [2])
+        merged = view.materialize()
+        # Merged when first read.
+        self.assertIsInstance(dict.__getitem__(merged, 'db'), LazySubtree)
+        self.assertEqual(merged, {'db': {'host': 'b', 'port': 1, 'opts': {'x': 1, 'y': 2}},
+                                  'list': [2], 'only_low': {'k': 1}})
+        self.assertIsInstance(dict.__getitem__(merged, 'db'), dict)
+        # Subtrees from a single layer are shared, not copied.
+        self.assertIs(merged['only_low'], low['only_low'])
+        self.assertIs(merged['list'], high['list'])
+        self.assertEqual(low['db'], {'host': 'a', 'port': 1, 'opts': {'x': 1}})
+        deep = view.materialize(deep=True)
+        self.assertIs(type(deep), dict)
+        self.assertIs(type(dict.__getitem__(deep, 'db')), dict)
+
+    def test_scalar_replaces_mapping(self):
+        view = MergedView([{'db': 'none'}, {'db': {'host': 'a'}}], ['high', 'low'])
+        self.assertEqual(view.materialize(), {'db': 'none'})
+        view = MergedView([{'db': {'host': 'a'}}, {'db': 'none'}], ['high', 'low'])
+        self.assertEqual(view.materialize(), {'db': {'host': 'a'}})
+
+    def test_provenance(self):
+        view = MergedView([{'db': {'host': 'b'}}, {'db': {'host': 'a', 'port': 1}}],
+                          ['high', 'low'])
+        self.assertEqual(view.provenance(('db', 'host')), 'high')
+        self.assertEqual(view.provenance(('db', 'port')), 'low')
+        self.assertEqual(view.provenance(('db',)), 'high')
+        self.assertRaises(KeyError, view.provenance, ('db', 'user'))
+        self.assertEqual(view.leaves(), {('db', 'host'): 'high', ('db', 'port'): 'low'})
+
+
+class TestEnvLayer(unittest.TestCase):
+    def test_read(self):
+        layer = EnvLayer('APP_', environ={'APP_DB__HOST': 'h', 'APP_DEBUG': '1', 'OTHER': 'x'})
+        layer.load()
+        self.assertEqual(layer.values, {'db': {'host': 'h'}, 'debug': '1'})
+
+
+class TestLayeredConfig(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.base = os.path.join(self.dir, 'base.yaml')
+        self.host = os.path.join(self.dir, 'host.yaml')
+        shutil.copy('tests/resources/test-secrets.yaml', self.base)
+        write(self.host, 'db:\n  host: db.host.local\nnumber: 2\n')
+        self.kms = StubKMS()
+        self.clients = {'kms': self.kms, 'ssm': StubSSM({'/app/api-key': 'api key'})}
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_layers(self):
+        env = EnvLayer('APP_', environ={'APP_DB__USER': 'admin'})
+        with stub_session(self.clients):
+            c = Config(sources=[self.base, FileLayer(os.path.join(self.dir, 'missing.yaml'),
+                                                     optional=True), self.host, env])
+        self.assertEqual(c.db, {'host': 'db.host.local', 'pass': 'kms password', 'user': 'admin'})
+        self.assertEqual(c.number, 2)
+        self.assertEqual(c.get_value('api.keys[0]'), 'api key')
+        self.assertEqual(c.provenance('db.host'), self.host)
+        self.assertEqual(c.provenance('db.pass'), self.base)
+        self.assertEqual(c.provenance('db.user'), 'env:APP_')
+        self.assertIsNone(c.provenance('db.missing'))
+        self.assertEqual(c.provenance()[('api', 'keys', 1)], self.base)
+
+    def test_reload_layer(self):
+        with stub_session(self.clients):
+            c = Config(sources=[self.base, self.host])
+            self.assertEqual(self.kms.calls, 2)
+            seen = []
+            c.on_change(lambda cfg, paths: seen.append(paths))
+            write(self.host, 'db:\n  host: db.other.local\n')
+            changed = c.reload_layer(self.host)
+        self.assertEqual(sorted(changed), [('db', 'host'), ('number',)])
+        self.assertEqual(seen, [changed])
+        # Only the changed layer is resolved again.
+        self.assertEqual(self.kms.calls, 2)
+        self.assertEqual(c.db['host'], 'db.other.local')
+        self.assertEqual(c.db['pass'], 'kms password')
+        self.assertEqual(c.number, 1)
+        self.assertRaises(FiggypyError, c.reload_layer, 'nope')
+
+    def test_member_keys(self):
+        write(self.host, 'layers: [a, b]\nvalues: 1\nsetup: x\n7: seven\nextra: 1\n')
+        c = Config(self.host)
+        self.assertEqual(c.values['layers'], ['a', 'b'])
+        self.assertEqual(c.layers, [])
+        self.assertEqual(c.get_value('values'), 1)
+        self.assertEqual(c.get_value(7), 'seven')
+        self.assertEqual(c.setup, 'x')
+        self.assertEqual(c.extra, 1)
+        with stub_session(self.clients):
+            c = Config(sources=[self.base, self.host])
+            self.assertEqual(len(c.layers), 2)
+            write(self.host, 'number: 3\n')
+            c.reload_layer(self.host)
+        self.assertFalse(hasattr(c, 'extra'))
+        self.assertIsInstance(c.values, dict)
+        self.assertEqual(c.number, 3)
+
+    def test_setting_keys(self):
+        write(self.host, 'sections: [a]\nlazy: yes\nstreaming: on\nsnapshot: 1\n'
+                         'secret_cache: none\n')
+        c = Config(self.host)
+        self.assertEqual(c.sections, ['a'])
+        self.assertIs(c.lazy, True)
+        self.assertIs(c.streaming, True)
+        self.assertEqual(c.snapshot, 1)
+        self.assertEqual(c.secret_cache, 'none')
+        self.assertEqual(c.get_value('lazy'), True)
+
+    def test_subtrees_merged_on_read(self):
+        defaults = {'db': {'port': 5432, 'opts': {'ssl': True}}, 'tags': ['a']}
+        with stub_session(self.clients):
+            c = Config(sources=[defaults, self.base, self.host])
+        self.assertIsInstance(dict.__getitem__(c.values, 'db'), LazySubtree)
+        self.assertNotIn('LazySubtree', repr(c.values))
+        self.assertIs(c.tags, defaults['tags'])
+        self.assertEqual(c.get_value('db.opts.ssl'), True)
+        self.assertEqual(c.db['host'], 'db.host.local')
+        self.assertIsInstance(c.snapshot()['db'], FrozenDict)
+        # Changes copy what they write to, so they do not reach the sources.
+        c._update_leaves({('db', 'opts', 'ssl'): False})
+        c.set_value('tags', ['b'])
+        self.assertEqual(defaults, {'db': {'port': 5432, 'opts': {'ssl': True}}, 'tags': ['a']})
+        self.assertEqual(c.get_value('db.opts.ssl'), False)
+        self.assertEqual(c.snapshot()['db']['opts'], {'ssl': False})
+        self.assertEqual(c.values['tags'], ['b'])
+
+    def test_add_source_and_set_value(self):
+        with stub_session(self.clients):
+            c = Config(self.base)
+            c.add_source(DictLayer({'db': {'port': 5432}}, name='defaults'))
+            c.set_value('number', 3)
+            c.add_source({'db': {'port': 6432}})
+        self.assertEqual(c.db['host'], 'db.heck.ya')
+        self.assertEqual(c.db['port'], 6432)
+        self.assertEqual(c.number, 3)
+        self.assertEqual(c.provenance('number'), 'set_value')
+        self.assertEqual(c.provenance('db.port'), 'dict')
+        self.assertEqual(c.provenance('db.host'), self.base)
+
+    def test_lazy(self):
+        with stub_session(self.clients):
+            c = Config(sources=[self.base, self.host], lazy=True)
+            self.assertEqual(self.kms.calls, 0)
+            self.assertEqual(c.db['pass'], 'kms password')
+            self.assertEqual(c.db['host'], 'db.host.local')
+            self.assertEqual(self.kms.calls, 1)
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import pickle
+import threading
+import unittest
+
+from figgypy.config import Config
+from figgypy.lazy import LazySecret, defer_secrets
+from tests.stubs import StubKMS, StubSSM, stub_session
+
+
+class TestLazy(unittest.TestCase):
+    def setUp(self):
+        self.kms = StubKMS()
+        self.ssm = StubSSM({'/app/api-key': 'api key'})
+        self.clients = {'kms': self.kms, 'ssm': self.ssm}
+
+    def test_load_does_not_resolve(self):
+        with stub_session(self.clients):
+            c = Config('tests/resources/test-secrets.yaml', lazy=True)
+            self.assertEqual(c.db['host'], 'db.heck.ya')
+            self.assertEqual(c.number, 1)
+        self.assertEqual(self.kms.calls, 0)
+        self.assertEqual(self.ssm.calls, [])
+
+    def test_resolve_on_access(self):
+        with stub_session(self.clients):
+            c = Config('tests/resources/test-secrets.yaml', lazy=True)
+            self.assertEqual(c.db['pass'], 'kms password')
+            self.assertEqual(c.get_value('db')['pass'], 'kms password')
+            self.assertEqual(c.values['api']['keys'], ['api key', 'plain'])
+            self.assertEqual(c.token, 'token value')
+            self.assertEqual(c.get_value('token'), 'token value')
+        self.assertEqual(self.kms.calls, 2)
+        self.assertEqual(len(self.ssm.calls), 1)
+
+    def test_matches_eager_load(self):
+        with stub_session(self.clients):
+            lazy = Config('tests/resources/test-secrets.yaml', lazy=True)
+            eager = Config('tests/resources/test-secrets.yaml')
+            self.assertEqual(dict(lazy.values.items()), eager.values)
+
+    def test_copies_resolve(self):
+        def connect(**kwargs):
+            return kwargs
+
+        expected = {'host': 'db.heck.ya', 'pass': 'kms password'}
+        for copy in (lambda d: connect(**d), dict, lambda d: {**d}, lambda d: d.copy(),
+                     lambda d: pickle.loads(pickle.dumps(d))):
+            with stub_session(self.clients):
+                c = Config('tests/resources/test-secrets.yaml', lazy=True)
+                self.assertEqual(copy(c.db), expected)
+        with stub_session(self.clients):
+            c = Config('tests/resources/test-secrets.yaml', lazy=True)
+            self.assertEqual(c.api['keys'].copy(), ['api key', 'plain'])
+            self.assertEqual(pickle.loads(pickle.dumps(c.api['keys'])), ['api key', 'plain'])
+
+    def test_concurrent_access_resolves_once(self):
+        self.kms.latency = 0.05
+        with stub_session(self.clients):
+            c = Config('tests/resources/test-secrets.yaml', lazy=True)
+            results = []
+            threads = [threading.Thread(target=lambda: results.append(c.values['db']['pass']))
+                       for _ in range(10)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        self.assertEqual(results, ['kms password'] * 10)
+        self.assertEqual(self.kms.calls, 1)
+
+    def test_reload_uses_new_settings(self):
+        with stub_session(self.clients):
+            c = Config('tests/resources/test-secrets.yaml', lazy=True)
+            placeholder = dict.__getitem__(c.values['db'], 'pass')
+            c.aws_config = {'region_name': 'us-west-2'}
+            replaced = dict.__getitem__(c.values['db'], 'pass')
+        self.assertIsInstance(replaced, LazySecret)
+        self.assertIsNot(replaced, placeholder)
+        self.assertEqual(replaced.options['aws_config'], {'region_name': 'us-west-2'})
+
+    def test_unresolvable_secret_keeps_reference(self):
+        cfg = defer_secrets({'a': {'_missing': 'x'}, 'b': {'_ssm': '/nope'}}, aws_config={})
+        with stub_session(self.clients):
+            self.assertEqual(cfg['b'], {'_ssm': '/nope'})
+        self.assertEqual(cfg['a'], {'_missing': 'x'})
+
+
+if __name__ == '__main__':
+    unittest.main()
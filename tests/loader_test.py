@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from figgypy.exceptions import FiggypyError
+from figgypy.loader import detect_format, load, loads
+
+
+class TestLoader(unittest.TestCase):
+    expected = {'db': {'host': 'db.heck.ya', 'port': 5432}, 'number': 1}
+
+    def test_load_json(self):
+        self.assertEqual(load('tests/resources/test-config.json'), self.expected)
+
+    def test_load_xml(self):
+        self.assertEqual(load('tests/resources/test-config.xml'), self.expected)
+
+    def test_load_yaml(self):
+        c = load('tests/resources/test-config.yaml')
+        self.assertEqual(c['number'], 1)
+        self.assertTrue(c['db']['pass'].startswith('-----BEGIN PGP MESSAGE-----'))
+
+    def test_detect_format_without_extension(self):
+        self.assertEqual(detect_format('{"a": 1}'), 'json')
+        self.assertEqual(detect_format('  <config/>'), 'xml')
+        self.assertEqual(detect_format('a: 1'), 'yaml')
+
+    def test_python_tags(self):
+        # The tags yaml.full_load accepts, and only those.
+        self.assertEqual(loads('point: !!python/tuple [1, 2]\n'), {'point': (1, 2)})
+        with self.assertRaises(FiggypyError):
+            loads('a: !!python/object/apply:os.getcwd []\n')
+
+    def test_relaxed_json_falls_back_to_yaml(self):
+        self.assertEqual(loads("{a: 1}"), {'a': 1})
+
+    def test_empty_file(self):
+        self.assertEqual(loads(''), {})
+
+    def test_non_mapping_raises(self):
+        with self.assertRaises(FiggypyError):
+            loads('- a\n- b\n')
+
+    def test_invalid_raises(self):
+        with self.assertRaises(FiggypyError):
+            loads('<config>', fmt='xml')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from figgypy.config import Config
+from figgypy.exceptions import FiggypyError
+from figgypy.cache import MISSING
+from figgypy.lazy import LazySecret, defer_secrets
+from figgypy.paths import PathIndex, compile_path, find_node
+from tests.stubs import StubKMS, StubSSM, stub_session
+
+
+class TestPaths(unittest.TestCase):
+    def test_compile_path(self):
+        self.assertEqual(compile_path('db.replicas[0].host'), ('db', 'replicas', 0, 'host'))
+        self.assertEqual(compile_path("hosts['a.example'][-1]"), ('hosts', 'a.example', -1))
+        self.assertEqual(compile_path('a[0][1]'), ('a', 0, 1))
+        self.assertEqual(compile_path('["a.b"].c'), ('a.b', 'c'))
+        self.assertIs(compile_path('db.host'), compile_path('db.host'))
+        for bad in ('db..host', 'db[x]', 'db[0', '.db'):
+            self.assertRaises(FiggypyError, compile_path, bad)
+
+    def test_find_node(self):
+        tree = {'a': [{'b': 1}], 's': 'str'}
+        self.assertEqual(find_node(tree, ('a', 0, 'b')), 1)
+        self.assertEqual(find_node(tree, ('a', 0)), {'b': 1})
+        self.assertIs(find_node(tree, ('a', 1)), MISSING)
+        self.assertIs(find_node(tree, ('s', 0)), MISSING)
+        lazy = defer_secrets({'a': {'_kms': 'x'}}, aws_config={})
+        self.assertIsInstance(find_node(lazy, ('a',)), LazySecret)
+
+    def test_index_only_read_paths(self):
+        index = PathIndex({'a': {'b': 1}, 'c': {'d': 2}})
+        self.assertEqual(index.hits, {})
+        self.assertEqual(index.get('a.b'), 1)
+        self.assertEqual(index.get('c.d'), 2)
+        self.assertEqual(index.get('c.x', 3), 3)
+        self.assertEqual(index.hits, {'a.b': 1, 'c.d': 2})
+        values = {'a': {'b': 1}, 'c': {'d': 4}}
+        self.assertEqual(index.updated(values, ['c']).hits, {'a.b': 1})
+
+
+class TestGetValue(unittest.TestCase):
+    def setUp(self):
+        self.clients = {'kms': StubKMS(), 'ssm': StubSSM({'/app/api-key': 'api key'})}
+
+    def test_get_value_paths(self):
+        c = Config('tests/resources/test-config.json')
+        c.set_value('db', {'replicas': [{'host': 'r0'}, {'host': 'r1'}]})
+        c.set_value('a.b', 'literal')
+        self.assertEqual(c.get_value('db.replicas[1].host'), 'r1')
+        self.assertEqual(c.get_value('db.replicas[-1].host'), 'r1')
+        self.assertEqual(c.get_value('db.replicas[2].host', 'none'), 'none')
+        self.assertEqual(c.get_value('db.replicas[0].host.x', 'none'), 'none')
+        self.assertEqual(c.get_value('number'), 1)
+        self.assertEqual(c.get_value('a.b'), 'literal')
+        c.set_value('db', {'replicas': [{'host': 'new'}]})
+        self.assertEqual(c.get_value('db.replicas[0].host'), 'new')
+
+    def test_get_value_secrets(self):
+        with stub_session(self.clients):
+            c = Config('tests/resources/test-secrets.yaml')
+            self.assertEqual(c.get_value('db.pass'), 'kms password')
+            lazy = Config('tests/resources/test-secrets.yaml', lazy=True)
+            self.assertEqual(lazy.get_value('api.keys[0]'), 'api key')
+            self.assertEqual(self.clients['kms'].calls, 2)
+            self.assertEqual(lazy.get_value('db.pass'), 'kms password')
+
+    def test_index_follows_values(self):
+        c = Config('tests/resources/test-config.json')
+        c.values = {'db': {'host': 'replaced'}}
+        self.assertEqual(c.get_value('db.host'), 'replaced')
+        # The snapshot is built from values as they are when first needed.
+        with c.pin():
+            self.assertEqual(c.get_value('db.host'), 'replaced')
+            self.assertEqual(c.get_value('db.port', 0), 0)
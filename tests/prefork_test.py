@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import unittest
+
+from figgypy import aws, decrypt
+from figgypy.cache import SecretCache
+from figgypy.config import Config
+from figgypy.exceptions import FiggypyError
+from figgypy.snapshot import FrozenDict, FrozenList
+from tests.stubs import StubKMS, StubSSM, stub_session
+
+
+def in_child(func):
+    """Run func in a forked child and return what it returns, as json."""
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(read)
+            os.write(write, json.dumps(func()).encode('utf-8'))
+        finally:
+            os._exit(0)
+    os.close(write)
+    with os.fdopen(read) as _fo:
+        data = _fo.read()
+    os.waitpid(pid, 0)
+    return json.loads(data)
+
+
+class TestPrefork(unittest.TestCase):
+    def setUp(self):
+        self.kms = StubKMS()
+        self.clients = {'kms': self.kms, 'ssm': StubSSM({'/app/api-key': 'api key'})}
+
+    def test_prepare_lazy(self):
+        with stub_session(self.clients):
+            c = Config('tests/resources/test-secrets.yaml', lazy=True)
+            self.assertEqual(self.kms.calls, 0)
+            c.prefork()
+        self.assertEqual(self.kms.calls, 2)
+        self.assertIsInstance(c.values, FrozenDict)
+        self.assertIsInstance(c.api['keys'], FrozenList)
+        self.assertEqual(c.db['pass'], 'kms password')
+        self.assertEqual(c.token, 'token value')
+        self.assertEqual(c.get_value('api.keys[0]'), 'api key')
+        self.assertIs(c.snapshot(), c.values)
+        self.assertRaises(FiggypyError, c.set_value, 'a', 1)
+        self.assertRaises(FiggypyError, setattr, c, 'decrypt_kms', False)
+        self.assertRaises(TypeError, c.values.update, {'a': 1})
+
+    @unittest.skipUnless(hasattr(os, 'register_at_fork'), 'needs os.register_at_fork')
+    def test_fork_resets_pools(self):
+        with stub_session(self.clients):
+            c = Config('tests/resources/test-secrets.yaml').prefork()
+            aws.client('kms')
+            decrypt._GPG_HANDLES['x'] = object()
+            lock = aws._LOCK
+
+            def child():
+                return {
+                    'clients': len(aws._CLIENTS),
+                    'handles': len(decrypt._GPG_HANDLES),
+                    'new_lock': aws._LOCK is not lock,
+                    'pass': c.db['pass'],
+                }
+
+            try:
+                result = in_child(child)
+            finally:
+                decrypt._GPG_HANDLES.pop('x', None)
+            self.assertTrue(aws._CLIENTS)
+        self.assertEqual(result, {'clients': 0, 'handles': 0, 'new_lock': True,
+                                  'pass': 'kms password'})
+
+    @unittest.skipUnless(hasattr(os, 'register_at_fork'), 'needs os.register_at_fork')
+    def test_fork_resets_secret_locks(self):
+        cache = SecretCache()
+        cache.set('key', 'value')
+        with stub_session(self.clients):
+            c = Config('tests/resources/test-secrets.yaml', lazy=True, secret_cache=cache)
+            secret = dict.__getitem__(c.db, 'pass')
+
+            def child():
+                return [cache.get('key'), c.db['pass']]
+
+            # Held by another thread at the time of the fork.
+            with cache._lock, secret._lock:
+                result = in_child(child)
+        self.assertEqual(result, ['value', 'kms password'])
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+import unittest
+from unittest import mock
+
+from figgypy.cache import SecretCache
+from figgypy.config import Config
+from figgypy.layers import DictLayer
+from figgypy.refresh import SSMRefresher
+from tests.stubs import StubKMS, StubSSM, stub_session
+
+
+class TestSSMRefresher(unittest.TestCase):
+    def setUp(self):
+        self.ssm = StubSSM({'/app/api-key': 'api key'})
+        self.clients = {'kms': StubKMS(), 'ssm': self.ssm}
+
+    def test_updates_rotated_values(self):
+        with stub_session(self.clients):
+            c = Config('tests/resources/test-secrets.yaml')
+            seen, keyed = [], []
+            c.on_change(lambda cfg, paths: seen.append(paths))
+            c.on_change(lambda cfg, paths: keyed.append(paths), path=('api',))
+            c.on_change(lambda cfg, paths: keyed.append(paths), path='db')
+            refresher = SSMRefresher(c, rate=None)
+            self.assertEqual(refresher.refresh(), [])
+            self.assertEqual(refresher.versions, {'/app/api-key': 1})
+
+            self.ssm.rotate('/app/api-key', 'rotated key')
+            self.assertEqual(refresher.refresh(), [('api', 'keys', 0)])
+            self.assertEqual(c.api['keys'], ['rotated key', 'plain'])
+            self.assertEqual(refresher.refresh(), [])
+        self.assertEqual(seen, [[('api', 'keys', 0)]])
+        self.assertEqual(keyed, [[('api', 'keys', 0)]])
+
+    def test_batches_and_rate_limit(self):
+        self.ssm.parameters.update({'/p/{}'.format(i): str(i) for i in range(25)})
+        text = ''.join("k{0}: {{_ssm: /p/{0}}}\n".format(i) for i in range(25))
+        with stub_session(self.clients):
+            c = Config()
+            c._load_text(text, 'refresh.yaml')
+            c._post_load_process()
+            del self.ssm.calls[:]
+            for i in range(25):
+                self.ssm.rotate('/p/{}'.format(i), 'new {}'.format(i))
+            refresher = SSMRefresher(c, rate=20)
+            start = time.monotonic()
+            changed = refresher.refresh()
+        self.assertGreaterEqual(time.monotonic() - start, 0.1)
+        self.assertEqual([len(call[1]) for call in self.ssm.calls], [10, 10, 5])
+        self.assertEqual(len(changed), 25)
+        self.assertEqual(c.k7, 'new 7')
+
+    def test_invalidates_cache(self):
+        cache = SecretCache()
+        with stub_session(self.clients):
+            c = Config('tests/resources/test-secrets.yaml', secret_cache=cache)
+            self.ssm.rotate('/app/api-key', 'rotated key')
+            SSMRefresher(c, rate=None).refresh()
+            other = Config('tests/resources/test-secrets.yaml', secret_cache=cache)
+        self.assertEqual(other.api['keys'][0], 'rotated key')
+
+    def test_skips_unread_lazy_values(self):
+        with stub_session(self.clients):
+            c = Config('tests/resources/test-secrets.yaml', lazy=True)
+            self.ssm.rotate('/app/api-key', 'rotated key')
+            self.assertEqual(SSMRefresher(c, rate=None).refresh(), [])
+            self.assertEqual(c.api['keys'][0], 'rotated key')
+
+    def test_references_from_sources_and_set_value(self):
+        self.ssm.parameters.update({'/low': 'low', '/hidden': 'hidden', '/set': 'set'})
+        low = DictLayer({'a': {'_ssm': '/low'}, 'b': {'_ssm': '/hidden'}}, name='low')
+        with stub_session(self.clients):
+            c = Config(sources=[low, {'b': 'high'}])
+            c.set_value('s', {'k': {'_ssm': '/set'}})
+            refresher = SSMRefresher(c, rate=None)
+            refresher.refresh()
+            for name in ('/low', '/hidden', '/set'):
+                self.ssm.rotate(name, 'rotated')
+            self.assertEqual(sorted(refresher.refresh()), [('a',), ('s', 'k')])
+            self.assertEqual(c.values, {'a': 'rotated', 'b': 'high', 's': {'k': 'rotated'}})
+            # A value set over a reference is no longer watched.
+            c.set_value('a', 'mine')
+            self.ssm.rotate('/low', 'again')
+            self.assertEqual(refresher.refresh(), [])
+            # Refreshed values are kept when the sources are merged again.
+            c.reload_layer(low)
+        self.assertEqual(c.values, {'a': 'mine', 'b': 'high', 's': {'k': 'rotated'}})
+
+    def test_background_thread(self):
+        changed = threading.Event()
+        with stub_session(self.clients):
+            with mock.patch('figgypy.refresh.random.uniform', return_value=0):
+                c = Config('tests/resources/test-secrets.yaml')
+                c.on_change(lambda cfg, paths: changed.set())
+                self.ssm.rotate('/app/api-key', 'rotated key')
+                c.start_ssm_refresh(interval=0.05)
+                try:
+                    self.assertTrue(changed.wait(5))
+                finally:
+                    c.stop_ssm_refresh()
+        self.assertEqual(c.api['keys'][0], 'rotated key')
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+import unittest
+from unittest import mock
+
+import figgypy
+from figgypy import registry
+from figgypy.config import Config
+from figgypy.registry import Registry, config_key
+
+
+class TestRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = Registry()
+        self.calls = []
+        calls = self.calls
+
+        class SlowConfig(Config):
+            def __init__(self, *args, **kwargs):
+                calls.append(args)
+                time.sleep(0.05)
+                super(SlowConfig, self).__init__(*args, **kwargs)
+
+        patcher = mock.patch.object(registry, 'Config', SlowConfig)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_config_key(self):
+        self.assertEqual(config_key('tests/resources/../resources/test-secrets.yaml'),
+                         config_key(config_file='tests/resources/test-secrets.yaml', decrypt_gpg=True))
+        self.assertNotEqual(config_key('tests/resources/test-secrets.yaml'),
+                            config_key('tests/resources/test-secrets.yaml', decrypt_kms=False))
+
+    def test_dedupes_loads(self):
+        self.registry.register('a', 'tests/resources/test-secrets.yaml', decrypt_kms=False,
+                               decrypt_ssm=False)
+        self.registry.register('b', config_file='tests/resources/test-secrets.yaml',
+                               decrypt_kms=False, decrypt_ssm=False)
+        self.assertIs(self.registry.get('a'), self.registry.get('b'))
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.registry.names(), ['a', 'b'])
+        self.assertIn('a', self.registry)
+
+    def test_single_flight(self):
+        self.registry.register('a', 'tests/resources/test-secrets.yaml', decrypt_kms=False,
+                               decrypt_ssm=False)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.registry.get('a')))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(cfg is results[0] for cfg in results))
+
+    def test_failed_load(self):
+        self.registry.register('missing', 'tests/resources/missing.yaml')
+        self.assertRaises(figgypy.exceptions.FiggypyError, self.registry.get, 'missing')
+        self.assertRaises(figgypy.exceptions.FiggypyError, self.registry.get, 'missing')
+        self.assertEqual(len(self.calls), 2)
+        self.assertRaises(ValueError, self.registry.get, 'unknown')
+
+    def test_evicts_least_recently_used(self):
+        self.registry.max_size = 1
+        self.registry.register('a', 'tests/resources/test-secrets.yaml', decrypt_kms=False,
+                               decrypt_ssm=False)
+        self.registry.register('b', 'tests/resources/test-secrets.yaml', decrypt_kms=False,
+                               decrypt_ssm=False, decrypt_gpg=False)
+        a = self.registry.get('a')
+        self.registry.get('b')
+        self.assertIsNot(self.registry.get('a'), a)
+        self.assertEqual(len(self.calls), 3)
+        pinned = Config()
+        self.registry.set('c', pinned)
+        self.registry.get('b')
+        self.assertIs(self.registry.get('c'), pinned)
+
+    def test_preload(self):
+        for name in ('a', 'b', 'c'):
+            self.registry.register(name, 'tests/resources/test-secrets.yaml', decrypt_kms=False,
+                                   decrypt_ssm=False, decrypt_gpg=name != 'c')
+        start = time.perf_counter()
+        loaded = self.registry.preload()
+        self.assertLess(time.perf_counter() - start, 0.1 + 0.05 * len(self.calls))
+        self.assertEqual(sorted(loaded), ['a', 'b', 'c'])
+        self.assertIs(loaded['a'], loaded['b'])
+        self.assertEqual(len(self.calls), 2)
+        self.registry.remove('a')
+        self.assertIs(self.registry.get('b'), loaded['b'])
+        self.registry.clear()
+        self.assertEqual(self.registry.names(), [])
+
+
+class TestGetConfig(unittest.TestCase):
+    def tearDown(self):
+        figgypy.set_config(None)
+        registry.REGISTRY.clear()
+
+    def test_named(self):
+        figgypy.register_config('named', 'tests/resources/test-secrets.yaml', decrypt_kms=False,
+                                decrypt_ssm=False)
+        c = figgypy.get_config('named')
+        self.assertIs(figgypy.preload_configs()['named'], c)
+        self.assertEqual(c.get_value('number'), 1)
+        self.assertRaises(ValueError, figgypy.get_config)
+        other = Config()
+        figgypy.set_config(other, name='other')
+        self.assertIs(figgypy.get_config('other'), other)
+        self.assertRaises(ValueError, figgypy.get_config)
+        figgypy.set_config(other)
+        self.assertIs(figgypy.get_config(), other)
+
+
+if __name__ == '__main__':
+    unittest.main()
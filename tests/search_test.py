@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from figgypy.config import Config
+from figgypy.exceptions import FiggypyError
+from figgypy.layers import FileLayer
+from figgypy.search import FINDER, SEARCH_PATH_ENV, FileFinder, search_dirs
+
+
+def write(path, text):
+    with open(path, 'w') as _fo:
+        _fo.write(text)
+
+
+class TestSearchDirs(unittest.TestCase):
+    def test_defaults(self):
+        dirs = search_dirs({'XDG_CONFIG_HOME': '/home/me/conf', 'XDG_CONFIG_DIRS': '/a:/b'})
+        home = os.path.expanduser('~/.config')
+        # ~/.config is still searched, after XDG_CONFIG_HOME.
+        self.assertEqual(dirs, [os.curdir, '/home/me/conf', home, '/a', '/b', '/etc/'])
+        self.assertEqual(search_dirs({}), [os.curdir, home, '/etc/'])
+        self.assertEqual(search_dirs({'XDG_CONFIG_HOME': home}), [os.curdir, home, '/etc/'])
+
+    def test_override(self):
+        self.assertEqual(search_dirs({SEARCH_PATH_ENV: '/x:/y', 'XDG_CONFIG_DIRS': '/a'}),
+                         ['/x', '/y'])
+
+
+class TestFileFinder(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.first = os.path.join(self.dir, 'first')
+        self.second = os.path.join(self.dir, 'second')
+        os.makedirs(os.path.join(self.second, 'pkg'))
+        os.makedirs(self.first)
+        self.dirs = [self.first, self.second]
+        write(os.path.join(self.second, 'pkg', 'config.yaml'), 'a: 1\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_remembers_until_mtime_changes(self):
+        finder = FileFinder(ttl=0)
+        expected = os.path.join(self.second, 'pkg', 'config.yaml')
+        self.assertEqual(finder.find('pkg/config.yaml', self.dirs), expected)
+        with mock.patch('os.path.isfile', side_effect=AssertionError('searched')):
+            self.assertEqual(finder.find('pkg/config.yaml', self.dirs), expected)
+        # A file earlier in the search path takes over.
+        os.makedirs(os.path.join(self.first, 'pkg'))
+        write(os.path.join(self.first, 'pkg', 'config.yaml'), 'a: 2\n')
+        self.assertEqual(finder.find('pkg/config.yaml', self.dirs),
+                         os.path.join(self.first, 'pkg', 'config.yaml'))
+        self.assertRaises(FiggypyError, finder.find, 'missing.yaml', self.dirs)
+
+    def test_ttl_and_invalidate(self):
+        finder = FileFinder(ttl=60)
+        finder.find('pkg/config.yaml', self.dirs)
+        with mock.patch('os.stat', side_effect=AssertionError('checked')):
+            finder.find('pkg/config.yaml', self.dirs)
+        finder.invalidate('pkg/config.yaml')
+        self.assertEqual(finder._found, {})
+
+    def test_current_directory(self):
+        finder = FileFinder(ttl=60)
+        cwd = os.getcwd()
+        self.addCleanup(os.chdir, cwd)
+        os.chdir(self.second)
+        expected = os.path.join(self.second, 'pkg', 'config.yaml')
+        self.assertEqual(finder.find('pkg/config.yaml', [os.curdir]), expected)
+        os.chdir(self.first)
+        self.assertRaises(FiggypyError, finder.find, 'pkg/config.yaml', [os.curdir])
+        self.assertEqual(finder.find_all(['pkg/config.yaml'], [os.curdir]),
+                         {'pkg/config.yaml': None})
+
+    def test_find_all(self):
+        write(os.path.join(self.first, 'b.yaml'), 'b: 1\n')
+        finder = FileFinder()
+        found = finder.find_all(['pkg/config.yaml', 'b.yaml', 'missing.yaml', '/abs.yaml'],
+                                self.dirs)
+        self.assertEqual(found, {
+            'pkg/config.yaml': os.path.join(self.second, 'pkg', 'config.yaml'),
+            'b.yaml': os.path.join(self.first, 'b.yaml'),
+            'missing.yaml': None,
+            '/abs.yaml': '/abs.yaml',
+        })
+        with mock.patch('os.scandir', side_effect=AssertionError('listed')):
+            self.assertEqual(finder.find('b.yaml', self.dirs), os.path.join(self.first, 'b.yaml'))
+
+    def test_config_search_path(self):
+        c = Config('pkg/config.yaml', search_path=self.dirs)
+        self.assertEqual(c.a, 1)
+        c = Config(sources=[FileLayer('pkg/config.yaml'), FileLayer('none.yaml', optional=True)],
+                   search_path=self.dirs)
+        self.assertEqual(c.a, 1)
+        with mock.patch.dict(os.environ, {SEARCH_PATH_ENV: self.second}):
+            self.assertEqual(Config('pkg/config.yaml').a, 1)
+        self.assertEqual(c.find_files(['pkg/config.yaml'])['pkg/config.yaml'],
+                         os.path.join(self.second, 'pkg', 'config.yaml'))
+
+    def test_search_path_key(self):
+        write(os.path.join(self.second, 'pkg', 'config.yaml'), 'search_path: [/nowhere]\n')
+        c = Config('pkg/config.yaml', search_path=self.dirs)
+        self.assertEqual(c.search_path, self.dirs)
+        self.assertEqual(c.get_value('search_path'), ['/nowhere'])
+        FINDER.invalidate()
+        c.config_file = 'pkg/config.yaml'
+        self.assertEqual(c.search_path, self.dirs)
+
+    def test_shared_dirs(self):
+        self.assertEqual(Config._dirs, [os.curdir, os.path.expanduser('~/.config'), '/etc/'])
+        with mock.patch.object(Config, '_dirs', self.dirs):
+            self.assertEqual(Config('pkg/config.yaml').a, 1)
+            self.assertEqual(Config._find_file('pkg/config.yaml'),
+                             os.path.join(self.second, 'pkg', 'config.yaml'))
+        with mock.patch.object(Config, '_dirs', list(Config._dirs)):
+            Config._dirs.insert(0, self.second)
+            self.assertEqual(Config().search_path[0], self.second)
+        self.assertEqual(Config().search_path, search_dirs())
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+import copy
+import pickle
+import threading
+import unittest
+from unittest import mock
+
+from figgypy.config import Config
+from figgypy.snapshot import FrozenDict, FrozenList, copy_paths, frozen, replace, thaw
+from tests.stubs import StubKMS, StubSSM, stub_session
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.tree = {'a': {'b': [1, {'c': 2}]}, 'd': {'e': 3}}
+
+    def test_frozen(self):
+        snap = frozen(self.tree)
+        self.assertIsInstance(snap['a'], FrozenDict)
+        self.assertIsInstance(snap['a']['b'], FrozenList)
+        self.assertEqual(snap, self.tree)
+        self.assertEqual(snap['a']['b'], [1, {'c': 2}])
+        for change in (lambda: snap.update(x=1), lambda: snap.pop('a'),
+                       lambda: snap.__setitem__('x', 1), lambda: snap['a'].clear()):
+            self.assertRaises(TypeError, change)
+        self.assertIs(frozen(snap), snap)
+        self.assertIs(copy.deepcopy(snap), snap)
+        self.assertEqual(pickle.loads(pickle.dumps(snap)), snap)
+        self.assertEqual(thaw(snap), self.tree)
+        self.assertIsInstance(thaw(snap)['a']['b'], list)
+
+    def test_replace_shares_branches(self):
+        snap = frozen(self.tree)
+        new = replace(snap, ('a', 'b', 1, 'c'), 5)
+        self.assertEqual(new['a']['b'][1]['c'], 5)
+        self.assertEqual(snap['a']['b'][1]['c'], 2)
+        self.assertIs(new['d'], snap['d'])
+        self.assertEqual(replace(snap, ('f',), [1])['f'], (1,))
+
+    def test_copy_paths(self):
+        copied = copy_paths(self.tree, [('a', 'b', 1, 'c')])
+        copied['a']['b'][1]['c'] = 5
+        self.assertEqual(self.tree['a']['b'][1]['c'], 2)
+        self.assertIs(copied['d'], self.tree['d'])
+
+
+class TestConfigSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.kms = StubKMS()
+        self.clients = {'kms': self.kms, 'ssm': StubSSM({'/app/api-key': 'api key'})}
+
+    def test_published_resolved(self):
+        with stub_session(self.clients):
+            c = Config('tests/resources/test-secrets.yaml')
+        snap = c.snapshot()
+        self.assertEqual(snap, c.values)
+        self.assertEqual(snap['db']['pass'], 'kms password')
+
+    def test_built_when_needed(self):
+        with mock.patch('figgypy.config.frozen', wraps=frozen) as built:
+            c = Config('tests/resources/test-config.json')
+            c.set_value('number', 2)
+            self.assertEqual(built.call_count, 0)
+            self.assertIs(c.snapshot(), c.snapshot())
+            self.assertEqual(built.call_count, 1)
+            c.set_value('number', 3)
+            self.assertEqual(c.snapshot()['number'], 3)
+            self.assertEqual(built.call_count, 1)
+
+    def test_set_value_is_copy_on_write(self):
+        c = Config('tests/resources/test-config.json')
+        values, snap = c.values, c.snapshot()
+        c.set_value('added', {'x': 1})
+        self.assertNotIn('added', values)
+        self.assertNotIn('added', snap)
+        self.assertEqual(c.snapshot()['added'], {'x': 1})
+        self.assertIs(c.snapshot()['db'], snap['db'])
+
+    def test_reload_does_not_touch_old_values(self):
+        with stub_session(self.clients):
+            c = Config('tests/resources/test-secrets.yaml', decrypt_kms=False)
+            values, snap = c.values, c.snapshot()
+            c.decrypt_kms = True
+        self.assertEqual(values['db']['pass'], {'_kms': 'ZHJvd3NzYXAgc21r'})
+        self.assertEqual(snap['db']['pass'], {'_kms': 'ZHJvd3NzYXAgc21r'})
+        self.assertEqual(c.snapshot()['db']['pass'], 'kms password')
+
+    def test_pin(self):
+        c = Config('tests/resources/test-config.json')
+        with c.pin() as snap:
+            c.set_value('number', 2)
+            self.assertIs(c.snapshot(), snap)
+            self.assertEqual(c.get_value('number'), 1)
+            with c.pin() as inner:
+                self.assertEqual(inner['number'], 2)
+            seen = []
+            thread = threading.Thread(target=lambda: seen.append(c.get_value('number')))
+            thread.start()
+            thread.join()
+            self.assertEqual(seen, [2])
+        self.assertEqual(c.get_value('number'), 2)
+
+    def test_lazy_snapshot(self):
+        with stub_session(self.clients):
+            c = Config('tests/resources/test-secrets.yaml', lazy=True)
+            snap = c.snapshot()
+            self.assertEqual(self.kms.calls, 0)
+            self.assertEqual(snap['token'], 'token value')
+            self.assertEqual(snap['api']['keys'][0], 'api key')
+            self.assertEqual(self.kms.calls, 1)
+            self.assertEqual(dict(snap['db'])['pass'], 'kms password')
+            self.assertEqual({**snap}['number'], 1)
+            self.assertEqual(snap['db'].copy()['pass'], 'kms password')
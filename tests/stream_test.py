@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from figgypy import stream
+from figgypy.config import Config
+from figgypy.exceptions import FiggypyError
+from figgypy.loader import load
+from tests.stubs import StubKMS, StubSSM, stub_session
+
+SECRETS = 'tests/resources/test-secrets.yaml'
+
+
+class TestStream(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def write(self, name, text):
+        path = os.path.join(self.tmp, name)
+        with open(path, 'w') as _fo:
+            _fo.write(text)
+        return path
+
+    def test_same_as_loader(self):
+        for f in ('tests/resources/test-config.json', 'tests/resources/test-config.xml',
+                  'tests/resources/test-config.yaml', SECRETS):
+            values, _ = stream.load(f)
+            self.assertEqual(values, load(f))
+
+    def test_records_references(self):
+        values, refs = stream.load(SECRETS)
+        self.assertEqual(refs, {
+            ('db', 'pass'): ('_kms', values['db']['pass']['_kms']),
+            ('api', 'keys', 0): ('_ssm', '/app/api-key'),
+            ('token',): ('_kms', values['token']['_kms']),
+        })
+        self.assertEqual(stream.load(SECRETS, markers=['_ssm'])[1],
+                         {('api', 'keys', 0): ('_ssm', '/app/api-key')})
+
+    def test_sections(self):
+        values, refs = stream.load(SECRETS, sections=['db', 'number', 'missing'])
+        self.assertEqual(set(values), {'db', 'number'})
+        self.assertEqual(list(refs), [('db', 'pass')])
+
+    def test_stops_after_sections(self):
+        path = self.write('c.yaml', 'a: 1\nb: [2\n')
+        self.assertEqual(stream.load(path, sections=['a']), ({'a': 1}, {}))
+        with self.assertRaises(FiggypyError):
+            stream.load(path)
+
+    def test_yaml_merge_and_aliases(self):
+        path = self.write('c.yaml', 'base: &b {x: 1}\n<<: {z: 3, base: 0}\nother: *b\n')
+        self.assertEqual(stream.load(path)[0], load(path))
+        with self.assertRaises(FiggypyError):
+            stream.load(path, sections=['other'])
+
+    def test_python_tags(self):
+        path = self.write('c.yaml', 'point: !!python/tuple [1, 2]\n')
+        self.assertEqual(stream.load(path)[0], {'point': (1, 2)})
+
+    def test_json_in_small_chunks(self):
+        cfg = {'a': [1, 2.5, {'_kms': 'payload'}], 'b': 12345, 'c': None, 'd': {}}
+        path = self.write('c.json', json.dumps(cfg, indent=2))
+        with mock.patch.object(stream, 'CHUNK_SIZE', 3), \
+                mock.patch.object(stream, 'IJSON_IMPORTED', False):
+            self.assertEqual(stream.load(path), (cfg, {('a', 2): ('_kms', 'payload')}))
+            self.assertEqual(stream.load(self.write('e.json', ' {} ')), ({}, {}))
+            # Relaxed json is parsed as yaml, as by figgypy.loader.
+            self.assertEqual(stream.load(self.write('r.json', '{a: 1}')), ({'a': 1}, {}))
+
+    def test_errors(self):
+        self.assertEqual(stream.load(self.write('e.yaml', '')), ({}, {}))
+        for name, text in (('l.yaml', '- a\n'), ('l.json', '[1]'), ('x.json', '{"a": 1} x')):
+            with self.assertRaises(FiggypyError):
+                stream.load(self.write(name, text))
+        with self.assertRaises(FiggypyError):
+            stream.load(os.path.join(self.tmp, 'missing.yaml'))
+
+    @unittest.skipUnless(stream._import_ijson(), 'ijson is not installed')
+    def test_json_with_ijson(self):
+        cfg = {'a': [1, 2.5, {'_kms': 'payload'}], 'b': None, 'c': {}}
+        path = self.write('c.json', json.dumps(cfg))
+        self.assertEqual(stream.load(path), (cfg, {('a', 2): ('_kms', 'payload')}))
+        self.assertEqual(stream.load(path, sections=['b']), ({'b': None}, {}))
+        self.assertEqual(stream.load(self.write('r.json', '{a: 1}')), ({'a': 1}, {}))
+        for text in ('[1, 2]', '"a"'):
+            with self.assertRaises(FiggypyError):
+                stream.load(self.write('l.json', text))
+
+    def test_json_root_without_ijson(self):
+        with mock.patch.object(stream, 'IJSON_IMPORTED', False):
+            for text in ('[1, 2]', '"a"'):
+                with self.assertRaises(FiggypyError):
+                    stream.load(self.write('l.json', text))
+
+    def test_config_streaming(self):
+        clients = {'kms': StubKMS(), 'ssm': StubSSM({'/app/api-key': 'api key'})}
+        with stub_session(clients):
+            c = Config(SECRETS, sections=['db', 'api'])
+        self.assertTrue(c._streaming)
+        self.assertEqual(set(c.values), {'db', 'api'})
+        self.assertEqual(c.db['pass'], 'kms password')
+        self.assertEqual(c.api['keys'], ['api key', 'plain'])
+
+        path = self.write('c.yaml', 'a: 1\nb: 2\n')
+        c = Config(path, streaming=True)
+        self.write('c.yaml', 'a: 3\n')
+        self.assertEqual(c._hot_reload(), [('a',), ('b',)])
+        self.assertEqual(c.values, {'a': 3})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""In-process KMS and SSM stand-ins, shared by the tests and the benchmarks.
+
+stub_session patches boto3 sessions so that figgypy's client pool hands
+out these stubs, and no request leaves the process.
+"""
+from base64 import b64encode
+from contextlib import contextmanager
+import os
+import threading
+import time
+from unittest import mock
+
+from botocore.exceptions import ClientError
+
+from figgypy.aws import clear_clients
+
+
+class StubKMS(object):
+    """KMS stand-in that "decrypts" by reversing bytes after a delay.
+
+    With overlap, the first decrypt calls wait for each other, up to that
+    many, and overlapped records whether they met: proof that they were
+    in flight at the same time.
+    """
+    def __init__(self, latency=0.0, throttle=0, overlap=None):
+        self.latency = latency
+        self.throttle = throttle
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        self.overlap = threading.Barrier(overlap) if overlap else None
+        self.overlapped = False
+
+    @staticmethod
+    def encrypt(value):
+        return b64encode(value.encode('utf-8')[::-1]).decode('ascii')
+
+    def decrypt(self, CiphertextBlob):
+        with self.lock:
+            self.calls += 1
+            if self.throttle:
+                self.throttle -= 1
+                raise ClientError({'Error': {'Code': 'ThrottlingException', 'Message': 'slow down'}},
+                                  'Decrypt')
+            if CiphertextBlob == b'denied':
+                raise ClientError({'Error': {'Code': 'AccessDeniedException', 'Message': 'denied'}},
+                                  'Decrypt')
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        if self.overlap is not None and not self.overlapped:
+            try:
+                self.overlap.wait(timeout=5)
+                self.overlapped = True
+                # Let later calls through without waiting for a partner.
+                self.overlap.abort()
+            except threading.BrokenBarrierError:
+                pass
+        time.sleep(self.latency)
+        with self.lock:
+            self.in_flight -= 1
+        return {'Plaintext': CiphertextBlob[::-1]}
+
+    def generate_data_key(self, KeyId, KeySpec):
+        with self.lock:
+            self.calls += 1
+        plaintext = os.urandom(32)
+        return {'Plaintext': plaintext, 'CiphertextBlob': plaintext[::-1]}
+
+
+class StubSSM(object):
+    """Parameter store stand-in that records the calls made to it."""
+    def __init__(self, parameters, denied=(), latency=0.0):
+        self.parameters = parameters
+        self.versions = {}
+        self.denied = denied
+        self.latency = latency
+        self.calls = []
+
+    def rotate(self, name, value):
+        self.parameters[name] = value
+        self.versions[name] = self.versions.get(name, 1) + 1
+
+    def get_parameters(self, Names, WithDecryption):
+        self.calls.append(('get_parameters', list(Names)))
+        time.sleep(self.latency)
+        if any(name in self.denied for name in Names):
+            raise ClientError({'Error': {'Code': 'AccessDeniedException', 'Message': 'denied'}},
+                              'GetParameters')
+        return {
+            'Parameters': [{'Name': name, 'Value': self.parameters[name],
+                            'Version': self.versions.get(name, 1)}
+                           for name in Names if name in self.parameters],
+            'InvalidParameters': [name for name in Names if name not in self.parameters],
+        }
+
+    def get_parameter(self, Name, WithDecryption):
+        self.calls.append(('get_parameter', Name))
+        if Name in self.denied:
+            raise ClientError({'Error': {'Code': 'AccessDeniedException', 'Message': 'denied'}},
+                              'GetParameter')
+        if Name not in self.parameters:
+            raise ClientError({'Error': {'Code': 'ParameterNotFound', 'Message': 'missing'}},
+                              'GetParameter')
+        return {'Parameter': {'Name': Name, 'Value': self.parameters[Name],
+                              'Version': self.versions.get(Name, 1)}}
+
+    def get_paginator(self, operation):
+        client = self
+
+        class Paginator(object):
+            def paginate(self, Path, Recursive, WithDecryption):
+                client.calls.append((operation, Path))
+                yield {'Parameters': [{'Name': name, 'Value': value}
+                                      for name, value in client.parameters.items()
+                                      if name.startswith(Path)]}
+        return Paginator()
+
+
+@contextmanager
+def stub_session(client):
+    """Patch boto3 sessions to hand out client, or client[service] for a dict.
+
+    The client pool is emptied around the block, so no stub outlives it.
+    """
+    session = mock.Mock(region_name='us-east-1')
+    if isinstance(client, dict):
+        session.client.side_effect = lambda service, **kwargs: client[service]
+    else:
+        session.client.return_value = client
+    clear_clients()
+    try:
+        with mock.patch('boto3.session.Session', return_value=session) as patched:
+            yield patched
+    finally:
+        clear_clients()
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from figgypy.config import Config
+from figgypy.watch import FileWatcher, diff
+from tests.stubs import StubKMS, StubSSM, stub_session
+
+
+def write(path, text):
+    with open(path, 'w') as _fo:
+        _fo.write(text)
+
+
+class TestDiff(unittest.TestCase):
+    def test_diff(self):
+        old = {'a': {'b': 1, 'c': [1, 2]}, 'd': 'x', 'e': [1]}
+        new = {'a': {'b': 2, 'c': [1, 3]}, 'd': 'x', 'e': [1, 2], 'f': {}}
+        self.assertEqual(sorted(diff(old, new)), [('a', 'b'), ('a', 'c', 1), ('e',), ('f',)])
+        self.assertEqual(diff(old, old), [])
+        self.assertEqual(diff({'a': 1}, {'a': '1'}), [('a',)])
+
+
+class TestFileWatcher(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'config.yaml')
+        write(self.path, 'a: 1\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def check_debounced(self, use_inotify):
+        calls = []
+        changed = threading.Event()
+
+        def callback():
+            calls.append(time.monotonic())
+            changed.set()
+
+        watcher = FileWatcher(self.path, callback, debounce=0.3, interval=0.02,
+                              use_inotify=use_inotify).start()
+        try:
+            for i in range(3):
+                write(self.path, 'a: {}\n'.format(i + 2))
+                time.sleep(0.05)
+            self.assertTrue(changed.wait(5))
+            time.sleep(0.4)
+        finally:
+            watcher.stop()
+        self.assertEqual(len(calls), 1)
+        return watcher
+
+    def test_poll(self):
+        self.check_debounced(use_inotify=False)
+
+    def test_inotify(self):
+        watcher = FileWatcher(self.path, lambda: None).start()
+        using_inotify = watcher.using_inotify
+        watcher.stop()
+        if not using_inotify:
+            self.skipTest('inotify is unavailable')
+        self.check_debounced(use_inotify=True)
+
+    def test_rename_over(self):
+        changed = threading.Event()
+        watcher = FileWatcher(self.path, changed.set, debounce=0.05, interval=0.02).start()
+        try:
+            tmp = os.path.join(self.dir, '.config.yaml.swp')
+            write(tmp, 'a: 2\n')
+            os.replace(tmp, self.path)
+            self.assertTrue(changed.wait(5))
+        finally:
+            watcher.stop()
+
+
+class TestHotReload(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'test-secrets.yaml')
+        shutil.copy('tests/resources/test-secrets.yaml', self.path)
+        self.kms = StubKMS()
+        self.clients = {'kms': self.kms, 'ssm': StubSSM({'/app/api-key': 'api key'})}
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def edit(self, old, new):
+        with open(self.path) as _fo:
+            text = _fo.read()
+        write(self.path, text.replace(old, new))
+
+    def test_only_changed_secrets_resolve(self):
+        with stub_session(self.clients):
+            c = Config(self.path)
+            seen = []
+            c.on_change(lambda cfg, paths: seen.append(paths))
+            self.assertEqual(self.kms.calls, 2)
+            old_values = c.values
+            self.edit('ZXVsYXYgbmVrb3Q=', StubKMS.encrypt('new token'))
+            self.edit('number: 1', 'number: 2\nadded: true')
+            changed = c._hot_reload()
+        self.assertEqual(sorted(changed, key=str), [('added',), ('number',), ('token',)])
+        self.assertEqual(seen, [changed])
+        self.assertEqual(self.kms.calls, 3)
+        self.assertEqual(c.token, 'new token')
+        self.assertEqual(c.db['pass'], 'kms password')
+        self.assertEqual(c.number, 2)
+        self.assertIsNot(c.values, old_values)
+        self.assertEqual(old_values['number'], 1)
+
+    def test_removed_keys_and_bad_file(self):
+        with stub_session(self.clients):
+            c = Config(self.path)
+            self.edit('number: 1', '')
+            self.assertEqual(c._hot_reload(), [('number',)])
+            self.assertFalse(hasattr(c, 'number'))
+            write(self.path, 'db: [unclosed')
+            self.assertIsNone(c._hot_reload())
+        self.assertEqual(c.db['host'], 'db.heck.ya')
+
+    def test_lazy_reload(self):
+        with stub_session(self.clients):
+            c = Config(self.path, lazy=True)
+            self.assertEqual(c.db['pass'], 'kms password')
+            self.edit('db.heck.ya', 'db2.heck.ya')
+            self.assertEqual(c._hot_reload(), [('db', 'host')])
+            self.assertEqual(self.kms.calls, 1)
+            self.assertEqual(c.db['pass'], 'kms password')
+            self.assertEqual(c.token, 'token value')
+            self.assertEqual(self.kms.calls, 2)
+
+    def test_watch(self):
+        changed = threading.Event()
+        with stub_session(self.clients):
+            c = Config(self.path, watch=True)
+            try:
+                c.on_change(lambda cfg, paths: changed.set())
+                self.edit('number: 1', 'number: 5')
+                self.assertTrue(changed.wait(5))
+            finally:
+                c.stop_watching()
+        self.assertEqual(c.number, 5)